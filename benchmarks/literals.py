@@ -0,0 +1,105 @@
+"""Benchmark conversion of literal-heavy math.
+
+Generates expressions consisting mostly of repeated ``<cn>`` literals, as
+found in large generated models, and times
+
+* the conversion of the ``<cn>`` elements alone, and
+* the conversion of the full expressions,
+
+with a fresh parser per expression (cold literal cache) and with a shared
+parser (warm literal cache).
+
+Usage::
+
+    python benchmarks/literals.py [--expressions N] [--terms N] [--repeat N]
+"""
+
+import argparse
+import random
+import timeit
+from functools import partial
+
+from lxml import etree
+
+from sbmlmath import SBMLMathMLParser
+from sbmlmath.mathml_parser import mathml_ns
+
+LITERALS = ("1", "0.5", "1000", "2", "0.001", "1e-3", "-1", "3.14159")
+
+
+def create_mathml(n_terms: int, rng: random.Random) -> str:
+    """Create a sum of ``n_terms`` products of a literal and a symbol."""
+    terms = "".join(
+        f"<apply><times/><cn>{rng.choice(LITERALS)}</cn>"
+        f"<ci>x{rng.randrange(10)}</ci></apply>"
+        for _ in range(n_terms)
+    )
+    return f'<math xmlns="{mathml_ns}"><apply><plus/>{terms}</apply></math>'
+
+
+def literals_cold(cns: list[list[etree._Element]], kwargs: dict):
+    """Convert the ``<cn>`` elements with a fresh parser per expression."""
+    for elements in cns:
+        parser = SBMLMathMLParser(**kwargs)
+        for element in elements:
+            parser.handle_cn(element)
+
+
+def literals_warm(cns: list[list[etree._Element]], parser: SBMLMathMLParser):
+    """Convert the ``<cn>`` elements with a shared parser."""
+    for elements in cns:
+        for element in elements:
+            parser.handle_cn(element)
+
+
+def full_cold(mathmls: list[str], kwargs: dict):
+    """Convert the expressions with a fresh parser per expression."""
+    for mathml in mathmls:
+        SBMLMathMLParser(**kwargs).parse_str(mathml)
+
+
+def full_warm(mathmls: list[str], parser: SBMLMathMLParser):
+    """Convert the expressions with a shared parser."""
+    for mathml in mathmls:
+        parser.parse_str(mathml)
+
+
+def benchmark(mathmls: list[str], floats_as_rationals: bool, repeat: int):
+    """Time literal and full conversion with cold and warm caches."""
+    kwargs = {"floats_as_rationals": floats_as_rationals}
+    cns = [
+        list(etree.fromstring(mathml.encode()).iter(f"{{{mathml_ns}}}cn"))
+        for mathml in mathmls
+    ]
+    shared = SBMLMathMLParser(**kwargs)
+
+    n_literals = sum(map(len, cns))
+    for label, func in (
+        ("<cn> only, cold", partial(literals_cold, cns, kwargs)),
+        ("<cn> only, warm", partial(literals_warm, cns, shared)),
+        ("full, cold", partial(full_cold, mathmls, kwargs)),
+        ("full, warm", partial(full_warm, mathmls, shared)),
+    ):
+        seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(  # noqa: T201
+            f"floats_as_rationals={floats_as_rationals!s:5} {label:16}: "
+            f"{seconds:.3f} s "
+            f"({seconds / n_literals * 1e6:.2f} µs per literal)"
+        )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    arg_parser.add_argument("--expressions", type=int, default=200)
+    arg_parser.add_argument("--terms", type=int, default=50)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(0)  # noqa: S311
+    mathmls = [create_mathml(args.terms, rng) for _ in range(args.expressions)]
+    for floats_as_rationals in (True, False):
+        benchmark(mathmls, floats_as_rationals, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
 from importlib.metadata import PackageNotFoundError, version
 from typing import Union
 
@@ -15,6 +18,16 @@ _DEFAULT_SBML_LEVEL = 3
 #: Default SBML version if not specified otherwise.
 _DEFAULT_SBML_VERSION = 2
 
+#: Per-thread pools of parsers and SBML namespaces used by
+#: :func:`sbml_math_to_sympy`.
+_pool = threading.local()
+#: Maximum number of cached literals of a pooled parser. Larger caches are
+#: cleared when the parser is taken from the pool.
+_MAX_POOLED_LITERALS = 2**16
+#: Maximum number of pooled parsers per thread. The least recently used
+#: parser is dropped if more are needed.
+_MAX_POOLED_PARSERS = 16
+
 
 def sympy_to_sbml_math(sp_expr: sp.Expr) -> libsbml.ASTNode:
     """Convert sympy expression to SBML math ASTNode.
@@ -49,6 +62,9 @@ def sbml_math_to_sympy(
 
     Conversion is done using the default settings of :class:`SBMLMathMLParser`.
 
+    Parsers are reused across calls with the same SBML level and version
+    and the same (hashable) options, within the same thread.
+
     Args:
         sbml_obj:
             The SBML object to be converted.
@@ -74,11 +90,62 @@ def sbml_math_to_sympy(
         else _DEFAULT_SBML_VERSION
     )
     mathml = libsbml.writeMathMLWithNamespaceToString(
-        ast_node, libsbml.SBMLNamespaces(level, version)
+        ast_node, _get_sbml_namespaces(level, version)
     )
-    return SBMLMathMLParser(
-        sbml_level=level, sbml_version=version, **kwargs
-    ).parse_str(mathml)
+    return _get_parser(level, version, **kwargs).parse_str(mathml)
+
+
+def _get_sbml_namespaces(level: int, version: int) -> libsbml.SBMLNamespaces:
+    """Get the (pooled) SBML namespaces for the given level and version."""
+    try:
+        namespaces = _pool.namespaces
+    except AttributeError:
+        namespaces = _pool.namespaces = {}
+    if (sbml_ns := namespaces.get((level, version))) is None:
+        sbml_ns = namespaces[level, version] = libsbml.SBMLNamespaces(
+            level, version
+        )
+    return sbml_ns
+
+
+def _freeze(value):
+    """Convert dictionaries to hashable tuples."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _get_parser(level: int, version: int, **kwargs) -> "SBMLMathMLParser":
+    """Get a parser for the given SBML level, version and options.
+
+    Parsers are pooled per thread, so that their configuration and their
+    instance-level caches are reused across calls. At most
+    :data:`_MAX_POOLED_PARSERS` parsers are kept per thread. If the options
+    are not hashable, a new parser is created.
+    """
+    try:
+        key = (level, version, _freeze(kwargs))
+        hash(key)
+    except TypeError:
+        return SBMLMathMLParser(
+            sbml_level=level, sbml_version=version, **kwargs
+        )
+
+    try:
+        parsers = _pool.parsers
+    except AttributeError:
+        parsers = _pool.parsers = OrderedDict()
+    if (parser := parsers.get(key)) is None:
+        parser = parsers[key] = SBMLMathMLParser(
+            sbml_level=level, sbml_version=version, **kwargs
+        )
+        if len(parsers) > _MAX_POOLED_PARSERS:
+            parsers.popitem(last=False)
+    else:
+        parsers.move_to_end(key)
+        if len(parser._literal_cache) > _MAX_POOLED_LITERALS:
+            parser._literal_cache.clear()
+    return parser
 
 
 def set_math(
@@ -87,16 +154,29 @@ def set_math(
 ) -> None:
     """Set the math expression of an SBML object.
 
+    To set the math of many SBML objects, :func:`set_math_batch` is more
+    efficient.
+
     Args:
         element:
             The SBML object to set the math expression for.
         expr:
             The sympy expression to set as the math expression.
     """
-    mathml = SBMLMathMLPrinter(
+    printer = SBMLMathMLPrinter(
         sbml_level=element.getLevel(),
         sbml_version=element.getVersion(),
-    ).doprint(expr)
+    )
+    _set_math(element, expr, printer)
+
+
+def _set_math(
+    element: libsbml.SBase,
+    expr: sp.Expr,
+    printer: "SBMLMathMLPrinter",
+) -> None:
+    """Set the math expression of an SBML object using the given printer."""
+    mathml = printer.doprint(expr)
 
     if ast_node := libsbml.readMathMLFromString(mathml):
         if element.setMath(ast_node) == libsbml.LIBSBML_OPERATION_SUCCESS:
@@ -111,20 +191,115 @@ def set_math(
     )
 
 
+class SetMathError(ValueError):
+    """Error setting the math of one or more SBML objects.
+
+    Attributes:
+        errors:
+            The failures as ``(element, expression, exception)`` tuples.
+    """
+
+    def __init__(
+        self, errors: list[tuple[libsbml.SBase, sp.Expr, Exception]]
+    ):
+        self.errors = errors
+        details = "\n".join(
+            f"* {element.getElementName()} {element.getId()!r}: "
+            f"{str(exception).splitlines()[0] if str(exception) else ''}"
+            for element, _, exception in errors
+        )
+        super().__init__(
+            f"Error setting math for {len(errors)} element(s):\n{details}"
+        )
+
+
+def set_math_batch(
+    math: Iterable[tuple[libsbml.SBase, sp.Expr]],
+) -> None:
+    """Set the math expressions of multiple SBML objects.
+
+    Equivalent to calling :func:`set_math` for each element, but a single
+    printer is used for all elements of the same SBML level and version,
+    and all elements are processed even if some of them fail.
+
+    Args:
+        math:
+            The SBML objects and the sympy expressions to set as their
+            math as ``(element, expression)`` pairs
+            (libsbml objects are not hashable and cannot be used as
+            dictionary keys).
+
+    Raises:
+        SetMathError:
+            If setting the math failed for any element. All failures are
+            collected in :attr:`SetMathError.errors`. The math of all other
+            elements is set.
+    """
+    printers = {}
+    errors = []
+    for element, expr in math:
+        level_version = (element.getLevel(), element.getVersion())
+        if (printer := printers.get(level_version)) is None:
+            printer = printers[level_version] = SBMLMathMLPrinter(
+                sbml_level=level_version[0],
+                sbml_version=level_version[1],
+            )
+        try:
+            _set_math(element, expr, printer)
+        except Exception as e:
+            errors.append((element, expr, e))
+
+    if errors:
+        raise SetMathError(errors)
+
+
+from .boolean import *
 from .cfunction import *
 from .csymbol import *
-from .mathml_parser import SBMLMathMLParser
+from .dependency_graph import *
+from .dimensions import *
+from .expression_store import *
+from .footprint import *
+from .inline import *
+from .jacobian import *
+from .lazy import *
+from .mathml_parser import (
+    ComplexityBudgetExceeded,
+    MathIdentifiers,
+    SBMLMathMLParser,
+)
 from .mathml_printer import SBMLMathMLPrinter
+from .model import *
+from .rates import *
+from .session import MathChanges, ModelMathSession
 from .species_symbol import SpeciesSymbol
+from .structural import *
 
 __all__ = [
     "set_math",
+    "set_math_batch",
+    "SetMathError",
+    "ComplexityBudgetExceeded",
+    "MathChanges",
+    "MathIdentifiers",
+    "ModelMathSession",
     "SBMLMathMLParser",
     "SBMLMathMLPrinter",
     "SpeciesSymbol",
     "TimeSymbol",
     "sympy_to_sbml_math",
     "sbml_math_to_sympy",
+    *boolean.__all__,
     *csymbol.__all__,
     *cfunction.__all__,
+    *dependency_graph.__all__,
+    *dimensions.__all__,
+    *expression_store.__all__,
+    *footprint.__all__,
+    *inline.__all__,
+    *jacobian.__all__,
+    *lazy.__all__,
+    *model.__all__,
+    *rates.__all__,
+    *structural.__all__,
 ]
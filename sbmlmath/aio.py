@@ -0,0 +1,259 @@
+"""asyncio interface for converting SBML models.
+
+Parsing MathML and constructing SymPy expressions is CPU-bound.
+The functions in this module run the conversion on an executor, so that it
+does not block the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+)
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Any
+
+import libsbml
+import sympy as sp
+
+from .model import model_math_to_sympy, sbml_file_math_to_sympy
+from .serialization import dumps_many, loads_many
+
+__all__ = [
+    "aiter_math_to_sympy",
+    "amodel_math_to_sympy",
+    "asbml_file_math_to_sympy",
+]
+
+#: A model to be converted: an SBML file name, or a libsbml model/document.
+#: libsbml objects cannot be sent to other processes and thus require a
+#: thread-based executor.
+ModelSource = str | os.PathLike | libsbml.Model | libsbml.SBMLDocument
+
+
+async def amodel_math_to_sympy(
+    model: libsbml.Model,
+    executor: Executor | None = None,
+    **kwargs,
+) -> dict[tuple[str, str], sp.Basic]:
+    """Convert all math elements of a libsbml model without blocking.
+
+    See :func:`sbmlmath.model_math_to_sympy`.
+
+    Args:
+        model:
+            The SBML model.
+        executor:
+            The executor to run the conversion on. libsbml objects cannot be
+            pickled, so this must not be a process pool.
+            Defaults to the event loop's default executor.
+        kwargs:
+            Additional keyword arguments passed to
+            :attr:`SBMLMathMLParser.__init__`.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, partial(model_math_to_sympy, model, **kwargs)
+    )
+
+
+async def asbml_file_math_to_sympy(
+    file: str | os.PathLike,
+    executor: Executor | None = None,
+    **kwargs,
+) -> dict[tuple[str, str], sp.Basic]:
+    """Convert all math elements of an SBML file without blocking.
+
+    See :func:`sbmlmath.sbml_file_math_to_sympy`.
+
+    Args:
+        file:
+            The SBML file name.
+        executor:
+            The executor to run the conversion on. May be a thread or process
+            pool. Defaults to the event loop's default executor.
+        kwargs:
+            Additional keyword arguments passed to
+            :attr:`SBMLMathMLParser.__init__`.
+    """
+    loop = asyncio.get_running_loop()
+    if isinstance(executor, ProcessPoolExecutor):
+        result = await loop.run_in_executor(
+            executor, _convert_serialized, file, kwargs
+        )
+        return _deserialize(result, kwargs)
+    return await loop.run_in_executor(
+        executor, partial(sbml_file_math_to_sympy, file, **kwargs)
+    )
+
+
+def _convert(source: ModelSource, kwargs: dict[str, Any]):
+    """Convert the given model source (see :data:`ModelSource`)."""
+    if isinstance(source, libsbml.SBMLDocument):
+        source = source.getModel()
+    if isinstance(source, libsbml.Model):
+        return model_math_to_sympy(source, **kwargs)
+    return sbml_file_math_to_sympy(source, **kwargs)
+
+
+def _convert_serialized(source: ModelSource, kwargs: dict[str, Any]):
+    """Convert the given model source, and serialize the result.
+
+    Pickling would evaluate the unevaluated expressions and lose units that
+    are not defined in the unit registry of the receiving process.
+    """
+    result = _convert(source, kwargs)
+    return list(result), dumps_many(list(result.values()))
+
+
+def _deserialize(result, kwargs: dict[str, Any]):
+    """Deserialize a result of :func:`_convert_serialized`."""
+    keys, data = result
+    return dict(
+        zip(keys, loads_many(data, ureg=kwargs.get("ureg")), strict=True)
+    )
+
+
+async def _as_async_iterator(
+    sources: Iterable[ModelSource] | AsyncIterable[ModelSource],
+) -> AsyncIterator[ModelSource]:
+    """Iterate asynchronously over synchronous or asynchronous sources."""
+    if isinstance(sources, AsyncIterable):
+        async for source in sources:
+            yield source
+    else:
+        for source in sources:
+            yield source
+
+
+async def _submit_pending(
+    pending: dict[asyncio.Future, ModelSource],
+    source_iter: AsyncIterator[ModelSource],
+    submit: Callable[[ModelSource], asyncio.Future],
+    max_concurrency: int,
+) -> bool:
+    """Submit conversions of the next sources until all slots are taken.
+
+    :return: Whether all sources have been submitted.
+    """
+    while len(pending) < max_concurrency:
+        try:
+            source = await anext(source_iter)
+        except StopAsyncIteration:
+            return True
+        pending[submit(source)] = source
+    return False
+
+
+async def _wait_pending(
+    pending: dict[asyncio.Future, ModelSource],
+) -> list[tuple[ModelSource, asyncio.Future]]:
+    """Wait for at least one pending conversion to finish, and remove the
+    finished ones from ``pending``."""
+    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    return [(pending.pop(future), future) for future in done]
+
+
+def _future_result(
+    future: asyncio.Future,
+    convert: Callable,
+    kwargs: dict[str, Any],
+    return_exceptions: bool,
+):
+    """Get the result of a finished conversion."""
+    try:
+        result = future.result()
+        if convert is _convert_serialized:
+            result = _deserialize(result, kwargs)
+    except Exception as e:
+        if not return_exceptions:
+            raise
+        return e
+    return result
+
+
+async def aiter_math_to_sympy(
+    sources: Iterable[ModelSource] | AsyncIterable[ModelSource],
+    executor: Executor | None = None,
+    max_concurrency: int = 4,
+    return_exceptions: bool = False,
+    **kwargs,
+) -> AsyncIterator[
+    tuple[ModelSource, dict[tuple[str, str], sp.Basic] | BaseException]
+]:
+    """Convert multiple models with bounded concurrency.
+
+    At most ``max_concurrency`` conversions are in flight at any time.
+    The next source is only taken from ``sources`` once a conversion
+    slot is free, and results are only produced as fast as they are
+    consumed, i.e. a slow consumer throttles the conversion.
+    Results are yielded in order of completion.
+
+    Closing the iterator (or cancelling the consuming task) cancels all
+    conversions that have not started yet. Conversions that are already
+    running on the executor are not interrupted, but their results are
+    discarded.
+
+    Args:
+        sources:
+            The models to convert: SBML file names, or libsbml models or
+            documents (see :data:`ModelSource`).
+        executor:
+            The executor to run the conversions on. Defaults to the event
+            loop's default executor.
+        max_concurrency:
+            The maximum number of concurrent conversions.
+        return_exceptions:
+            If ``True``, exceptions raised during conversion are yielded
+            instead of the conversion result.
+            Otherwise, the first exception is raised, and all pending
+            conversions are cancelled.
+        kwargs:
+            Additional keyword arguments passed to
+            :attr:`SBMLMathMLParser.__init__`.
+
+    Returns:
+        Asynchronous iterator over ``(source, result)`` tuples, where
+        ``result`` is the dictionary of converted expressions as returned
+        by :func:`sbmlmath.model_math_to_sympy`, or the exception raised
+        during conversion if ``return_exceptions`` is ``True``.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be positive.")
+
+    loop = asyncio.get_running_loop()
+    convert = (
+        _convert_serialized
+        if isinstance(executor, ProcessPoolExecutor)
+        else _convert
+    )
+
+    def submit(source: ModelSource) -> asyncio.Future:
+        return loop.run_in_executor(executor, convert, source, kwargs)
+
+    source_iter = _as_async_iterator(sources)
+    pending: dict[asyncio.Future, ModelSource] = {}
+    exhausted = False
+    try:
+        while True:
+            if not exhausted:
+                exhausted = await _submit_pending(
+                    pending, source_iter, submit, max_concurrency
+                )
+            if not pending:
+                return
+
+            for source, future in await _wait_pending(pending):
+                yield (
+                    source,
+                    _future_result(future, convert, kwargs, return_exceptions),
+                )
+    finally:
+        for future in pending:
+            future.cancel()
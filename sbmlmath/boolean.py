@@ -0,0 +1,112 @@
+"""Conversions between Booleans and numbers.
+
+SBML allows Boolean values in numeric contexts and vice versa, which SymPy
+does not. By default, :class:`SBMLMathMLParser` represents these
+conversions as :class:`sympy.Piecewise`. The functions in this module are a
+compact alternative.
+"""
+
+from __future__ import annotations
+
+import sympy as sp
+from sympy.core.function import Application
+from sympy.logic.boolalg import Boolean
+
+__all__ = ["BoolToNum", "NumToBool"]
+
+
+class BoolToNum(sp.Function):
+    """Conversion of a Boolean to a number.
+
+    Evaluates to ``1`` if the argument is true and ``0`` otherwise.
+    Equivalent to ``Piecewise((1, arg), (0, True))``.
+
+    >>> x = sp.Symbol("x")
+    >>> BoolToNum(x > 1).subs(x, 2)
+    1
+    >>> BoolToNum(x > 1).rewrite(sp.Piecewise)
+    Piecewise((1, x > 1), (0, True))
+    """
+
+    is_integer = True
+    is_nonnegative = True
+
+    @classmethod
+    def eval(cls, arg):
+        if arg == sp.true:
+            return sp.Integer(1)
+        if arg == sp.false:
+            return sp.Integer(0)
+        if not isinstance(arg, Boolean):
+            raise TypeError(f"Expected a Boolean argument, got {arg}.")
+
+    def _eval_rewrite_as_Piecewise(self, arg, **kwargs):
+        return sp.Piecewise((sp.Integer(1), arg), (sp.Integer(0), True))
+
+    def _eval_derivative(self, x):
+        # piecewise constant
+        return sp.Integer(0)
+
+    def _pythoncode(self, printer):
+        return f"int({printer._print(self.args[0])})"
+
+    _lambdacode = _mpmathcode = _pythoncode
+
+    def _numpycode(self, printer):
+        return "{}({}, 1, 0)".format(
+            printer._module_format(f"{printer._module}.where"),
+            printer._print(self.args[0]),
+        )
+
+
+class NumToBool(Application, Boolean):
+    """Conversion of a number to a Boolean.
+
+    Evaluates to true if the argument is non-zero and false otherwise.
+    Equivalent to ``Ne(arg, 0)``, which is also what it is rewritten to when
+    rewriting in terms of :class:`sympy.Piecewise` (a Piecewise is not a
+    valid Boolean argument).
+
+    Unlike the logical operators, this is not a
+    :class:`sympy.logic.boolalg.BooleanFunction`, i.e. logic simplification
+    treats it as an opaque proposition, like a relational, instead of as an
+    operator on Boolean variables.
+
+    >>> x = sp.Symbol("x")
+    >>> NumToBool(x).subs(x, 2)
+    True
+    >>> NumToBool(x).rewrite(sp.Piecewise)
+    Ne(x, 0)
+    """
+
+    @classmethod
+    def eval(cls, arg):
+        if isinstance(arg, BoolToNum):
+            return arg.args[0]
+        if arg.is_zero:
+            return sp.false
+        if arg.is_zero is False and arg.is_number:
+            return sp.true
+
+    def _eval_rewrite_as_Piecewise(self, arg, **kwargs):
+        return sp.Ne(arg, 0)
+
+    def _eval_simplify(self, **kwargs):
+        return self.func(self.args[0].simplify(**kwargs))
+
+    def to_nnf(self, simplify=True):
+        return sp.Ne(self.args[0], 0)
+
+    def as_set(self):
+        return self.to_nnf().as_set()
+
+    def _pythoncode(self, printer):
+        return printer._print(self.to_nnf())
+
+    _lambdacode = _mpmathcode = _pythoncode
+
+    def _numpycode(self, printer):
+        return "{}({}, 0)".format(
+            printer._module_format(f"{printer._module}.not_equal"),
+            printer._print(self.args[0]),
+        )
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import copyreg
+
 from sympy import Number
 from sympy.core.function import UndefinedFunction
 
@@ -28,6 +30,11 @@ class CFunction(UndefinedFunction):
     _cache = {}
     _definition_url_to_derived_class = {}
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # see below
+        copyreg.pickle(cls, _reduce_cfunction)
+
     def __new__(
         cls: type[CFunction],
         *args,
@@ -89,6 +96,36 @@ class CFunction(UndefinedFunction):
         )
 
 
+# CFunction instances are classes. Pickle would store them by reference,
+#  which fails for these dynamically created classes, and would lose the
+#  csymbol attributes. As for sympy's UndefinedFunction, copyreg is required
+#  to pickle them via the constructor.
+#  Subclasses are registered in CFunction.__init_subclass__.
+def _reduce_cfunction(f: CFunction):
+    return _rebuild_cfunction, (
+        type(f),
+        f.name,
+        f.definition_url,
+        f.encoding,
+        f._kwargs,
+    )
+
+
+def _rebuild_cfunction(
+    cls: type[CFunction],
+    name: str,
+    definition_url: str,
+    encoding: str,
+    kwargs: dict,
+) -> CFunction:
+    return cls(
+        name, definition_url=definition_url, encoding=encoding, **kwargs
+    )
+
+
+copyreg.pickle(CFunction, _reduce_cfunction)
+
+
 # Derived classes for specific SBML functions
 class Delay(CFunction):
     """Produces a SBML ``delay()`` function.
@@ -0,0 +1,400 @@
+"""Command-line batch conversion of SBML files.
+
+Converts the math of SBML files, or directories thereof, to sympy and
+writes the results in one of several formats, together with a JSON report
+of per-file and per-element timings and failures::
+
+    sbmlmath models/ -o converted/ -f serialized -j 8 --report report.json
+
+Output formats:
+
+``srepr``
+    One line per math element: the element name, the element id and the
+    :func:`sympy.srepr` of the expression, separated by tabs.
+``serialized``
+    The compact binary format of :mod:`sbmlmath.serialization`, preceded
+    by the element keys. Can be read with :func:`read_serialized`.
+``mathml``
+    The expressions printed back to MathML by :class:`SBMLMathMLPrinter`.
+
+Files given explicitly are written to the output directory by their file
+names, files found in directories by their paths relative to that
+directory. If two input files would be written to the same output file,
+nothing is converted.
+
+Math elements exceeding the complexity budgets given by ``--max-nodes``,
+``--max-depth`` and ``--timeout`` are skipped and reported, but do not
+count as failures.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from collections.abc import Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+from xml.sax.saxutils import quoteattr
+
+import sympy as sp
+from lxml import etree
+
+from .lazy import lazy_xml_document_math
+from .mathml_parser import ComplexityBudgetExceeded
+from .mathml_printer import SBMLMathMLPrinter
+from .serialization import dumps_many, loads_many
+
+__all__ = ["convert_file", "main", "read_serialized"]
+
+#: File name suffixes of the output formats
+FORMATS = {
+    "srepr": ".srepr.txt",
+    "serialized": ".sbmlmath",
+    "mathml": ".mathml.xml",
+}
+
+#: Length prefix of the element keys in the ``serialized`` format
+_KEYS_HEADER = struct.Struct("<I")
+
+
+def read_serialized(file: str | os.PathLike) -> dict[tuple[str, str], Any]:
+    """Read a file written in the ``serialized`` output format.
+
+    :param file: The file name.
+    :return: The expressions, by element key.
+    """
+    data = Path(file).read_bytes()
+    (keys_len,) = _KEYS_HEADER.unpack_from(data)
+    offset = _KEYS_HEADER.size
+    keys = json.loads(data[offset : offset + keys_len])
+    exprs = loads_many(data[offset + keys_len :])
+    return {tuple(key): expr for key, expr in zip(keys, exprs, strict=True)}
+
+
+def _write_output(
+    file: Path,
+    output_format: str,
+    results: dict[tuple[str, str], Any],
+    level: int,
+    version: int,
+):
+    """Write the converted expressions of one file."""
+    file.parent.mkdir(parents=True, exist_ok=True)
+    if output_format == "serialized":
+        keys = json.dumps(list(results)).encode()
+        with open(file, "wb") as f:
+            f.write(_KEYS_HEADER.pack(len(keys)))
+            f.write(keys)
+            f.write(dumps_many(list(results.values())))
+        return
+
+    with open(file, "w", encoding="utf-8") as f:
+        if output_format == "srepr":
+            for (element_name, element_id), expr in results.items():
+                f.write(f"{element_name}\t{element_id}\t{sp.srepr(expr)}\n")
+            return
+
+        printer = SBMLMathMLPrinter(sbml_level=level, sbml_version=version)
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<mathElements>\n')
+        for (element_name, element_id), expr in results.items():
+            f.write(
+                f"<element name={quoteattr(element_name)} "
+                f"id={quoteattr(element_id)}>"
+            )
+            printer.doprint_to(expr, f, with_prolog=False)
+            f.write("</element>\n")
+        f.write("</mathElements>\n")
+
+
+def _error(exception: BaseException) -> str:
+    message = str(exception).splitlines()[0] if str(exception) else ""
+    return f"{type(exception).__name__}: {message}"
+
+
+def _file_report(file: str | os.PathLike, error: str | None = None) -> dict:
+    """Create the (initial) report of a file conversion."""
+    return {
+        "file": str(file),
+        "output": None,
+        "seconds": None,
+        "read_seconds": None,
+        "error": error,
+        "elements": [],
+    }
+
+
+def _future_report(future: Future, file: str | os.PathLike) -> dict:
+    """Get the report of a file conversion submitted to a process pool.
+
+    If the conversion failed outside :func:`convert_file`, e.g., because the
+    worker process died, a report of the failed file is returned.
+    """
+    try:
+        return future.result()
+    except Exception as e:
+        return _file_report(file, error=_error(e))
+
+
+def convert_file(
+    file: str | os.PathLike,
+    output_file: str | os.PathLike | None = None,
+    output_format: str = "srepr",
+    parser_kwargs: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Convert the math of an SBML file and report timings and failures.
+
+    Elements that fail to convert or exceed the complexity budgets of the
+    parser are reported and skipped.
+
+    :param file: The SBML file.
+    :param output_file:
+        The file to write the converted expressions to, or ``None``.
+    :param output_format: The output format, see :data:`FORMATS`.
+    :param parser_kwargs:
+        Keyword arguments for :class:`SBMLMathMLParser`.
+    :return:
+        The report for this file, with keys ``file``, ``output``,
+        ``seconds`` (total), ``read_seconds``, ``error`` and ``elements``
+        (list of dicts with ``element_name``, ``element_id``, ``seconds``,
+        ``error`` and ``exceeded``, the exceeded budget, if any).
+    """
+    start = time.perf_counter()
+    report = _file_report(file)
+    try:
+        # Using `lxml` to parse untrusted data is known to be vulnerable to
+        #  XML attacks
+        root = etree.parse(file).getroot()
+        proxies = lazy_xml_document_math(root, **(parser_kwargs or {}))
+        report["read_seconds"] = time.perf_counter() - start
+
+        results = {}
+        for key, proxy in proxies.items():
+            element_report = {
+                "element_name": key[0],
+                "element_id": key[1],
+                "seconds": None,
+                "error": None,
+                "exceeded": None,
+            }
+            element_start = time.perf_counter()
+            try:
+                results[key] = proxy.expr
+            except ComplexityBudgetExceeded as e:
+                element_report["exceeded"] = e.budget
+            except Exception as e:
+                element_report["error"] = _error(e)
+            element_report["seconds"] = time.perf_counter() - element_start
+            report["elements"].append(element_report)
+
+        if output_file is not None:
+            _write_output(
+                Path(output_file),
+                output_format,
+                results,
+                int(root.get("level")),
+                int(root.get("version")),
+            )
+            report["output"] = str(output_file)
+    except Exception as e:
+        report["error"] = _error(e)
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def _collect_files(
+    inputs: Sequence[str], pattern: str
+) -> list[tuple[Path, Path]]:
+    """Collect the input files and their paths relative to the output
+    directory."""
+    files = []
+    for input_path in map(Path, inputs):
+        if input_path.is_dir():
+            files.extend(
+                (file, file.relative_to(input_path))
+                for file in sorted(input_path.rglob(pattern))
+                if file.is_file()
+            )
+        else:
+            files.append((input_path, Path(input_path.name)))
+    return files
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="sbmlmath",
+        description="Convert the math of SBML files to sympy.",
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="SBML files or directories to search for SBML files.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        help="Directory to write the converted math to. "
+        "If not given, nothing is written except for the report.",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=list(FORMATS),
+        default="srepr",
+        help="Output format (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes; 0 for one per CPU "
+        "(default: %(default)s).",
+    )
+    parser.add_argument(
+        "--pattern",
+        default="*.xml",
+        help="File name pattern for searching directories "
+        "(default: %(default)s).",
+    )
+    parser.add_argument(
+        "--report",
+        help="File to write the JSON report to; '-' for stdout.",
+    )
+    parser.add_argument(
+        "--ignore-units",
+        action="store_true",
+        help="Ignore the units of numbers.",
+    )
+    parser.add_argument(
+        "--floats",
+        action="store_true",
+        help="Convert real numbers to floats instead of rationals.",
+    )
+    parser.add_argument(
+        "--evaluate",
+        action="store_true",
+        help="Evaluate the resulting expressions.",
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        help="Skip math elements with more MathML elements than this.",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        help="Skip math elements with deeper nesting than this.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Skip math elements taking longer than this many seconds "
+        "to convert.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the command-line interface.
+
+    :param argv: The command-line arguments. Defaults to ``sys.argv[1:]``.
+    :return:
+        The exit code: 0 if everything was converted, 1 if anything failed,
+        2 if different input files would be written to the same output file.
+    """
+    args = _parse_args(argv)
+    parser_kwargs = {
+        "ignore_units": args.ignore_units,
+        "floats_as_rationals": not args.floats,
+        "evaluate": args.evaluate,
+        "max_nodes": args.max_nodes,
+        "max_depth": args.max_depth,
+        "timeout": args.timeout,
+    }
+    output_dir = Path(args.output_dir) if args.output_dir else None
+    files = _collect_files(args.inputs, args.pattern)
+    if output_dir:
+        # input files are written to output files by their relative paths
+        inputs_by_output: dict[Path, Path] = {}
+        for file, relative in files:
+            if (other := inputs_by_output.setdefault(relative, file)) != file:
+                print(  # noqa: T201
+                    f"sbmlmath: error: {other} and {file} would both be "
+                    f"written to {output_dir / relative}"
+                    f"{FORMATS[args.format]}.",
+                    file=sys.stderr,
+                )
+                return 2
+    tasks = [
+        (
+            file,
+            output_dir / f"{relative}{FORMATS[args.format]}"
+            if output_dir
+            else None,
+            args.format,
+            parser_kwargs,
+        )
+        for file, relative in files
+    ]
+
+    start = time.perf_counter()
+    jobs = args.jobs or os.cpu_count()
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(convert_file, *task) for task in tasks]
+            file_reports = [
+                _future_report(future, task[0])
+                for future, task in zip(futures, tasks, strict=True)
+            ]
+    else:
+        file_reports = [convert_file(*task) for task in tasks]
+
+    elements = [
+        element for report in file_reports for element in report["elements"]
+    ]
+    report = {
+        "options": parser_kwargs,
+        "format": args.format,
+        "jobs": jobs,
+        "seconds": time.perf_counter() - start,
+        "n_files": len(file_reports),
+        "n_failed_files": sum(bool(r["error"]) for r in file_reports),
+        "n_elements": len(elements),
+        "n_failed_elements": sum(bool(e["error"]) for e in elements),
+        "n_skipped_elements": sum(bool(e["exceeded"]) for e in elements),
+        "files": file_reports,
+    }
+
+    if args.report == "-":
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    elif args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    n_converted = (
+        report["n_elements"]
+        - report["n_failed_elements"]
+        - report["n_skipped_elements"]
+    )
+    print(  # noqa: T201
+        f"Converted {n_converted}/{report['n_elements']} math elements of "
+        f"{report['n_files'] - report['n_failed_files']}/"
+        f"{report['n_files']} files in {report['seconds']:.2f} s"
+        + (
+            f" ({report['n_skipped_elements']} skipped)."
+            if report["n_skipped_elements"]
+            else "."
+        ),
+        file=sys.stderr,
+    )
+    return int(bool(report["n_failed_files"] or report["n_failed_elements"]))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
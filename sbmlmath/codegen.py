@@ -0,0 +1,432 @@
+"""Ahead-of-time generation of NumPy modules for SBML models.
+
+Compiling the math of a large model with :func:`sympy.lambdify` at every
+process start can take a long time. :func:`load_module` instead generates
+an ordinary Python module for the converted math of a model once, writes it
+to a cache directory, keyed by a hash of the model content and the
+generation options, and imports it on subsequent calls.
+
+The generated module defines the tuples ``STATES``, ``PARAMETERS``,
+``ASSIGNMENT_RULES``, ``EVENTS`` and ``OBSERVABLES`` of the respective
+model entity ids (event ids, observable names), and the functions
+
+``rhs(t, x, p)``
+    The time derivatives of the states.
+``assignment_rules(t, x, p)``
+    The values of the assignment rule variables.
+``event_triggers(t, x, p)``
+    The values of the event triggers.
+``observables(t, x, p)``
+    The values of the observables.
+
+where ``t`` is the time, ``x`` the states and ``p`` the parameters, in the
+order given by the tuples above. ``x`` and ``p`` may have additional
+trailing dimensions for evaluating a batch of states or parameters at once.
+Each function returns an array with the respective values along the first
+axis. Within each function, assignment rules are evaluated once, in
+dependency order, and common subexpressions are computed once.
+
+The states are the non-constant species that are neither boundary species
+nor determined by assignment rules, and all entities with rate rules.
+Their rates are built by :class:`RateOfResolver`. All other symbols are
+parameters. Function definitions are inlined, ``rateOf()`` is resolved,
+the ``avogadro`` csymbol is replaced by its value, and piecewise functions
+are evaluated elementwise. Local parameters of kinetic laws are
+parameters named ``<reaction id>.<parameter id>``, so that they neither
+collide with each other nor with model entities of the same id. Units are
+ignored. ``delay()`` and algebraic rules are not supported.
+
+Loading the generated modules requires ``numpy``.
+
+>>> import libsbml
+>>> import tempfile
+>>> doc = libsbml.SBMLDocument(3, 2)
+>>> model = doc.createModel()
+>>> for species_id in ("A", "B"):
+...     species = model.createSpecies()
+...     _ = species.setId(species_id), species.setCompartment("C")
+...     _ = species.setHasOnlySubstanceUnits(True)
+...     _ = species.setConstant(False), species.setBoundaryCondition(False)
+>>> reaction = model.createReaction()
+>>> _ = reaction.setId("R"), reaction.createReactant().setSpecies("A")
+>>> _ = reaction.createProduct().setSpecies("B")
+>>> law = reaction.createKineticLaw()
+>>> _ = law.setMath(libsbml.parseL3Formula("k * A"))
+>>> with tempfile.TemporaryDirectory() as cache_dir:
+...     module = load_module(model, cache_dir)
+...     module.STATES, module.PARAMETERS, module.rhs(0, [2.0, 0.0], [0.5])
+(('A', 'B'), ('k',), array([-1.,  1.]))
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import os
+import sys
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from types import ModuleType
+
+import libsbml
+import sympy as sp
+from sympy.core.function import AppliedUndef
+from sympy.printing.numpy import NumPyPrinter
+
+from .csymbol import CSymbol, TimeSymbol
+from .dependency_graph import DependencyGraph
+from .inline import inline_function_definitions
+from .model import model_math_to_sympy
+from .rates import RateOfResolver
+
+__all__ = ["generate_module_source", "load_module", "model_hash"]
+
+#: Version of the generated code. Part of the model hash, so that modules
+#: generated by other versions are not reused.
+_CODEGEN_VERSION = 2
+
+#: Time in the prepared expressions, distinct from any model entity
+_TIME = sp.Dummy("time")
+
+_MODULE_HEADER = '''\
+"""Generated by sbmlmath.codegen from model {model_id!r}. Do not edit."""
+
+import numpy
+
+MODEL_HASH = {model_hash!r}
+
+STATES = {states!r}
+PARAMETERS = {parameters!r}
+ASSIGNMENT_RULES = {assignment_rules!r}
+EVENTS = {events!r}
+OBSERVABLES = {observables!r}
+
+
+def _stack(*values):
+    return numpy.stack(numpy.broadcast_arrays(*values))
+'''
+
+
+def model_hash(
+    model: libsbml.Model,
+    observables: Mapping[str, sp.Basic] | None = None,
+    **kwargs,
+) -> str:
+    """Compute the hash identifying the generated module of a model.
+
+    :param model: The SBML model.
+    :param observables: See :func:`generate_module_source`.
+    :param kwargs: See :func:`generate_module_source`.
+    :return: The hash, as a hexadecimal string.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"sbmlmath.codegen:{_CODEGEN_VERSION}\0".encode())
+    digest.update(libsbml.writeSBMLToString(model.getSBMLDocument()).encode())
+    for name, expr in sorted((observables or {}).items()):
+        digest.update(f"\0{name}\0{sp.srepr(expr)}".encode())
+    digest.update(f"\0{sorted(kwargs.items())!r}".encode())
+    return digest.hexdigest()
+
+
+def _states(model: libsbml.Model) -> list[str]:
+    """Get the ids of the state variables of a model."""
+    rate_rules = [
+        rule.getVariable() for rule in model.getListOfRules() if rule.isRate()
+    ]
+    states = [
+        species.getId()
+        for species in model.getListOfSpecies()
+        if species.getId() in rate_rules
+        or not (
+            species.getConstant()
+            or species.getBoundaryCondition()
+            or model.getAssignmentRuleByVariable(species.getId())
+        )
+    ]
+    states.extend(
+        variable for variable in rate_rules if variable not in states
+    )
+    return states
+
+
+def _replace_csymbols(expr: sp.Basic) -> sp.Basic:
+    """Replace time by :data:`_TIME` and constant csymbols by their
+    values."""
+    replacements = {}
+    for node in sp.preorder_traversal(expr):
+        if isinstance(node, CSymbol):
+            if node.definition_url == TimeSymbol.DEFINITION_URL:
+                replacements[node] = _TIME
+            else:
+                replacements[node] = sp.Float(float(node))
+    if calls := expr.atoms(AppliedUndef):
+        raise NotImplementedError(
+            f"Unsupported function calls: {sorted(map(str, calls))}"
+        )
+    return expr.xreplace(replacements)
+
+
+def _rename_local_parameters(
+    model: libsbml.Model,
+    expressions: dict[tuple[str, str], sp.Basic],
+    symbol_kwargs: dict | None,
+) -> None:
+    """Rename the local parameters of all kinetic laws in ``expressions`` to
+    ``<reaction id>.<parameter id>``."""
+    symbol_kwargs = symbol_kwargs or {}
+    for reaction in model.getListOfReactions():
+        if not (kinetic_law := reaction.getKineticLaw()):
+            continue
+        parameters = (
+            kinetic_law.getListOfLocalParameters()
+            if model.getLevel() > 2
+            else kinetic_law.getListOfParameters()
+        )
+        key = ("kineticLaw", reaction.getId())
+        if not parameters or key not in expressions:
+            continue
+        local_ids = {parameter.getId() for parameter in parameters}
+        expressions[key] = expressions[key].xreplace(
+            {
+                sym: sp.Symbol(
+                    f"{reaction.getId()}.{sym.name}", **symbol_kwargs
+                )
+                for sym in expressions[key].free_symbols
+                if sym.name in local_ids and not isinstance(sym, CSymbol)
+            }
+        )
+
+
+class _FunctionWriter:
+    """Writes the functions of a generated module."""
+
+    def __init__(
+        self,
+        states: Sequence[str],
+        parameters: Sequence[str],
+        rules: Sequence[tuple[str, sp.Basic]],
+    ):
+        self.states = states
+        self.parameters = parameters
+        self.rules = rules
+        self.printer = NumPyPrinter(
+            {"fully_qualified_modules": True, "allow_unknown_functions": False}
+        )
+        # model entity id -> symbol in the generated code
+        self.names = {}
+        for prefix, ids in (
+            ("x", states),
+            ("p", parameters),
+            ("w", [variable for variable, _ in rules]),
+        ):
+            self.names.update(
+                (entity_id, sp.Symbol(f"{prefix}{i}"))
+                for i, entity_id in enumerate(ids)
+            )
+
+    def _rename(self, expr: sp.Basic) -> sp.Basic:
+        return expr.xreplace(
+            {
+                sym: sp.Symbol("t") if sym is _TIME else self.names[sym.name]
+                for sym in expr.free_symbols
+            }
+        )
+
+    def _needed_rules(
+        self, exprs: Sequence[sp.Basic]
+    ) -> list[tuple[str, sp.Basic]]:
+        """Get the assignment rules the given expressions depend on, in
+        dependency order."""
+        needed = {sym.name for expr in exprs for sym in expr.free_symbols}
+        result = []
+        for variable, expr in reversed(self.rules):
+            if variable in needed:
+                result.append((variable, expr))
+                needed.update(sym.name for sym in expr.free_symbols)
+        return result[::-1]
+
+    def write(
+        self, name: str, docstring: str, exprs: Sequence[sp.Basic]
+    ) -> str:
+        """Generate the source code of a function evaluating the given
+        expressions."""
+        lines = [
+            f"def {name}(t, x, p):",
+            f'    """{docstring}"""',
+        ]
+        for prefix, ids in (("x", self.states), ("p", self.parameters)):
+            if ids:
+                targets = ", ".join(f"{prefix}{i}" for i in range(len(ids)))
+                if len(ids) == 1:
+                    targets += ","
+                lines.append(f"    {targets} = {prefix}")
+        for variable, expr in self._needed_rules(exprs):
+            lines.append(
+                f"    {self.names[variable]} = "
+                f"{self.printer.doprint(self._rename(expr))}"
+                f"  # {variable}"
+            )
+        if not exprs:
+            lines.append("    return numpy.empty(0)")
+            return "\n".join(lines)
+
+        replacements, reduced = sp.cse(
+            [self._rename(expr) for expr in exprs],
+            symbols=sp.numbered_symbols("c"),
+        )
+        lines.extend(
+            f"    {sym} = {self.printer.doprint(expr)}"
+            for sym, expr in replacements
+        )
+        values = ", ".join(self.printer.doprint(expr) for expr in reduced)
+        lines.append(f"    return _stack({values})")
+        return "\n".join(lines)
+
+
+def generate_module_source(
+    model: libsbml.Model,
+    observables: Mapping[str, sp.Basic] | None = None,
+    **kwargs,
+) -> str:
+    """Generate the source code of the NumPy module for a model.
+
+    See :mod:`sbmlmath.codegen`.
+
+    :param model: The SBML model.
+    :param observables:
+        Additional expressions to evaluate, by name. May depend on any
+        model entities.
+    :param kwargs:
+        Additional keyword arguments passed to
+        :attr:`SBMLMathMLParser.__init__`. Units are always ignored.
+    :return: The source code.
+    """
+    observables = dict(observables or {})
+    if any(rule.isAlgebraic() for rule in model.getListOfRules()):
+        raise NotImplementedError("Algebraic rules are not supported.")
+
+    expressions = model_math_to_sympy(
+        model, **{**kwargs, "ignore_units": True}
+    )
+    expressions.update(
+        (("observable", name), sp.sympify(expr))
+        for name, expr in observables.items()
+    )
+    _rename_local_parameters(
+        model, expressions, symbol_kwargs=kwargs.get("symbol_kwargs")
+    )
+    expressions = inline_function_definitions(expressions)
+    resolver = RateOfResolver(
+        model,
+        expressions=expressions,
+        symbol_kwargs=kwargs.get("symbol_kwargs"),
+    )
+
+    def prepare(expr: sp.Basic) -> sp.Basic:
+        return _replace_csymbols(resolver.resolve(expr))
+
+    states = _states(model)
+    rhs = [prepare(resolver.rate(state_id)) for state_id in states]
+    rule_keys = DependencyGraph(
+        {
+            key: expr
+            for key, expr in expressions.items()
+            if key[0] == "assignmentRule"
+        }
+    ).topological_order()
+    rules = [(key[1], prepare(expressions[key])) for key in rule_keys]
+    events = [
+        (key[1], prepare(expr))
+        for key, expr in expressions.items()
+        if key[0] == "trigger"
+    ]
+    observable_exprs = [
+        prepare(expressions["observable", name]) for name in observables
+    ]
+
+    defined = {*states, *(variable for variable, _ in rules)}
+    parameters = sorted(
+        {
+            sym.name
+            for expr in (
+                *rhs,
+                *(expr for _, expr in rules),
+                *(expr for _, expr in events),
+                *observable_exprs,
+            )
+            for sym in expr.free_symbols
+            if sym is not _TIME
+        }
+        - defined
+    )
+
+    writer = _FunctionWriter(states, parameters, rules)
+    return (
+        "\n\n\n".join(
+            (
+                _MODULE_HEADER.format(
+                    model_id=model.getId(),
+                    model_hash=model_hash(model, observables, **kwargs),
+                    states=tuple(states),
+                    parameters=tuple(parameters),
+                    assignment_rules=tuple(variable for variable, _ in rules),
+                    events=tuple(event_id for event_id, _ in events),
+                    observables=tuple(observables),
+                ).rstrip("\n"),
+                writer.write("rhs", "Time derivatives of the states.", rhs),
+                writer.write(
+                    "assignment_rules",
+                    "Values of the assignment rule variables.",
+                    [sp.Symbol(variable) for variable, _ in rules],
+                ),
+                writer.write(
+                    "event_triggers",
+                    "Values of the event triggers.",
+                    [expr for _, expr in events],
+                ),
+                writer.write(
+                    "observables",
+                    "Values of the observables.",
+                    observable_exprs,
+                ),
+            )
+        )
+        + "\n"
+    )
+
+
+def load_module(
+    model: libsbml.Model,
+    cache_dir: str | os.PathLike,
+    observables: Mapping[str, sp.Basic] | None = None,
+    **kwargs,
+) -> ModuleType:
+    """Load the generated NumPy module for a model.
+
+    The module is generated and written to ``cache_dir`` only if it does
+    not exist yet. See :mod:`sbmlmath.codegen`.
+
+    :param model: The SBML model.
+    :param cache_dir: The directory for the generated modules.
+    :param observables: See :func:`generate_module_source`.
+    :param kwargs: See :func:`generate_module_source`.
+    :return: The imported module.
+    """
+    module_name = f"sbmlmath_model_{model_hash(model, observables, **kwargs)}"
+    if (module := sys.modules.get(module_name)) is not None:
+        return module
+
+    file = Path(cache_dir, f"{module_name}.py")
+    if not file.exists():
+        file.parent.mkdir(parents=True, exist_ok=True)
+        source = generate_module_source(model, observables, **kwargs)
+        # write atomically, for concurrent processes sharing the cache
+        tmp_file = file.with_suffix(f".{os.getpid()}.tmp")
+        tmp_file.write_text(source, encoding="utf-8")
+        os.replace(tmp_file, file)
+
+    spec = importlib.util.spec_from_file_location(module_name, file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules[module_name] = module
+    return module
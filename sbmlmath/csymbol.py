@@ -68,6 +68,21 @@ class CSymbol(sp.Dummy):
 
         return obj
 
+    def __reduce_ex__(self, protocol):
+        # Re-create through the constructor to restore the attributes and
+        #  to return the cached instance where available.
+        # `_assumptions_orig` is only available in sympy>=1.12
+        assumptions = getattr(self, "_assumptions_orig", None)
+        if assumptions is None:
+            assumptions = self.assumptions0
+        return _new_csymbol, (
+            type(self),
+            self.name,
+            self.definition_url,
+            self.encoding,
+            assumptions,
+        )
+
     def __repr__(self):
         return f"<{self.name}({self.definition_url})>"
 
@@ -100,6 +115,23 @@ class CSymbol(sp.Dummy):
         )
 
 
+def _new_csymbol(
+    cls: type[CSymbol],
+    name: str,
+    definition_url: str,
+    encoding: str,
+    assumptions: dict[str, bool],
+) -> CSymbol:
+    """Create a :class:`CSymbol` (for unpickling)."""
+    return CSymbol.__new__(
+        cls,
+        name,
+        definition_url=definition_url,
+        encoding=encoding,
+        **assumptions,
+    )
+
+
 #: SBML's `Avogadro constant <https://en.wikipedia.org/wiki/Avogadro_constant>`_
 avogadro = CSymbol(
     "avogadro", definition_url="http://www.sbml.org/sbml/symbols/avogadro"
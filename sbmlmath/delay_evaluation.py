@@ -0,0 +1,362 @@
+"""Numerical evaluation of expressions involving SBML ``delay()``.
+
+:class:`SBMLMathMLParser` converts ``delay(x, tau)`` to an opaque
+:class:`CFunction`. :class:`DelayEvaluator` evaluates such expressions
+numerically, for a batch of trajectories at once, based on a
+:class:`DelayHistory` of the model states.
+
+The history is a ring buffer covering the maximum delay, i.e. its memory
+usage is bounded and independent of the length of the trajectories.
+Delayed values are obtained by linear interpolation. Before the first
+recorded time point, the first recorded value is used.
+
+Requires ``numpy``.
+
+>>> import sympy as sp
+>>> from sbmlmath import delay
+>>> x, k = sp.symbols("x k")
+>>> evaluator = DelayEvaluator(
+...     [-k * delay(x, 1)], states=[x], parameters=[k], max_delay=1,
+...     min_step=0.1
+... )
+>>> # explicit Euler for dx/dt = -k * x(t - 1), x(t <= 0) = 1
+>>> t, state, dt = 0.0, np.array([[1.0]]), 0.1
+>>> for _ in range(20):
+...     evaluator.record(t, state)
+...     state = state + dt * evaluator.evaluate(t, state, [1.0])
+...     t += dt
+>>> state.round(3)
+array([[-0.55]])
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Sequence
+
+import numpy as np
+import sympy as sp
+
+from .cfunction import DEF_URL_DELAY
+from .csymbol import CSymbol, TimeSymbol
+
+__all__ = ["DelayEvaluator", "DelayHistory"]
+
+
+class DelayHistory:
+    """Bounded history of the states of a batch of trajectories.
+
+    Stores the time points and states of the last ``max_delay`` time units
+    in a ring buffer. All trajectories of the batch share the time points.
+
+    :param n_states: Number of state variables.
+    :param max_delay: The maximum delay that will be queried.
+    :param min_step:
+        The minimum distance between recorded time points. Determines the
+        capacity of the buffer.
+    :param batch_size: Number of trajectories.
+    """
+
+    def __init__(
+        self,
+        n_states: int,
+        max_delay: float,
+        min_step: float,
+        batch_size: int = 1,
+    ):
+        if max_delay < 0:
+            raise ValueError("max_delay must be non-negative.")
+        if min_step <= 0:
+            raise ValueError("min_step must be positive.")
+        self.max_delay = max_delay
+        self.min_step = min_step
+        #: Number of time points that can be stored.
+        self.capacity = math.ceil(max_delay / min_step) + 2
+        self._times = np.empty(self.capacity)
+        self._values = np.empty((self.capacity, batch_size, n_states))
+        # physical index of the oldest time point
+        self._start = 0
+        # number of stored time points
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def batch_size(self) -> int:
+        return self._values.shape[1]
+
+    @property
+    def n_states(self) -> int:
+        return self._values.shape[2]
+
+    def _physical(self, index):
+        return (self._start + index) % self.capacity
+
+    def record(self, t: float, values: np.ndarray) -> None:
+        """Record the states at the given time.
+
+        :param t:
+            The time. Must not be smaller than the last recorded time.
+            If it equals the last recorded time, the last record is
+            replaced.
+        :param values: The states, of shape ``(batch_size, n_states)``.
+        """
+        values = np.broadcast_to(values, self._values.shape[1:])
+        if self._size:
+            last = self._physical(self._size - 1)
+            t_last = self._times[last]
+            if t < t_last:
+                raise ValueError(
+                    f"Time points must be recorded in order, got {t} after "
+                    f"{t_last}."
+                )
+            if t == t_last:
+                self._values[last] = values
+                return
+
+        # drop time points that are no longer needed for interpolation,
+        #  i.e., all but the last one before `t - max_delay`
+        while (
+            self._size > 1
+            and self._times[self._physical(1)] <= t - self.max_delay
+        ):
+            self._start = self._physical(1)
+            self._size -= 1
+
+        if self._size == self.capacity:
+            raise ValueError(
+                f"History capacity of {self.capacity} time points exceeded. "
+                f"Are time points closer than min_step={self.min_step}?"
+            )
+
+        index = self._physical(self._size)
+        self._times[index] = t
+        self._values[index] = values
+        self._size += 1
+
+    def interpolate(
+        self,
+        t: np.ndarray,
+        t_current: float | None = None,
+        values_current: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Get the (interpolated) states at the given times.
+
+        :param t:
+            The times, one per trajectory, of shape ``(batch_size,)``, or a
+            scalar.
+        :param t_current:
+            Optional current time, after the last recorded time.
+            Times between the last recorded time and ``t_current`` are
+            interpolated between the last record and ``values_current``.
+        :param values_current:
+            The states at ``t_current``, of shape ``(batch_size, n_states)``.
+        :return: The states, of shape ``(batch_size, n_states)``.
+        """
+        if not self._size:
+            if t_current is None:
+                raise ValueError("The history is empty.")
+            return np.broadcast_to(
+                values_current, self._values.shape[1:]
+            ).copy()
+
+        t = np.broadcast_to(np.asarray(t, dtype=float), (self.batch_size,))
+        batch = np.arange(self.batch_size)
+
+        # The ring buffer consists of two sorted segments, where all times
+        #  of the first one precede those of the second one.
+        end = self._start + self._size
+        first = self._times[self._start : min(end, self.capacity)]
+        second = self._times[: max(end - self.capacity, 0)]
+        # logical index of the last time point <= t
+        left = (
+            np.searchsorted(first, t, side="right")
+            + np.searchsorted(second, t, side="right")
+            - 1
+        )
+        # before the first record: constant
+        left = np.maximum(left, 0)
+        right = left + 1
+        beyond = right >= self._size
+
+        t_left = self._times[self._physical(left)]
+        x_left = self._values[self._physical(left), batch]
+        right = self._physical(np.minimum(right, self._size - 1))
+        t_right = self._times[right]
+        x_right = self._values[right, batch]
+        if t_current is not None:
+            t_right = np.where(beyond, t_current, t_right)
+            x_right = np.where(
+                beyond[:, None],
+                np.broadcast_to(values_current, x_right.shape),
+                x_right,
+            )
+
+        span = t_right - t_left
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(
+                span > 0, np.clip((t - t_left) / span, 0, 1), 0.0
+            )
+        return x_left + weight[:, None] * (x_right - x_left)
+
+
+def _is_delay(expr: sp.Basic) -> bool:
+    return getattr(expr.func, "definition_url", None) == DEF_URL_DELAY
+
+
+class DelayEvaluator:
+    """Evaluates expressions involving ``delay()`` for a batch of
+    trajectories.
+
+    The expressions are compiled with :func:`sympy.lambdify`. The delayed
+    expressions are evaluated at the interpolated states of the
+    :attr:`history`, which has to be updated via :meth:`record`.
+
+    :param expressions:
+        The expressions to evaluate. Each expression may depend on the
+        states, the parameters, and time (:class:`TimeSymbol`).
+    :param states: The state variables that are recorded in the history.
+    :param parameters: The parameters.
+    :param max_delay: The maximum delay.
+    :param min_step:
+        The minimum distance between recorded time points, see
+        :class:`DelayHistory`.
+    :param batch_size: Number of trajectories.
+    """
+
+    def __init__(
+        self,
+        expressions: Sequence[sp.Expr],
+        states: Sequence[sp.Symbol],
+        parameters: Sequence[sp.Symbol] = (),
+        max_delay: float = 0.0,
+        min_step: float = 1e-3,
+        batch_size: int = 1,
+    ):
+        self.states = list(states)
+        self.parameters = list(parameters)
+        self.history = DelayHistory(
+            n_states=len(self.states),
+            max_delay=max_delay,
+            min_step=min_step,
+            batch_size=batch_size,
+        )
+
+        time = sp.Dummy("t")
+        delay_symbols: dict[sp.Basic, sp.Dummy] = {}
+        delays = []
+
+        def prepare(expr: sp.Basic) -> sp.Basic:
+            # replace time and constant csymbols, and delays
+            replacements = {}
+            for node in sp.preorder_traversal(expr):
+                if isinstance(node, CSymbol):
+                    if node.definition_url == TimeSymbol.DEFINITION_URL:
+                        replacements[node] = time
+                    else:
+                        replacements[node] = sp.Float(float(node))
+            expr = expr.xreplace(replacements)
+
+            for call in expr.atoms(sp.Function):
+                if not _is_delay(call) or call in delay_symbols:
+                    continue
+                delayed, tau = call.args
+                if any(map(_is_delay, sp.preorder_traversal(delayed))):
+                    raise NotImplementedError(
+                        f"Nested delays are not supported: {call}"
+                    )
+                delay_symbols[call] = sp.Dummy(f"delay_{len(delays)}")
+                delays.append((delayed, prepare(tau)))
+            return expr.xreplace(delay_symbols)
+
+        prepared = [prepare(sp.sympify(expr)) for expr in expressions]
+
+        args = [time, *self.states, *self.parameters]
+        known = set(args)
+        for expr in [*prepared, *(e for pair in delays for e in pair)]:
+            if (
+                unknown := expr.free_symbols
+                - known
+                - set(delay_symbols.values())
+            ):
+                raise ValueError(
+                    f"Expression {expr} depends on unknown symbols {unknown}."
+                )
+
+        self._delay_funcs = [
+            (
+                sp.lambdify(args, delayed, modules="numpy"),
+                sp.lambdify(args, tau, modules="numpy"),
+            )
+            for delayed, tau in delays
+        ]
+        self._func = sp.lambdify(
+            [*args, *delay_symbols.values()], prepared, modules="numpy"
+        )
+
+    def record(self, t: float, states: np.ndarray) -> None:
+        """Record the states of all trajectories at time ``t``.
+
+        See :meth:`DelayHistory.record`.
+        """
+        self.history.record(t, states)
+
+    def evaluate(
+        self,
+        t: float,
+        states: np.ndarray,
+        parameters: np.ndarray | Sequence[float] = (),
+    ) -> np.ndarray:
+        """Evaluate the expressions.
+
+        :param t: The current time.
+        :param states:
+            The current states, of shape ``(batch_size, n_states)``.
+            May be more recent than the last recorded states.
+        :param parameters:
+            The parameters, of shape ``(batch_size, n_parameters)`` or
+            ``(n_parameters,)``.
+        :return:
+            The values of the expressions, of shape
+            ``(batch_size, n_expressions)``.
+        """
+        batch_size = self.history.batch_size
+        states = np.broadcast_to(
+            np.asarray(states, dtype=float),
+            (batch_size, len(self.states)),
+        )
+        parameters = np.broadcast_to(
+            np.asarray(parameters, dtype=float),
+            (batch_size, len(self.parameters)),
+        )
+        state_args = list(states.T)
+        parameter_args = list(parameters.T)
+
+        delayed_values = []
+        for delayed_func, tau_func in self._delay_funcs:
+            tau = np.broadcast_to(
+                tau_func(t, *state_args, *parameter_args), (batch_size,)
+            )
+            if np.any(tau < 0) or np.any(tau > self.history.max_delay):
+                raise ValueError(
+                    f"Delay must be in [0, {self.history.max_delay}], "
+                    f"got {tau}."
+                )
+            t_delayed = t - tau
+            states_delayed = self.history.interpolate(
+                t_delayed, t_current=t, values_current=states
+            )
+            delayed_values.append(
+                np.broadcast_to(
+                    delayed_func(
+                        t_delayed, *states_delayed.T, *parameter_args
+                    ),
+                    (batch_size,),
+                )
+            )
+
+        results = self._func(t, *state_args, *parameter_args, *delayed_values)
+        return np.stack(
+            [np.broadcast_to(r, (batch_size,)) for r in results], axis=-1
+        )
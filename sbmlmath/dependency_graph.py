@@ -0,0 +1,254 @@
+"""Dependency graph of the math elements of an SBML model."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+
+import sympy as sp
+from sympy.core.function import AppliedUndef
+
+from .csymbol import CSymbol
+
+__all__ = ["DependencyGraph", "math_dependencies"]
+
+#: Math elements whose key identifies the model entity they define.
+_DEFINING_ELEMENTS = (
+    "assignmentRule",
+    "initialAssignment",
+    "functionDefinition",
+)
+
+Key = tuple[str, str]
+
+
+def math_dependencies(expr: sp.Basic) -> frozenset[str]:
+    """Get the ids of the model entities an expression depends on.
+
+    These are the names of all free symbols, except for ``<csymbol>``s,
+    and the names of all called functions, except for ``<csymbol>``
+    functions.
+
+    >>> import sympy as sp
+    >>> from sbmlmath import TimeSymbol
+    >>> sorted(math_dependencies(sp.sympify("f(a) + b") * TimeSymbol("t")))
+    ['a', 'b', 'f']
+
+    :param expr: The expression.
+    :return: The ids of the model entities.
+    """
+    names = {
+        symbol.name
+        for symbol in expr.free_symbols
+        if not isinstance(symbol, CSymbol)
+    }
+    names.update(
+        call.func.__name__
+        for call in expr.atoms(AppliedUndef)
+        if not hasattr(call.func, "definition_url")
+    )
+    return frozenset(names)
+
+
+class DependencyGraph:
+    """Dependencies between the math elements of an SBML model.
+
+    Math elements are identified by keys as described in
+    :func:`sbmlmath.xml_document_math_to_sympy`. Assignment rules, initial
+    assignments and function definitions define the entity given by their
+    key. An element depends on another element if it uses an entity defined
+    by the other element.
+
+    The graph is updated incrementally via :meth:`update` and
+    :meth:`remove`.
+
+    >>> import libsbml
+    >>> from sbmlmath import model_math_to_sympy
+    >>> doc = libsbml.SBMLDocument(3, 2)
+    >>> model = doc.createModel()
+    >>> for variable, formula in (("c", "b + 1"), ("b", "2 * a")):
+    ...     rule = model.createAssignmentRule()
+    ...     _ = rule.setVariable(variable)
+    ...     _ = rule.setMath(libsbml.parseL3Formula(formula))
+    >>> graph = DependencyGraph(model_math_to_sympy(model))
+    >>> graph.topological_order()
+    [('assignmentRule', 'b'), ('assignmentRule', 'c')]
+    >>> graph.dependents["b"]
+    {('assignmentRule', 'c')}
+
+    :param expressions:
+        The converted math of a model, as returned by, e.g.,
+        :func:`sbmlmath.model_math_to_sympy`.
+    """
+
+    def __init__(self, expressions: Mapping[Key, sp.Basic] | None = None):
+        #: The entities each element depends on, by element key
+        self.dependencies: dict[Key, frozenset[str]] = {}
+        #: The elements depending on each entity, by entity id
+        self.dependents: dict[str, set[Key]] = {}
+        #: The elements defining each entity, by entity id
+        self.definitions: dict[str, set[Key]] = {}
+        # strongly connected components, invalidated on change
+        self._components: list[list[Key]] | None = None
+
+        for key, expr in (expressions or {}).items():
+            self.update(key, expr)
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self.dependencies
+
+    def __len__(self) -> int:
+        return len(self.dependencies)
+
+    def update(self, key: Key, expr: sp.Basic) -> None:
+        """Add or replace the math element with the given key.
+
+        :param key: The key of the math element.
+        :param expr: The (new) expression of the math element.
+        """
+        self.set_dependencies(key, math_dependencies(expr))
+
+    def set_dependencies(self, key: Key, dependencies: Iterable[str]):
+        """Add or replace a math element with the given dependencies.
+
+        :param key: The key of the math element.
+        :param dependencies: The ids of the entities the element depends on.
+        """
+        dependencies = frozenset(dependencies)
+        old = self.dependencies.get(key)
+        if old == dependencies:
+            return
+        if old is not None:
+            for name in old - dependencies:
+                self._discard(self.dependents, name, key)
+        else:
+            element_name, element_id = key
+            if element_name in _DEFINING_ELEMENTS:
+                self.definitions.setdefault(element_id, set()).add(key)
+
+        for name in dependencies - (old or frozenset()):
+            self.dependents.setdefault(name, set()).add(key)
+        self.dependencies[key] = dependencies
+        self._components = None
+
+    def remove(self, key: Key) -> None:
+        """Remove the math element with the given key.
+
+        :param key: The key of the math element.
+        """
+        for name in self.dependencies.pop(key):
+            self._discard(self.dependents, name, key)
+        element_name, element_id = key
+        if element_name in _DEFINING_ELEMENTS:
+            self._discard(self.definitions, element_id, key)
+        self._components = None
+
+    @staticmethod
+    def _discard(index: dict[str, set[Key]], name: str, key: Key):
+        keys = index[name]
+        keys.discard(key)
+        if not keys:
+            del index[name]
+
+    def direct_dependencies(self, key: Key) -> set[Key]:
+        """Get the elements the given element directly depends on."""
+        return {
+            dependency
+            for name in self.dependencies[key]
+            for dependency in self.definitions.get(name, ())
+        }
+
+    def direct_dependents(self, key: Key) -> set[Key]:
+        """Get the elements that directly depend on the given element."""
+        element_name, element_id = key
+        if element_name not in _DEFINING_ELEMENTS:
+            return set()
+        return set(self.dependents.get(element_id, ()))
+
+    def strongly_connected_components(self) -> list[list[Key]]:
+        """Get the strongly connected components of the graph.
+
+        Components with more than one element, or elements depending on
+        themselves, indicate cyclic dependencies.
+
+        :return:
+            The strongly connected components, ordered such that each
+            component only depends on preceding components.
+        """
+        if self._components is None:
+            self._components = self._tarjan()
+        return [list(component) for component in self._components]
+
+    def _tarjan(self) -> list[list[Key]]:  # noqa C901
+        """Tarjan's algorithm (iterative)."""
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        components = []
+        counter = 0
+
+        for root in self.dependencies:
+            if root in index:
+                continue
+            # (node, iterator over successors)
+            work = [(root, iter(sorted(self.direct_dependencies(root))))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, successors = work[-1]
+                for successor in successors:
+                    if successor not in index:
+                        index[successor] = lowlink[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append(
+                            (
+                                successor,
+                                iter(
+                                    sorted(self.direct_dependencies(successor))
+                                ),
+                            )
+                        )
+                        break
+                    if successor in on_stack:
+                        lowlink[node] = min(lowlink[node], index[successor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.remove(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+        return components
+
+    def is_cyclic(self, component: list[Key]) -> bool:
+        """Check whether a strongly connected component is a cycle."""
+        return len(component) > 1 or component[0] in self.direct_dependencies(
+            component[0]
+        )
+
+    def topological_order(self) -> list[Key]:
+        """Get all elements in dependency order.
+
+        :return: The element keys, such that each element only depends on
+            preceding elements.
+        :raises ValueError: If there are cyclic dependencies.
+        """
+        order = []
+        for component in self.strongly_connected_components():
+            if self.is_cyclic(component):
+                raise ValueError(
+                    f"Cyclic dependencies between {sorted(component)}."
+                )
+            order.extend(component)
+        return order
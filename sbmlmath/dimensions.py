@@ -0,0 +1,706 @@
+"""Dimensional consistency of the math of an SBML model.
+
+:class:`DimensionChecker` propagates dimensions bottom-up through the
+:class:`libsbml.ASTNode` trees of a model. Dimensions are vectors of
+exponents of the SI base units (and ``item``), derived from the model's
+unit definitions, the units of the model entities, and the units attached
+to ``<cn>`` elements. Only dimensions are checked; scales and multipliers
+of units are ignored.
+
+Numbers without units and entities without (derivable) units have
+undeclared units, which are compatible with any units.
+
+Each math element is checked in time linear in the size of its math.
+The body of a function definition is checked once per distinct combination
+of argument dimensions it is called with, and the result is reused for all
+further calls. Neither sympy nor libsbml's unit consistency checks are
+involved.
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable
+from dataclasses import dataclass
+from fractions import Fraction
+
+import libsbml
+
+from .model import iter_math_elements
+
+__all__ = [
+    "DimensionChecker",
+    "DimensionMismatch",
+    "check_model_dimensions",
+    "format_dimension",
+]
+
+#: The base units spanning the dimension vectors
+BASE_UNITS = (
+    "metre",
+    "kilogram",
+    "second",
+    "ampere",
+    "kelvin",
+    "mole",
+    "candela",
+    "item",
+)
+
+Dimension = tuple[Fraction, ...]
+
+DIMENSIONLESS: Dimension = (Fraction(0),) * len(BASE_UNITS)
+
+#: Builtin units of SBML Level 1 and 2, unless redefined
+_BUILTIN_UNITS = {
+    "substance": {"mole": 1},
+    "time": {"second": 1},
+    "volume": {"metre": 3},
+    "area": {"metre": 2},
+    "length": {"metre": 1},
+}
+
+#: Functions whose arguments and values are dimensionless
+_DIMENSIONLESS_FUNCTIONS = frozenset(
+    getattr(libsbml, f"AST_FUNCTION_{name}")
+    for name in (
+        "ARCCOS ARCCOSH ARCCOT ARCCOTH ARCCSC ARCCSCH ARCSEC ARCSECH ARCSIN "
+        "ARCSINH ARCTAN ARCTANH COS COSH COT COTH CSC CSCH EXP FACTORIAL LN "
+        "LOG SEC SECH SIN SINH TAN TANH"
+    ).split()
+)
+
+#: Operations whose arguments and value have the same units
+_SAME_UNITS = frozenset(
+    (
+        libsbml.AST_PLUS,
+        libsbml.AST_MINUS,
+        libsbml.AST_FUNCTION_ABS,
+        libsbml.AST_FUNCTION_CEILING,
+        libsbml.AST_FUNCTION_FLOOR,
+        libsbml.AST_FUNCTION_MAX,
+        libsbml.AST_FUNCTION_MIN,
+        libsbml.AST_FUNCTION_REM,
+    )
+)
+
+_RELATIONAL = frozenset(
+    getattr(libsbml, f"AST_RELATIONAL_{name}")
+    for name in ("EQ", "GEQ", "GT", "LEQ", "LT", "NEQ")
+)
+
+_LOGICAL = frozenset(
+    getattr(libsbml, f"AST_LOGICAL_{name}")
+    for name in ("AND", "IMPLIES", "NOT", "OR", "XOR")
+)
+
+_NUMBERS = frozenset(
+    (
+        libsbml.AST_INTEGER,
+        libsbml.AST_REAL,
+        libsbml.AST_REAL_E,
+        libsbml.AST_RATIONAL,
+    )
+)
+
+
+def _dimension(exponents: dict[str, float]) -> Dimension:
+    return tuple(
+        Fraction(exponents.get(base_unit, 0)).limit_denominator()
+        for base_unit in BASE_UNITS
+    )
+
+
+def _add(a: Dimension, b: Dimension) -> Dimension:
+    return tuple(x + y for x, y in zip(a, b, strict=True))
+
+
+def _scale(a: Dimension, factor: Fraction) -> Dimension:
+    return tuple(x * factor for x in a)
+
+
+def _negate(a: Dimension) -> Dimension:
+    return tuple(-x for x in a)
+
+
+def format_dimension(dimension: Dimension | None) -> str:
+    """Format a dimension vector.
+
+    >>> from fractions import Fraction
+    >>> format_dimension(
+    ...     (Fraction(-3), 0, Fraction(-1), 0, 0, Fraction(1), 0, 0)
+    ... )
+    'metre^-3 * second^-1 * mole'
+
+    :param dimension: The dimension vector, or ``None`` for undeclared
+        units.
+    :return: The formatted dimension.
+    """
+    if dimension is None:
+        return "undeclared"
+    if dimension == DIMENSIONLESS:
+        return "dimensionless"
+    return " * ".join(
+        base_unit if exponent == 1 else f"{base_unit}^{exponent}"
+        for base_unit, exponent in zip(BASE_UNITS, dimension, strict=True)
+        if exponent
+    )
+
+
+@dataclass(frozen=True)
+class DimensionMismatch:
+    """A dimensional inconsistency in a math element."""
+
+    #: The key of the math element, as described in
+    #: :func:`sbmlmath.xml_document_math_to_sympy`
+    key: tuple[str, str]
+    #: Description of the inconsistency
+    message: str
+
+    def __str__(self):
+        return f"{self.key[0]} {self.key[1]!r}: {self.message}"
+
+
+class _Context:
+    """State for checking a single math element."""
+
+    __slots__ = ("key", "bindings", "mismatches")
+
+    def __init__(self, key: tuple[str, str]):
+        self.key = key
+        # dimensions of the bound variables of function definitions and of
+        #  local parameters
+        self.bindings: dict[str, Dimension | None] = {}
+        self.mismatches: list[DimensionMismatch] = []
+
+    def report(self, node: libsbml.ASTNode, message: str):
+        formula = libsbml.formulaToL3String(node)
+        self.mismatches.append(
+            DimensionMismatch(self.key, f"{message} in `{formula}`")
+        )
+
+
+class DimensionChecker:
+    """Checks the dimensional consistency of the math of an SBML model.
+
+    The dimensions of all model entities are derived once, when the checker
+    is created.
+
+    >>> import libsbml
+    >>> doc = libsbml.SBMLDocument(3, 2)
+    >>> model = doc.createModel()
+    >>> _ = model.setTimeUnits("second")
+    >>> for parameter_id, units in (("x", "mole"), ("k", "second")):
+    ...     parameter = model.createParameter()
+    ...     _ = parameter.setId(parameter_id)
+    ...     _ = parameter.setUnits(units)
+    >>> for variable, formula in (("x", "x * k + x"), ("k", "x")):
+    ...     rule = model.createRateRule()
+    ...     _ = rule.setVariable(variable)
+    ...     _ = rule.setMath(libsbml.parseL3Formula(formula))
+    >>> for mismatch in DimensionChecker(model).check():
+    ...     print(mismatch)
+    rateRule 'x': Inconsistent units: second * mole and mole in `x * k + x`
+    rateRule 'k': Expected dimensionless, got mole
+
+    :param model: The SBML model.
+    """
+
+    def __init__(self, model: libsbml.Model):
+        self.model = model
+        self._level = model.getLevel()
+        # dimensions, by unit id
+        self._unit_dimensions: dict[str, Dimension | None] = {}
+        #: The dimensions of the model entities, by id
+        self.dimensions: dict[str, Dimension | None] = {}
+        # function definitions, by id
+        self._functions: dict[str, libsbml.ASTNode] = {}
+        # dimensions and mismatch messages of function definition calls,
+        #  by function id and argument dimensions
+        self._calls: dict[
+            tuple[str, tuple[Dimension | None, ...]],
+            tuple[Dimension | None, list[str]],
+        ] = {}
+
+        self._time = self.units_dimension(
+            model.getTimeUnits() if self._level > 2 else "time"
+        )
+        self._init_entity_dimensions()
+
+    def units_dimension(self, units: str) -> Dimension | None:
+        """Get the dimension of the given units.
+
+        :param units: The id of a unit definition or a base unit.
+        :return: The dimension, or ``None`` if undeclared or unknown.
+        """
+        try:
+            return self._unit_dimensions[units]
+        except KeyError:
+            pass
+
+        result = None
+        if unit_definition := self.model.getUnitDefinition(units):
+            result = DIMENSIONLESS
+            for unit in unit_definition.getListOfUnits():
+                result = _add(
+                    result,
+                    _scale(
+                        _kind_dimension(unit.getKind()),
+                        Fraction(unit.getExponentAsDouble()),
+                    ),
+                )
+        elif (kind := libsbml.UnitKind_forName(units)) != (
+            libsbml.UNIT_KIND_INVALID
+        ):
+            result = _kind_dimension(kind)
+        elif self._level < 3 and units in _BUILTIN_UNITS:
+            result = _dimension(_BUILTIN_UNITS[units])
+
+        self._unit_dimensions[units] = result
+        return result
+
+    def _init_entity_dimensions(self):  # noqa C901
+        model = self.model
+        level = self._level
+
+        for compartment in model.getListOfCompartments():
+            if compartment.isSetUnits():
+                units = compartment.getUnits()
+            else:
+                units = {
+                    3: "volume",
+                    2: "area",
+                    1: "length",
+                }.get(compartment.getSpatialDimensions())
+                if units and level > 2:
+                    units = getattr(model, f"get{units.capitalize()}Units")()
+            self.dimensions[compartment.getId()] = (
+                self.units_dimension(units) if units else None
+            )
+
+        for species in model.getListOfSpecies():
+            if species.isSetSubstanceUnits():
+                substance = species.getSubstanceUnits()
+            else:
+                substance = (
+                    model.getSubstanceUnits() if level > 2 else "substance"
+                )
+            dimension = self.units_dimension(substance) if substance else None
+            if (
+                dimension is not None
+                and not species.getHasOnlySubstanceUnits()
+            ):
+                size = self.dimensions.get(species.getCompartment())
+                dimension = (
+                    None if size is None else _add(dimension, _negate(size))
+                )
+            self.dimensions[species.getId()] = dimension
+
+        for parameter in model.getListOfParameters():
+            self.dimensions[parameter.getId()] = (
+                self.units_dimension(parameter.getUnits())
+                if parameter.isSetUnits()
+                else None
+            )
+
+        if level > 2:
+            extent = (
+                self.units_dimension(model.getExtentUnits())
+                if model.isSetExtentUnits()
+                else None
+            )
+        else:
+            extent = self.units_dimension("substance")
+        rate = (
+            None
+            if extent is None or self._time is None
+            else _add(extent, _negate(self._time))
+        )
+        for reaction in model.getListOfReactions():
+            if level > 2:
+                self.dimensions[reaction.getId()] = rate
+                for reference in (
+                    *reaction.getListOfReactants(),
+                    *reaction.getListOfProducts(),
+                ):
+                    if reference.isSetId():
+                        self.dimensions[reference.getId()] = DIMENSIONLESS
+        self._reaction_rate = rate
+
+        for function_definition in model.getListOfFunctionDefinitions():
+            if function_definition.isSetMath():
+                self._functions[function_definition.getId()] = (
+                    function_definition.getMath()
+                )
+
+    def _expected_dimension(self, element: libsbml.SBase) -> Dimension | None:
+        """The dimension the math of the given element should have."""
+        type_code = element.getTypeCode()
+        if type_code in (
+            libsbml.SBML_ASSIGNMENT_RULE,
+            libsbml.SBML_INITIAL_ASSIGNMENT,
+            libsbml.SBML_EVENT_ASSIGNMENT,
+        ):
+            variable = (
+                element.getSymbol()
+                if type_code == libsbml.SBML_INITIAL_ASSIGNMENT
+                else element.getVariable()
+            )
+            return self.dimensions.get(variable)
+        if type_code == libsbml.SBML_RATE_RULE:
+            dimension = self.dimensions.get(element.getVariable())
+            if dimension is None or self._time is None:
+                return None
+            return _add(dimension, _negate(self._time))
+        if type_code == libsbml.SBML_KINETIC_LAW:
+            return self._reaction_rate
+        if type_code == libsbml.SBML_DELAY:
+            return self._time
+        return None
+
+    def check_element(
+        self, key: tuple[str, str], element: libsbml.SBase
+    ) -> list[DimensionMismatch]:
+        """Check the math of a single SBML element.
+
+        :param key:
+            The key of the math element, as described in
+            :func:`sbmlmath.xml_document_math_to_sympy`.
+        :param element: The SBML element with math.
+        :return: The mismatches found.
+        """
+        context = _Context(key)
+        if element.getTypeCode() == libsbml.SBML_KINETIC_LAW:
+            # local parameters shadow the model entities
+            context.bindings = {
+                parameter.getId(): (
+                    self.units_dimension(parameter.getUnits())
+                    if parameter.isSetUnits()
+                    else None
+                )
+                for parameter in (
+                    element.getListOfLocalParameters()
+                    if self._level > 2
+                    else element.getListOfParameters()
+                )
+            }
+        ast_node = element.getMath()
+        if ast_node.getType() == libsbml.AST_LAMBDA:
+            # function definition: the arguments have undeclared units
+            ast_node = ast_node.getChild(ast_node.getNumChildren() - 1)
+        dimension = self.dimension(ast_node, context)
+
+        expected = self._expected_dimension(element)
+        if (
+            expected is not None
+            and dimension is not None
+            and expected != dimension
+        ):
+            context.mismatches.append(
+                DimensionMismatch(
+                    key,
+                    f"Expected {format_dimension(expected)}, "
+                    f"got {format_dimension(dimension)}",
+                )
+            )
+        # the same mismatch in a function definition may be reported by
+        #  multiple calls
+        return list(dict.fromkeys(context.mismatches))
+
+    def check(
+        self,
+        elements: Iterable[tuple[tuple[str, str], libsbml.SBase]]
+        | None = None,
+    ) -> list[DimensionMismatch]:
+        """Check the math of the model.
+
+        :param elements:
+            The ``(key, element)`` pairs to check. Defaults to all elements
+            with math, see :func:`sbmlmath.iter_math_elements`.
+        :return: The mismatches found, in the order of the elements.
+        """
+        if elements is None:
+            elements = iter_math_elements(self.model)
+        return [
+            mismatch
+            for key, element in elements
+            for mismatch in self.check_element(key, element)
+        ]
+
+    def dimension(  # noqa C901
+        self, node: libsbml.ASTNode, context: _Context
+    ) -> Dimension | None:
+        """Derive the dimension of an ASTNode.
+
+        Mismatches are reported to ``context``. Subtrees with mismatches
+        are considered to have undeclared units to avoid follow-up
+        reports.
+        """
+        node_type = node.getType()
+
+        if node_type in _NUMBERS:
+            return (
+                self.units_dimension(node.getUnits())
+                if node.isSetUnits()
+                else None
+            )
+        if node_type == libsbml.AST_NAME:
+            name = node.getName()
+            if name in context.bindings:
+                return context.bindings[name]
+            return self.dimensions.get(name)
+        if node_type == libsbml.AST_NAME_TIME:
+            return self._time
+        if node_type in (
+            libsbml.AST_NAME_AVOGADRO,
+            libsbml.AST_CONSTANT_E,
+            libsbml.AST_CONSTANT_PI,
+            libsbml.AST_CONSTANT_TRUE,
+            libsbml.AST_CONSTANT_FALSE,
+        ):
+            return DIMENSIONLESS
+
+        children = [
+            self.dimension(node.getChild(i), context)
+            for i in range(node.getNumChildren())
+        ]
+
+        if node_type in _SAME_UNITS or node_type in _RELATIONAL:
+            dimension = self._same(node, children, context)
+            return DIMENSIONLESS if node_type in _RELATIONAL else dimension
+
+        if node_type == libsbml.AST_TIMES:
+            if any(child is None for child in children):
+                return None
+            result = DIMENSIONLESS
+            for child in children:
+                result = _add(result, child)
+            return result
+
+        if node_type == libsbml.AST_DIVIDE:
+            numerator, denominator = children
+            if numerator is None or denominator is None:
+                return None
+            return _add(numerator, _negate(denominator))
+
+        if node_type == libsbml.AST_FUNCTION_QUOTIENT:
+            return DIMENSIONLESS if None not in children else None
+
+        if node_type in (libsbml.AST_POWER, libsbml.AST_FUNCTION_POWER):
+            base, exponent = children
+            return self._power(node, base, exponent, node.getChild(1), context)
+
+        if node_type == libsbml.AST_FUNCTION_ROOT:
+            if len(children) == 1:
+                degree_node, (base,), degree = None, children, None
+            else:
+                degree_node = node.getChild(0)
+                degree, base = children
+            return self._power(
+                node, base, degree, degree_node, context, inverse=True
+            )
+
+        if node_type in _DIMENSIONLESS_FUNCTIONS:
+            for i, child in enumerate(children):
+                self._require_dimensionless(node.getChild(i), child, context)
+            return DIMENSIONLESS
+
+        if node_type in _LOGICAL:
+            return DIMENSIONLESS
+
+        if node_type == libsbml.AST_FUNCTION_PIECEWISE:
+            # pieces are (value, condition) pairs, followed by an optional
+            #  otherwise value; conditions are Boolean
+            return self._same(node, children[0::2], context)
+
+        if node_type == libsbml.AST_FUNCTION_DELAY:
+            value, delay = children
+            if (
+                delay is not None
+                and self._time is not None
+                and delay != self._time
+            ):
+                context.report(
+                    node,
+                    f"Expected delay in {format_dimension(self._time)}, "
+                    f"got {format_dimension(delay)}",
+                )
+            return value
+
+        if node_type == libsbml.AST_FUNCTION_RATE_OF:
+            (value,) = children
+            if value is None or self._time is None:
+                return None
+            return _add(value, _negate(self._time))
+
+        if node_type == libsbml.AST_FUNCTION:
+            return self._call(node, children, context)
+
+        # anything else (e.g., unsupported MathML or package constructs)
+        return None
+
+    def _same(
+        self,
+        node: libsbml.ASTNode,
+        children: list[Dimension | None],
+        context: _Context,
+    ) -> Dimension | None:
+        """Check that all children have compatible dimensions."""
+        result = None
+        for child in children:
+            if child is None:
+                continue
+            if result is None:
+                result = child
+            elif child != result:
+                context.report(
+                    node,
+                    f"Inconsistent units: {format_dimension(result)} "
+                    f"and {format_dimension(child)}",
+                )
+                return None
+        return result
+
+    def _require_dimensionless(
+        self,
+        node: libsbml.ASTNode,
+        dimension: Dimension | None,
+        context: _Context,
+    ):
+        if dimension is not None and dimension != DIMENSIONLESS:
+            context.report(
+                node,
+                f"Expected dimensionless, got {format_dimension(dimension)}",
+            )
+
+    def _power(
+        self,
+        node: libsbml.ASTNode,
+        base: Dimension | None,
+        exponent: Dimension | None,
+        exponent_node: libsbml.ASTNode | None,
+        context: _Context,
+        inverse: bool = False,
+    ) -> Dimension | None:
+        """Dimension of a power or root."""
+        if exponent_node is None:
+            # square root
+            value = Fraction(2)
+        else:
+            self._require_dimensionless(exponent_node, exponent, context)
+            value = _constant_value(exponent_node)
+
+        if base is None or base == DIMENSIONLESS:
+            return base
+        if value is None:
+            context.report(
+                node,
+                f"Non-constant exponent for base in {format_dimension(base)}",
+            )
+            return None
+        if inverse:
+            if value == 0:
+                return None
+            value = 1 / value
+        return _scale(base, value)
+
+    def _call(
+        self,
+        node: libsbml.ASTNode,
+        children: list[Dimension | None],
+        context: _Context,
+    ) -> Dimension | None:
+        """Dimension of a function definition call.
+
+        The function body is checked with the dimensions of the arguments.
+        The results are memoized, and the mismatches found in the body are
+        reported again for each call (but only once per math element).
+        """
+        name = node.getName()
+        if (function := self._functions.get(name)) is None:
+            return None
+        n_args = function.getNumChildren() - 1
+        if n_args != len(children):
+            return None
+
+        call_key = (name, tuple(children))
+        if (call := self._calls.get(call_key)) is None:
+            body_context = _Context(context.key)
+            body_context.bindings = {
+                function.getChild(i).getName(): children[i]
+                for i in range(n_args)
+            }
+            dimension = self.dimension(function.getChild(n_args), body_context)
+            call = self._calls[call_key] = (
+                dimension,
+                list(
+                    dict.fromkeys(
+                        mismatch.message
+                        for mismatch in body_context.mismatches
+                    )
+                ),
+            )
+
+        dimension, messages = call
+        context.mismatches.extend(
+            DimensionMismatch(context.key, message) for message in messages
+        )
+        return dimension
+
+
+_kind_dimensions: dict[int, Dimension] = {}
+
+
+def _kind_dimension(kind: int) -> Dimension:
+    """Get the dimension of a libsbml unit kind."""
+    try:
+        return _kind_dimensions[kind]
+    except KeyError:
+        pass
+    unit = libsbml.Unit(3, 2)
+    unit.setKind(kind)
+    unit.setExponent(1)
+    unit.setScale(0)
+    unit.setMultiplier(1)
+    si = libsbml.Unit.convertToSI(unit)
+    result = _dimension(
+        {
+            libsbml.UnitKind_toString(si_unit.getKind()): (
+                si_unit.getExponentAsDouble()
+            )
+            for si_unit in si.getListOfUnits()
+        }
+    )
+    _kind_dimensions[kind] = result
+    return result
+
+
+def _constant_value(node: libsbml.ASTNode) -> Fraction | None:
+    """Get the value of a constant exponent, if it is one."""
+    node_type = node.getType()
+    if node_type in _NUMBERS:
+        value = node.getValue()
+        if not math.isfinite(value):
+            return None
+        return Fraction(value).limit_denominator()
+    if node_type == libsbml.AST_MINUS and node.getNumChildren() == 1:
+        value = _constant_value(node.getChild(0))
+        return None if value is None else -value
+    if node_type == libsbml.AST_DIVIDE:
+        numerator = _constant_value(node.getChild(0))
+        denominator = _constant_value(node.getChild(1))
+        if numerator is None or not denominator:
+            return None
+        return numerator / denominator
+    return None
+
+
+def check_model_dimensions(model: libsbml.Model) -> list[DimensionMismatch]:
+    """Check the dimensional consistency of the math of an SBML model.
+
+    See :class:`DimensionChecker`.
+
+    :param model: The SBML model.
+    :return: The mismatches found.
+    """
+    return DimensionChecker(model).check()
@@ -0,0 +1,478 @@
+"""SQLite-backed store of deduplicated SBML math for corpus analytics.
+
+Across large model corpora, most math elements, in particular kinetic laws,
+are repeated with only the symbol names changed. :class:`ExpressionStore`
+keeps each canonical expression (see :func:`sbmlmath.canonicalize`) once,
+keyed by its structural hash (see :func:`sbmlmath.structural_hash`), and
+maps the math elements of each model to these entries, together with the
+original symbol names.
+
+Each canonical expression is indexed by its *features*, so that queries
+such as "all models using ``rateOf``" or "all Hill-type kinetic laws" do
+not require re-parsing any models:
+
+``csymbol:<definitionURL>``
+    Use of a ``<csymbol>``, e.g.,
+    ``csymbol:http://www.sbml.org/sbml/symbols/rateOf``.
+``function:<name>``
+    Call of a function definition.
+``units:<units>``
+    A number with the given units.
+``op:<name>``
+    Use of the sympy operator or function, e.g., ``op:Piecewise``.
+``pattern:<name>``
+    Match of one of the rate law patterns in :data:`PATTERNS`, e.g.,
+    ``pattern:hill``.
+
+>>> import libsbml
+>>> from sbmlmath import sbml_math_to_sympy
+>>> with ExpressionStore() as store:
+...     for model_id, formula in (
+...         ("m1", "Vmax * S^n / (K^n + S^n)"),
+...         ("m2", "V * A^h / (KA^h + A^h)"),
+...         ("m3", "k * A * B"),
+...     ):
+...         store.add_model(
+...             model_id,
+...             {("kineticLaw", "R1"): sbml_math_to_sympy(
+...                 libsbml.parseL3Formula(formula))},
+...         )
+...     len(store), store.models_with("pattern:hill")
+(2, ['m1', 'm2'])
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import Any
+
+import sympy as sp
+from pint import Quantity
+from sympy.core.function import UndefinedFunction
+
+from .cfunction import CFunction
+from .csymbol import CSymbol
+from .model import sbml_file_math_to_sympy
+from .serialization import dumps, loads
+from .structural import (
+    _children,
+    _is_renamable,
+    _renamed,
+    _xreplace,
+    canonicalize,
+    structural_hash,
+)
+
+__all__ = ["ExpressionStore"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS expressions (
+    id INTEGER PRIMARY KEY,
+    hash BLOB NOT NULL UNIQUE,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS features (
+    feature TEXT NOT NULL,
+    expression_id INTEGER NOT NULL REFERENCES expressions(id),
+    PRIMARY KEY (feature, expression_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS elements (
+    model_id TEXT NOT NULL,
+    element_name TEXT NOT NULL,
+    element_id TEXT NOT NULL,
+    expression_id INTEGER NOT NULL REFERENCES expressions(id),
+    symbols TEXT NOT NULL,
+    PRIMARY KEY (model_id, element_name, element_id)
+);
+CREATE INDEX IF NOT EXISTS elements_expression_id
+    ON elements (expression_id);
+"""
+
+
+def _nodes(expr: sp.Basic | Quantity) -> Iterator[Any]:
+    """Iterate over all nodes of an expression in pre-order."""
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(_children(node)))
+
+
+def _factors(expr: sp.Basic) -> list[sp.Basic]:
+    """Get the factors of a (possibly nested, unevaluated) product."""
+    if not isinstance(expr, sp.Mul):
+        return [expr]
+    return [factor for arg in expr.args for factor in _factors(arg)]
+
+
+def _terms(expr: sp.Basic) -> list[sp.Basic]:
+    """Get the terms of a (possibly nested, unevaluated) sum."""
+    if not isinstance(expr, sp.Add):
+        return [expr]
+    return [term for arg in expr.args for term in _terms(arg)]
+
+
+def _saturating_terms(mul: sp.Mul) -> Iterator[tuple[sp.Basic, list]]:
+    """Iterate over the terms of the denominator sums of a product, together
+    with the remaining factors."""
+    factors = _factors(mul)
+    for i, factor in enumerate(factors):
+        if (
+            isinstance(factor, sp.Pow)
+            and factor.exp == -1
+            and isinstance(factor.base, sp.Add)
+        ):
+            others = factors[:i] + factors[i + 1 :]
+            for term in _terms(factor.base):
+                yield term, others
+
+
+def _is_hill(expr: sp.Basic | Quantity) -> bool:
+    """Whether the expression contains a Hill-type term
+    ``... x^n / (... + x^n)`` with ``n`` not 1."""
+    return any(
+        isinstance(term, sp.Pow) and term.exp not in (1, -1) and term in others
+        for mul in _nodes(expr)
+        if isinstance(mul, sp.Mul)
+        for term, others in _saturating_terms(mul)
+    )
+
+
+def _is_michaelis_menten(expr: sp.Basic | Quantity) -> bool:
+    """Whether the expression contains a Michaelis-Menten-type term
+    ``... x / (K + x)`` with a symbol ``x``."""
+    return any(
+        _is_renamable(term) and term in others
+        for mul in _nodes(expr)
+        if isinstance(mul, sp.Mul)
+        for term, others in _saturating_terms(mul)
+    )
+
+
+#: Rate law patterns indexed as ``pattern:<name>`` features, as functions
+#: of the canonical expression
+PATTERNS: dict[str, Callable[[sp.Basic | Quantity], bool]] = {
+    "hill": _is_hill,
+    "michaelis_menten": _is_michaelis_menten,
+}
+
+
+def _features(expr: sp.Basic | Quantity) -> set[str]:
+    """Get the features of an expression."""
+    features = set()
+    for node in _nodes(expr):
+        if isinstance(node, CSymbol):
+            features.add(f"csymbol:{node.definition_url}")
+        elif isinstance(node, Quantity):
+            features.add(f"units:{node.units}")
+        elif isinstance(node, sp.Basic) and node.args:
+            func = node.func
+            if isinstance(func, CFunction):
+                features.add(f"csymbol:{func.definition_url}")
+            elif isinstance(func, UndefinedFunction):
+                features.add(f"function:{func.name}")
+            else:
+                features.add(f"op:{func.__name__}")
+
+    features.update(
+        f"pattern:{name}"
+        for name, matches in PATTERNS.items()
+        if matches(expr)
+    )
+    return features
+
+
+class ExpressionStore:
+    """A store of deduplicated SBML math, backed by an SQLite database.
+
+    See :mod:`sbmlmath.expression_store`.
+
+    Expressions with the same canonical form are stored once; the first
+    stored expression with a given structural hash determines the canonical
+    form stored for all of them. Since structural hashes compare numbers by
+    their double-precision value, e.g. ``2`` and ``2.0`` are not
+    distinguished.
+
+    Expressions are stored in the format of :mod:`sbmlmath.serialization`.
+    Reading a store from an untrusted source does not execute any code from
+    it; invalid or tampered expressions raise a :class:`ValueError` when
+    accessed.
+
+    :param path:
+        The SQLite database file. It is created if it does not exist.
+        Defaults to an in-memory database.
+    """
+
+    def __init__(self, path: str | os.PathLike = ":memory:"):
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+        # decoded canonical expressions, by id
+        self._exprs: dict[int, sp.Basic | Quantity] = {}
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._connection.close()
+
+    def __enter__(self) -> ExpressionStore:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """The number of distinct canonical expressions."""
+        return self._scalar("SELECT COUNT(*) FROM expressions")
+
+    @property
+    def n_elements(self) -> int:
+        """The number of stored math elements."""
+        return self._scalar("SELECT COUNT(*) FROM elements")
+
+    @property
+    def model_ids(self) -> list[str]:
+        """The ids of the stored models."""
+        return [
+            model_id
+            for (model_id,) in self._connection.execute(
+                "SELECT DISTINCT model_id FROM elements ORDER BY model_id"
+            )
+        ]
+
+    def _scalar(self, query: str, *params) -> Any:
+        return self._connection.execute(query, params).fetchone()[0]
+
+    def _expression_id(
+        self, digest: bytes, canonical: sp.Basic | Quantity
+    ) -> int:
+        """Get the id of a canonical expression, inserting it if needed."""
+        cursor = self._connection.execute(
+            "INSERT OR IGNORE INTO expressions (hash, data) VALUES (?, ?)",
+            (digest, dumps(canonical)),
+        )
+        if cursor.rowcount:
+            expression_id = cursor.lastrowid
+            self._connection.executemany(
+                "INSERT INTO features (feature, expression_id) VALUES (?, ?)",
+                ((feature, expression_id) for feature in _features(canonical)),
+            )
+            return expression_id
+        return self._scalar(
+            "SELECT id FROM expressions WHERE hash = ?", digest
+        )
+
+    def add_model(
+        self,
+        model_id: str,
+        exprs: Mapping[tuple[str, str], sp.Basic | Quantity],
+    ) -> None:
+        """Add or replace the math elements of a model.
+
+        :param model_id: The model identifier, e.g., the file name.
+        :param exprs:
+            The expressions, by ``(element_name, element_id)``, as returned
+            by :func:`sbmlmath.model_math_to_sympy`.
+        """
+        self.add_models([(model_id, exprs)])
+
+    def add_models(
+        self,
+        models: Iterable[
+            tuple[str, Mapping[tuple[str, str], sp.Basic | Quantity]]
+        ],
+    ) -> None:
+        """Add or replace the math elements of multiple models.
+
+        All models are added in a single transaction.
+
+        :param models: ``(model_id, exprs)`` tuples, see :meth:`add_model`.
+        """
+        with self._connection:
+            for model_id, exprs in models:
+                self._connection.execute(
+                    "DELETE FROM elements WHERE model_id = ?", (model_id,)
+                )
+                # canonical expressions of this model, by hash
+                ids = {}
+                rows = []
+                for (element_name, element_id), expr in exprs.items():
+                    canonical, symbols = canonicalize(expr)
+                    digest = structural_hash(canonical)
+                    if (expression_id := ids.get(digest)) is None:
+                        expression_id = ids[digest] = self._expression_id(
+                            digest, canonical
+                        )
+                    rows.append(
+                        (
+                            model_id,
+                            element_name,
+                            element_id,
+                            expression_id,
+                            json.dumps([sym.name for sym in symbols]),
+                        )
+                    )
+                self._connection.executemany(
+                    "INSERT INTO elements (model_id, element_name, "
+                    "element_id, expression_id, symbols) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def add_files(self, files: Iterable[str | os.PathLike], **kwargs) -> None:
+        """Convert and add the math of SBML files.
+
+        The file names are used as model identifiers.
+
+        :param files: The SBML files.
+        :param kwargs:
+            Additional keyword arguments passed to
+            :func:`sbmlmath.sbml_file_math_to_sympy`.
+        """
+        self.add_models(
+            (str(file), sbml_file_math_to_sympy(file, **kwargs))
+            for file in files
+        )
+
+    def _canonical(self, expression_id: int) -> sp.Basic | Quantity:
+        """Get a canonical expression by id."""
+        if (expr := self._exprs.get(expression_id)) is None:
+            data = self._scalar(
+                "SELECT data FROM expressions WHERE id = ?", expression_id
+            )
+            expr = self._exprs[expression_id] = loads(data)
+        return expr
+
+    def _restore(
+        self, expression_id: int, symbols: str
+    ) -> sp.Basic | Quantity:
+        """Restore the original symbol names of a canonical expression."""
+        canonical = self._canonical(expression_id)
+        names = json.loads(symbols)
+        placeholders = {
+            sym.name: sym for sym in _nodes(canonical) if _is_renamable(sym)
+        }
+        return _xreplace(
+            canonical,
+            {
+                placeholders[f"_{i}"]: _renamed(placeholders[f"_{i}"], name)
+                for i, name in enumerate(names)
+            },
+        )
+
+    def get(self, model_id: str, key: tuple[str, str]) -> sp.Basic | Quantity:
+        """Get the expression of a math element.
+
+        :param model_id: The model identifier.
+        :param key: The ``(element_name, element_id)`` of the math element.
+        :return: The expression with the original symbol names.
+        :raises KeyError: If there is no such element.
+        """
+        row = self._connection.execute(
+            "SELECT expression_id, symbols FROM elements "
+            "WHERE model_id = ? AND element_name = ? AND element_id = ?",
+            (model_id, *key),
+        ).fetchone()
+        if row is None:
+            raise KeyError((model_id, key))
+        return self._restore(*row)
+
+    def get_model(
+        self, model_id: str
+    ) -> dict[tuple[str, str], sp.Basic | Quantity]:
+        """Get the expressions of all math elements of a model.
+
+        :param model_id: The model identifier.
+        :return:
+            The expressions with the original symbol names, by
+            ``(element_name, element_id)``.
+        """
+        return {
+            (element_name, element_id): self._restore(expression_id, symbols)
+            for element_name, element_id, expression_id, symbols in (
+                self._connection.execute(
+                    "SELECT element_name, element_id, expression_id, symbols "
+                    "FROM elements WHERE model_id = ? ORDER BY rowid",
+                    (model_id,),
+                )
+            )
+        }
+
+    def find(self, expr: sp.Basic | Quantity) -> list[tuple[str, str, str]]:
+        """Find the math elements with the same canonical form as the given
+        expression.
+
+        :param expr: The expression.
+        :return: The ``(model_id, element_name, element_id)`` of the matches.
+        """
+        return self._connection.execute(
+            "SELECT model_id, element_name, element_id FROM elements "
+            "JOIN expressions ON expressions.id = elements.expression_id "
+            "WHERE hash = ? ORDER BY model_id, elements.rowid",
+            (structural_hash(canonicalize(expr)[0]),),
+        ).fetchall()
+
+    def elements_with(self, feature: str) -> list[tuple[str, str, str]]:
+        """Find the math elements with the given feature.
+
+        :param feature:
+            The feature, see :mod:`sbmlmath.expression_store`.
+        :return: The ``(model_id, element_name, element_id)`` of the matches.
+        """
+        return self._connection.execute(
+            "SELECT model_id, element_name, element_id FROM elements "
+            "JOIN features USING (expression_id) "
+            "WHERE feature = ? ORDER BY model_id, elements.rowid",
+            (feature,),
+        ).fetchall()
+
+    def models_with(self, feature: str) -> list[str]:
+        """Find the models with math elements with the given feature.
+
+        :param feature:
+            The feature, see :mod:`sbmlmath.expression_store`.
+        :return: The model identifiers.
+        """
+        return [
+            model_id
+            for (model_id,) in self._connection.execute(
+                "SELECT DISTINCT model_id FROM elements "
+                "JOIN features USING (expression_id) "
+                "WHERE feature = ? ORDER BY model_id",
+                (feature,),
+            )
+        ]
+
+    def feature_counts(self) -> dict[str, int]:
+        """Get the number of math elements with each feature.
+
+        :return: The number of math elements, by feature.
+        """
+        return dict(
+            self._connection.execute(
+                "SELECT feature, COUNT(*) FROM features "
+                "JOIN elements USING (expression_id) "
+                "GROUP BY feature ORDER BY feature"
+            )
+        )
+
+    def most_common(
+        self, n: int | None = None
+    ) -> list[tuple[sp.Basic | Quantity, int]]:
+        """Get the most common canonical expressions.
+
+        :param n: The number of expressions, or ``None`` for all.
+        :return:
+            The canonical expressions and their number of math elements,
+            in descending order of the latter.
+        """
+        return [
+            (self._canonical(expression_id), count)
+            for expression_id, count in self._connection.execute(
+                "SELECT expression_id, COUNT(*) AS count FROM elements "
+                "GROUP BY expression_id ORDER BY count DESC, expression_id "
+                "LIMIT ?",
+                (-1 if n is None else n,),
+            )
+        ]
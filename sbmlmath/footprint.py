@@ -0,0 +1,219 @@
+"""Memory footprint of converted math."""
+
+from __future__ import annotations
+
+import sys
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+
+import libsbml
+import sympy as sp
+from pint import Quantity, UnitRegistry
+
+from .cfunction import CFunction
+from .csymbol import CSymbol
+from .lazy import LazyMath
+from .mathml_parser import SBMLMathMLParser
+from .model import iter_math_elements
+from .species_symbol import SpeciesSymbol
+
+__all__ = [
+    "MathFootprint",
+    "cache_footprint",
+    "compare_parser_options",
+    "math_footprint",
+]
+
+#: Parser options compared by default in :func:`compare_parser_options`
+DEFAULT_OPTIONS = {
+    "default": {},
+    "floats_as_rationals=False": {"floats_as_rationals": False},
+    "ignore_units=True": {"ignore_units": True},
+    "evaluate=True": {"evaluate": True},
+}
+
+
+@dataclass
+class MathFootprint:
+    """Memory footprint of a collection of expressions."""
+
+    #: Number of expressions
+    n_expressions: int = 0
+    #: Number of nodes, counting shared subtrees once per occurrence, i.e.,
+    #: the size of the expression trees
+    n_nodes: int = 0
+    #: Number of distinct node objects
+    n_unique_nodes: int = 0
+    #: Number of structurally distinct subtrees (by equality)
+    n_distinct_subtrees: int = 0
+    #: Approximate number of bytes held by the distinct node objects,
+    #: including their argument tuples, names and assumptions
+    nbytes: int = 0
+    #: Number of entries in the relevant global caches at the time of
+    #: measurement, see :func:`cache_footprint`
+    caches: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def shared_fraction(self) -> float:
+        """The fraction of tree nodes that are shared object references."""
+        if not self.n_nodes:
+            return 0.0
+        return 1 - self.n_unique_nodes / self.n_nodes
+
+
+def _node_nbytes(node) -> int:
+    """Approximate size of a node, excluding its arguments."""
+    nbytes = sys.getsizeof(node)
+    if isinstance(node, sp.Basic):
+        nbytes += sys.getsizeof(node._args)
+        if isinstance(node, sp.Symbol):
+            nbytes += sys.getsizeof(node.name)
+            nbytes += sys.getsizeof(node._assumptions)
+    elif isinstance(node, Quantity):
+        nbytes += sys.getsizeof(node._units)
+    return nbytes
+
+
+def _children(node) -> tuple:
+    if isinstance(node, Quantity):
+        return (node.m,)
+    if isinstance(node, sp.Basic):
+        return node.args
+    return ()
+
+
+def cache_footprint(
+    ureg: UnitRegistry | None = None,
+    parsers: Iterable[SBMLMathMLParser] = (),
+) -> dict[str, int]:
+    """Get the number of entries of the caches involved in conversion.
+
+    :param ureg:
+        The unit registry used for conversion. Defaults to the default
+        registry of :class:`SBMLMathMLParser`.
+    :param parsers:
+        The parsers used for conversion, whose literal caches are included.
+    :return: Number of entries, by cache.
+    """
+    if ureg is None:
+        from .mathml_parser import _ureg as ureg
+
+    from sympy.core.cache import CACHE
+
+    registry_cache = getattr(ureg, "_cache", None)
+    return {
+        "CSymbol._cache": len(CSymbol._cache),
+        "CFunction._cache": len(CFunction._cache),
+        "SpeciesSymbol._cache": len(SpeciesSymbol._cache),
+        "pint.units": len(ureg._units),
+        "pint.cache": sum(
+            len(value)
+            for value in vars(registry_cache).values()
+            if isinstance(value, dict)
+        )
+        if registry_cache is not None
+        else 0,
+        "sympy.cache": sum(
+            func.cache_info().currsize
+            for func in CACHE
+            if hasattr(func, "cache_info")
+        ),
+        "SBMLMathMLParser._literal_cache": sum(
+            len(parser._literal_cache) for parser in parsers
+        ),
+    }
+
+
+def math_footprint(
+    expressions: Mapping[object, sp.Basic] | Iterable[sp.Basic],
+    ureg: UnitRegistry | None = None,
+    parsers: Iterable[SBMLMathMLParser] = (),
+) -> MathFootprint:
+    """Measure the memory footprint of the given expressions.
+
+    >>> import sympy as sp
+    >>> a = sp.Symbol("a")
+    >>> shared = sp.exp(a)
+    >>> footprint = math_footprint([shared + 1, 2 * shared])
+    >>> footprint.n_nodes, footprint.n_unique_nodes
+    (8, 6)
+
+    :param expressions:
+        The expressions, e.g., as returned by
+        :func:`sbmlmath.model_math_to_sympy`.
+    :param ureg: See :func:`cache_footprint`.
+    :param parsers: See :func:`cache_footprint`.
+    :return: The footprint.
+    """
+    if isinstance(expressions, Mapping):
+        expressions = expressions.values()
+
+    footprint = MathFootprint()
+    # keep the nodes alive, so their ids are not reused
+    unique = {}
+    distinct = set()
+    for expr in expressions:
+        footprint.n_expressions += 1
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            footprint.n_nodes += 1
+            children = _children(node)
+            if id(node) in unique:
+                # count all nodes of shared subtrees, but measure them once
+                stack.extend(children)
+                continue
+            unique[id(node)] = node
+            footprint.nbytes += _node_nbytes(node)
+            try:
+                distinct.add(node)
+            except TypeError:
+                # unhashable
+                distinct.add(id(node))
+            stack.extend(children)
+
+    footprint.n_unique_nodes = len(unique)
+    footprint.n_distinct_subtrees = len(distinct)
+    footprint.caches = cache_footprint(ureg, parsers)
+    return footprint
+
+
+def compare_parser_options(
+    model: libsbml.Model,
+    options: Mapping[str, dict] | None = None,
+) -> dict[str, MathFootprint]:
+    """Compare the memory footprint of converting a model with different
+    parser options.
+
+    All math elements are converted with a new parser per option set (not
+    taken from the parser pool of :func:`sbmlmath.sbml_math_to_sympy`),
+    whose literal cache thus only reflects this model. Note that the global
+    caches are shared between the conversions, so their sizes are
+    cumulative.
+
+    :param model: The SBML model.
+    :param options:
+        Keyword arguments for :class:`SBMLMathMLParser`, by label.
+        Defaults to the default options, and the defaults with
+        ``floats_as_rationals``, ``ignore_units``, and ``evaluate``
+        toggled, respectively.
+    :return: The footprints, by label.
+    """
+    if options is None:
+        options = DEFAULT_OPTIONS
+    level, version = model.getLevel(), model.getVersion()
+    sbml_ns = libsbml.SBMLNamespaces(level, version)
+    result = {}
+    for label, kwargs in options.items():
+        parser = SBMLMathMLParser(
+            sbml_level=level, sbml_version=version, **kwargs
+        )
+        result[label] = math_footprint(
+            {
+                key: LazyMath(key, element.getMath(), parser, sbml_ns).expr
+                for key, element in iter_math_elements(model)
+            },
+            ureg=kwargs.get("ureg"),
+            parsers=[parser],
+        )
+    return result
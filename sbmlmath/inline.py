@@ -0,0 +1,171 @@
+"""Inlining of SBML function definitions."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+import sympy as sp
+from pint import Quantity
+from sympy.core.function import AppliedUndef
+
+__all__ = ["FunctionDefinitionInliner", "inline_function_definitions"]
+
+
+class FunctionDefinitionInliner:
+    """Replaces calls of SBML function definitions by their bodies.
+
+    :class:`SBMLMathMLParser` converts ``<lambda>`` elements to
+    :class:`sympy.Lambda` and calls ``<apply><ci>f</ci>...</apply>`` to
+    undefined functions ``f(...)``. This class resolves such calls against
+    the given function definitions.
+
+    Function definitions may call other function definitions. They are
+    resolved in dependency order, and cyclic definitions are rejected.
+    Inlined results are memoized per function and argument tuple, and per
+    subexpression, and shared across all expressions handled by the same
+    instance.
+
+    >>> import sympy as sp
+    >>> x, y, a, b = sp.symbols("x y a b")
+    >>> f, g = sp.Function("f"), sp.Function("g")
+    >>> inliner = FunctionDefinitionInliner({
+    ...     "f": sp.Lambda((x, y), x * g(y)),
+    ...     "g": sp.Lambda((x,), x + 1),
+    ... })
+    >>> inliner.inline(f(a, b) + g(a))
+    a*(b + 1) + (a + 1)
+
+    :param function_definitions:
+        The function definitions, indexed by function id.
+    :param evaluate:
+        Whether to evaluate the expressions resulting from substituting the
+        arguments into the function bodies.
+    """
+
+    def __init__(
+        self,
+        function_definitions: Mapping[str, sp.Lambda],
+        evaluate: bool = False,
+    ):
+        self.evaluate = evaluate
+        self._raw_definitions = dict(function_definitions)
+        # function bodies with all nested calls inlined
+        self.function_definitions: dict[str, sp.Lambda] = {}
+        # inlined calls, by (function id, inlined arguments)
+        self._call_cache: dict[tuple[str, tuple[sp.Basic, ...]], sp.Basic] = {}
+        # inlined subexpressions
+        self._cache: dict[sp.Basic, sp.Basic] = {}
+
+        resolving = set()
+
+        def resolve(function_id: str):
+            if function_id in self.function_definitions:
+                return
+            if function_id in resolving:
+                raise ValueError(
+                    f"Cyclic function definition involving `{function_id}`."
+                )
+            resolving.add(function_id)
+            lambda_ = self._raw_definitions[function_id]
+            for call in lambda_.expr.atoms(AppliedUndef):
+                if self._is_definition_call(call):
+                    resolve(call.func.__name__)
+            self.function_definitions[function_id] = sp.Lambda(
+                lambda_.variables, self.inline(lambda_.expr)
+            )
+            resolving.remove(function_id)
+
+        for function_id in self._raw_definitions:
+            resolve(function_id)
+
+    def _is_definition_call(self, expr: sp.Basic) -> bool:
+        """Check whether the expression is a call of a function definition."""
+        return (
+            isinstance(expr, AppliedUndef)
+            # not a csymbol function
+            and not hasattr(expr.func, "definition_url")
+            and expr.func.__name__ in self._raw_definitions
+        )
+
+    def inline(self, expr: sp.Basic | Quantity) -> sp.Basic | Quantity:
+        """Inline all function definition calls in the given expression.
+
+        :param expr: The expression.
+        :return: The expression with all calls of function definitions
+            replaced by the respective function bodies.
+        """
+        if isinstance(expr, Quantity):
+            magnitude = self.inline(expr.magnitude)
+            if magnitude is expr.magnitude:
+                return expr
+            return type(expr)(magnitude, expr.units)
+        if not isinstance(expr, sp.Basic) or not expr.args:
+            return expr
+
+        try:
+            return self._cache[expr]
+        except KeyError:
+            pass
+
+        args = tuple(self.inline(arg) for arg in expr.args)
+
+        if self._is_definition_call(expr):
+            function_id = expr.func.__name__
+            call_key = (function_id, args)
+            try:
+                result = self._call_cache[call_key]
+            except KeyError:
+                with sp.evaluate(self.evaluate):
+                    result = self.function_definitions[function_id](*args)
+                self._call_cache[call_key] = result
+        elif args == expr.args:
+            result = expr
+        else:
+            with sp.evaluate(self.evaluate):
+                result = expr.func(*args)
+
+        self._cache[expr] = result
+        return result
+
+
+def inline_function_definitions(
+    expressions: Mapping[tuple[str, str], sp.Basic],
+    evaluate: bool = False,
+) -> dict[tuple[str, str], sp.Basic]:
+    """Inline the function definitions of a model into all its math.
+
+    >>> import libsbml
+    >>> from sbmlmath import model_math_to_sympy
+    >>> doc = libsbml.SBMLDocument(3, 2)
+    >>> model = doc.createModel()
+    >>> fd = model.createFunctionDefinition()
+    >>> _ = fd.setId("f"), fd.setMath(libsbml.parseL3Formula("lambda(x, 2 * x)"))
+    >>> rule = model.createAssignmentRule()
+    >>> _ = rule.setVariable("y"), rule.setMath(libsbml.parseL3Formula("f(a)"))
+    >>> inline_function_definitions(model_math_to_sympy(model))
+    {('assignmentRule', 'y'): 2*a}
+
+    :param expressions:
+        The converted math of a model, as returned by, e.g.,
+        :func:`sbmlmath.model_math_to_sympy`.
+        Function definitions are identified by keys
+        ``("functionDefinition", function_id)``.
+    :param evaluate:
+        Whether to evaluate the inlined expressions.
+    :return:
+        The math elements other than function definitions, with all
+        function definitions inlined.
+    """
+    inliner = FunctionDefinitionInliner(
+        {
+            element_id: expr
+            for (element_name, element_id), expr in expressions.items()
+            if element_name == "functionDefinition"
+        },
+        evaluate=evaluate,
+    )
+    return {
+        key: inliner.inline(expr)
+        for key, expr in expressions.items()
+        if key[0] != "functionDefinition"
+    }
@@ -0,0 +1,194 @@
+"""Sparse Jacobians of converted math."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from concurrent.futures import Executor
+
+import sympy as sp
+
+__all__ = ["JacobianBuilder", "sparse_jacobian"]
+
+
+class JacobianBuilder:
+    """Differentiates expressions with memoization.
+
+    Derivatives are computed only for variables that occur in the
+    respective (sub)expression, and derivatives of subexpressions are
+    memoized, so that subexpressions shared between expressions are
+    differentiated only once per variable. Sums, products, powers and
+    functions are differentiated recursively; for anything else,
+    :func:`sympy.diff` is used.
+
+    >>> import sympy as sp
+    >>> x, y, k = sp.symbols("x y k")
+    >>> builder = JacobianBuilder()
+    >>> builder.jacobian([k * x * y, x + 1], [x, y, k])
+    {(0, 0): k*y, (0, 1): k*x, (0, 2): x*y, (1, 0): 1}
+    """
+
+    def __init__(self):
+        # derivatives, by (expression, variable)
+        self._derivatives: dict[tuple[sp.Basic, sp.Symbol], sp.Expr] = {}
+        # free symbols, by expression
+        self._free_symbols: dict[sp.Basic, frozenset[sp.Symbol]] = {}
+
+    def free_symbols(self, expr: sp.Basic) -> frozenset[sp.Symbol]:
+        """Get the (memoized) free symbols of an expression."""
+        try:
+            return self._free_symbols[expr]
+        except KeyError:
+            pass
+        if expr.is_Symbol:
+            result = frozenset((expr,))
+        elif not expr.args or isinstance(expr, sp.Derivative | sp.Lambda):
+            result = frozenset(expr.free_symbols)
+        else:
+            result = frozenset().union(*map(self.free_symbols, expr.args))
+        self._free_symbols[expr] = result
+        return result
+
+    def derivative(self, expr: sp.Expr, variable: sp.Symbol) -> sp.Expr:
+        """Differentiate an expression.
+
+        :param expr: The expression.
+        :param variable: The variable to differentiate with respect to.
+        :return: The derivative.
+        """
+        if variable not in self.free_symbols(expr):
+            return sp.Integer(0)
+        if expr == variable:
+            return sp.Integer(1)
+
+        key = (expr, variable)
+        try:
+            return self._derivatives[key]
+        except KeyError:
+            pass
+
+        if expr.is_Add:
+            result = sp.Add(*(self.derivative(a, variable) for a in expr.args))
+        elif expr.is_Mul:
+            # product rule
+            args = expr.args
+            result = sp.Add(
+                *(
+                    sp.Mul(*args[:i], derivative, *args[i + 1 :])
+                    for i, arg in enumerate(args)
+                    if (derivative := self.derivative(arg, variable)) != 0
+                )
+            )
+        elif expr.is_Pow:
+            base, exponent = expr.args
+            result = (
+                exponent
+                * base ** (exponent - 1)
+                * self.derivative(base, variable)
+            )
+            if variable in self.free_symbols(exponent):
+                result += (
+                    expr * sp.log(base) * self.derivative(exponent, variable)
+                )
+        elif (
+            isinstance(expr, sp.Function)
+            and not isinstance(expr, sp.Piecewise)
+            and all(isinstance(arg, sp.Expr) for arg in expr.args)
+        ):
+            # chain rule (not applicable to, e.g., Boolean arguments)
+            result = sp.Add(
+                *(
+                    expr.fdiff(i) * derivative
+                    for i, arg in enumerate(expr.args, start=1)
+                    if (derivative := self.derivative(arg, variable)) != 0
+                )
+            )
+        else:
+            result = sp.diff(expr, variable)
+
+        self._derivatives[key] = result
+        return result
+
+    def jacobian(
+        self,
+        expressions: Sequence[sp.Expr],
+        variables: Sequence[sp.Symbol],
+    ) -> dict[tuple[int, int], sp.Expr]:
+        """Compute the sparse Jacobian of the given expressions.
+
+        See :func:`sparse_jacobian`.
+        """
+        columns = {variable: j for j, variable in enumerate(variables)}
+        result = {}
+        for i, expr in enumerate(expressions):
+            for variable in sorted(
+                self.free_symbols(expr) & columns.keys(), key=columns.get
+            ):
+                if (derivative := self.derivative(expr, variable)) != 0:
+                    result[i, columns[variable]] = derivative
+        return result
+
+
+def _jacobian_rows(
+    expressions: Sequence[sp.Expr],
+    variables: Sequence[sp.Symbol],
+    offset: int,
+) -> dict[tuple[int, int], sp.Expr]:
+    """Compute a block of rows of a Jacobian (in a worker process)."""
+    return {
+        (i + offset, j): derivative
+        for (i, j), derivative in JacobianBuilder()
+        .jacobian(expressions, variables)
+        .items()
+    }
+
+
+def sparse_jacobian(
+    expressions: Sequence[sp.Expr],
+    variables: Sequence[sp.Symbol],
+    executor: Executor | None = None,
+    chunk_size: int = 64,
+) -> dict[tuple[int, int], sp.Expr]:
+    """Compute the sparse Jacobian of the given expressions.
+
+    Only structurally nonzero entries, i.e., derivatives with respect to
+    variables that occur in the respective expression, are computed, and
+    only nonzero entries are returned. A dense matrix can be obtained via
+    ``sympy.SparseMatrix(len(expressions), len(variables), jacobian)``.
+
+    For sensitivities, pass the parameters as ``variables``.
+
+    >>> import sympy as sp
+    >>> x, y = sp.symbols("x y")
+    >>> sparse_jacobian([x * y, sp.exp(2 * x)], [x, y])
+    {(0, 0): y, (0, 1): x, (1, 0): 2*exp(2*x)}
+
+    :param expressions: The expressions (rows).
+    :param variables: The variables (columns).
+    :param executor:
+        Optional :class:`concurrent.futures.Executor`, e.g., a
+        :class:`concurrent.futures.ProcessPoolExecutor`, to distribute the
+        differentiation over. Subexpressions are only memoized within
+        blocks of ``chunk_size`` rows in this case.
+    :param chunk_size:
+        The number of rows per task if ``executor`` is provided.
+    :return:
+        The nonzero entries of the Jacobian, indexed by (row, column).
+    """
+    if executor is None:
+        return JacobianBuilder().jacobian(expressions, variables)
+
+    expressions = list(expressions)
+    variables = list(variables)
+    futures = [
+        executor.submit(
+            _jacobian_rows,
+            expressions[offset : offset + chunk_size],
+            variables,
+            offset,
+        )
+        for offset in range(0, len(expressions), chunk_size)
+    ]
+    result = {}
+    for future in futures:
+        result.update(future.result())
+    return result
@@ -0,0 +1,230 @@
+"""On-demand conversion of the math elements of an SBML model."""
+
+from __future__ import annotations
+
+import os
+from typing import IO
+
+import libsbml
+import sympy as sp
+from lxml import etree
+
+from . import (
+    _DEFAULT_SBML_LEVEL,
+    _DEFAULT_SBML_VERSION,
+    _get_parser,
+    _get_sbml_namespaces,
+)
+from .mathml_parser import SBMLMathMLParser, mathml_ns
+from .model import _xml_math_key, iter_math_elements
+
+__all__ = [
+    "LazyMath",
+    "lazy_model_math",
+    "lazy_sbml_file_math",
+    "lazy_xml_document_math",
+]
+
+_UNPARSED = object()
+
+
+class LazyMath:
+    """Proxy for a math element that is converted on first access.
+
+    Holds the raw math, either a ``<math>`` element of an lxml tree or a
+    :class:`libsbml.ASTNode`, and converts it with
+    :class:`SBMLMathMLParser` when :attr:`expr` is first accessed.
+    The result is kept for subsequent accesses.
+
+    Note that an ASTNode is owned by its libsbml document, which must be
+    kept alive as long as the proxy is used.
+
+    Args:
+        key:
+            The key of the math element, as described in
+            :func:`sbmlmath.xml_document_math_to_sympy`.
+        source:
+            The ``<math>`` element or the ASTNode.
+        parser:
+            The parser to use for conversion.
+        sbml_namespaces:
+            The SBML namespaces to use for serializing an ASTNode.
+    """
+
+    __slots__ = ("key", "_source", "_parser", "_sbml_ns", "_expr", "_nbytes")
+
+    def __init__(
+        self,
+        key: tuple[str, str],
+        source: etree._Element | libsbml.ASTNode,
+        parser: SBMLMathMLParser,
+        sbml_namespaces: libsbml.SBMLNamespaces | None = None,
+    ):
+        self.key = key
+        self._source = source
+        self._parser = parser
+        self._sbml_ns = sbml_namespaces
+        self._expr = _UNPARSED
+        self._nbytes = None
+
+    def __repr__(self):
+        state = "parsed" if self.is_parsed else "unparsed"
+        return f"<{self.__class__.__name__} {self.key} ({state})>"
+
+    @property
+    def element_name(self) -> str:
+        """The name of the SBML element containing the math."""
+        return self.key[0]
+
+    @property
+    def element_id(self) -> str:
+        """The id of the SBML element containing the math."""
+        return self.key[1]
+
+    @property
+    def source(self) -> etree._Element | libsbml.ASTNode:
+        """The raw math."""
+        return self._source
+
+    @property
+    def is_parsed(self) -> bool:
+        """Whether the math has been converted already."""
+        return self._expr is not _UNPARSED
+
+    def _mathml(self) -> bytes:
+        if isinstance(self._source, libsbml.ASTNode):
+            return libsbml.writeMathMLWithNamespaceToString(
+                self._source, self._sbml_ns or libsbml.SBMLNamespaces()
+            ).encode()
+        return etree.tostring(self._source)
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the serialized MathML in bytes.
+
+        Determined without conversion to sympy, and cached.
+        """
+        if self._nbytes is None:
+            self._nbytes = len(self._mathml())
+        return self._nbytes
+
+    @property
+    def expr(self) -> sp.Basic:
+        """The converted math. Converted on first access."""
+        if self._expr is _UNPARSED:
+            if isinstance(self._source, libsbml.ASTNode):
+                mathml = self._mathml()
+                self._nbytes = len(mathml)
+                self._expr = self._parser.parse_str(mathml.decode())
+            else:
+                element = next(self._source.iterchildren(etree.Element))
+                self._expr = self._parser._parse_element(element)
+        return self._expr
+
+
+def lazy_model_math(
+    model: libsbml.Model, **kwargs
+) -> dict[tuple[str, str], LazyMath]:
+    """Get proxies for all math elements of a libsbml model.
+
+    Like :func:`sbmlmath.model_math_to_sympy`, but nothing is converted
+    until the respective :attr:`LazyMath.expr` is accessed.
+
+    The parser is taken from the parser pool of the calling thread (see
+    :func:`sbmlmath.sbml_math_to_sympy`). Parsers are not thread-safe, so
+    the proxies should be converted in the thread that created them.
+
+    >>> import libsbml
+    >>> doc = libsbml.SBMLDocument(3, 2)
+    >>> model = doc.createModel()
+    >>> rule = model.createAssignmentRule()
+    >>> _ = rule.setVariable("x"), rule.setMath(libsbml.parseL3Formula("a"))
+    >>> proxies = lazy_model_math(model)
+    >>> proxies
+    {('assignmentRule', 'x'): <LazyMath ('assignmentRule', 'x') (unparsed)>}
+    >>> proxies["assignmentRule", "x"].expr
+    a
+
+    Args:
+        model:
+            The SBML model.
+        kwargs:
+            Additional keyword arguments passed to
+            :attr:`SBMLMathMLParser.__init__`.
+
+    Returns:
+        The proxies, indexed as described in
+        :func:`sbmlmath.xml_document_math_to_sympy`.
+    """
+    parser = _get_parser(model.getLevel(), model.getVersion(), **kwargs)
+    sbml_ns = _get_sbml_namespaces(model.getLevel(), model.getVersion())
+    return {
+        key: LazyMath(key, element.getMath(), parser, sbml_ns)
+        for key, element in iter_math_elements(model)
+    }
+
+
+def lazy_xml_document_math(
+    document: etree._ElementTree | etree._Element, **kwargs
+) -> dict[tuple[str, str], LazyMath]:
+    """Get proxies for all math elements of an SBML document parsed with
+    lxml.
+
+    Like :func:`sbmlmath.xml_document_math_to_sympy`, but nothing is
+    converted until the respective :attr:`LazyMath.expr` is accessed.
+
+    The parser is taken from the parser pool of the calling thread (see
+    :func:`sbmlmath.sbml_math_to_sympy`). Parsers are not thread-safe, so
+    the proxies should be converted in the thread that created them.
+
+    Args:
+        document:
+            The SBML document (or its root element) as parsed by lxml.
+        kwargs:
+            Additional keyword arguments passed to
+            :attr:`SBMLMathMLParser.__init__`.
+
+    Returns:
+        The proxies, indexed as described in
+        :func:`sbmlmath.xml_document_math_to_sympy`.
+    """
+    root = (
+        document.getroot()
+        if isinstance(document, etree._ElementTree)
+        else document
+    )
+    parser = _get_parser(
+        int(root.get("level", _DEFAULT_SBML_LEVEL)),
+        int(root.get("version", _DEFAULT_SBML_VERSION)),
+        **kwargs,
+    )
+    return {
+        (key := _xml_math_key(math)): LazyMath(key, math, parser)
+        for math in root.xpath(
+            "//mathml:math", namespaces={"mathml": mathml_ns}
+        )
+        if len(math)
+    }
+
+
+def lazy_sbml_file_math(
+    file: str | os.PathLike | IO, **kwargs
+) -> dict[tuple[str, str], LazyMath]:
+    """Get proxies for all math elements of an SBML file.
+
+    The file is parsed with lxml, see :func:`lazy_xml_document_math`.
+
+    Args:
+        file:
+            The SBML file (filename or file-like object).
+        kwargs:
+            Additional keyword arguments passed to
+            :attr:`SBMLMathMLParser.__init__`.
+
+    Returns:
+        The proxies, indexed as described in
+        :func:`sbmlmath.xml_document_math_to_sympy`.
+    """
+    # Using `lxml` to parse untrusted data is known to be vulnerable to XML
+    #  attacks
+    return lazy_xml_document_math(etree.parse(file), **kwargs)
@@ -2,9 +2,13 @@
 
 import contextlib
 import operator as operators
+import re
+import time
+from dataclasses import dataclass
 from functools import reduce
 from io import BytesIO
 
+import libsbml
 import sympy as sp
 from lxml import etree
 from pint import UnitRegistry
@@ -16,11 +20,16 @@ from sympy.logic.boolalg import (
 )
 
 from . import _DEFAULT_SBML_LEVEL, _DEFAULT_SBML_VERSION
-from .cfunction import CFunction
+from .boolean import BoolToNum, NumToBool
+from .cfunction import DEF_URL_RATE_OF, CFunction
 from .csymbol import CSymbol
 from .species_symbol import SpeciesSymbol
 
-__all__ = ["SBMLMathMLParser"]
+__all__ = [
+    "ComplexityBudgetExceeded",
+    "MathIdentifiers",
+    "SBMLMathMLParser",
+]
 
 
 mathml_ns = "http://www.w3.org/1998/Math/MathML"
@@ -30,6 +39,10 @@ _ureg = UnitRegistry()
 _ureg.Quantity.name = property(fget=lambda s: f"({s})")
 _ureg.Quantity_sympy_ = lambda s: sp.sympify(f"{s.m}*{s.u:~}")
 
+# number formats that can be converted without sympy's string parsing
+_integer_re = re.compile(r"[+-]?\d+")
+_decimal_re = re.compile(r"([+-]?)(\d*)\.(\d*)")
+
 
 # some operator implementations to handle `evaluate`
 #  *and* be compatible with non Expr operands
@@ -170,6 +183,43 @@ constants = {
 }
 
 
+class ComplexityBudgetExceeded(ValueError):
+    """A math element exceeds a complexity budget of the parser.
+
+    See the ``max_nodes``, ``max_depth`` and ``timeout`` arguments of
+    :class:`SBMLMathMLParser`.
+
+    :param budget:
+        The exceeded budget: ``"max_nodes"``, ``"max_depth"`` or
+        ``"timeout"``.
+    :param limit: The configured limit of that budget.
+    """
+
+    def __init__(self, budget: str, limit: int | float):
+        self.budget = budget
+        self.limit = limit
+        super().__init__(f"Complexity budget exceeded: {budget}={limit}")
+
+    def __reduce__(self):
+        return type(self), (self.budget, self.limit)
+
+
+@dataclass(frozen=True)
+class MathIdentifiers:
+    """Identifiers occurring in a math element.
+
+    See :meth:`SBMLMathMLParser.scan_element`.
+    """
+
+    #: Names of ``<ci>`` elements, i.e., symbols and called functions,
+    #: excluding bound variables of ``<lambda>``
+    names: frozenset[str] = frozenset()
+    #: Definition URLs of ``<csymbol>`` elements
+    definition_urls: frozenset[str] = frozenset()
+    #: Units of ``<cn>`` elements
+    units: frozenset[str] = frozenset()
+
+
 class SBMLMathMLParser:
     """MathML parser for sympy.
 
@@ -197,6 +247,29 @@ class SBMLMathMLParser:
     :param symbol_kwargs:
         Additional keyword arguments for constructing :class:`sympy.Symbol`.
         For example, for passing custom assumptions such as ``real=True``.
+    :param evaluate:
+        Whether to evaluate the resulting expressions.
+    :param compact_booleans:
+        How to represent Booleans used as numbers and vice versa.
+        If ``False``, conversions are expressed as :class:`sympy.Piecewise`,
+        e.g. ``Piecewise((1, x > 0), (0, True))``.
+        If ``True``, the more compact :class:`BoolToNum` and
+        :class:`NumToBool` are used, e.g. ``BoolToNum(x > 0)``.
+    :param max_nodes:
+        Maximum number of MathML elements of a math element, or ``None``
+        for no limit.
+    :param max_depth:
+        Maximum nesting depth of MathML elements of a math element,
+        or ``None`` for no limit.
+    :param timeout:
+        Maximum time in seconds for converting a math element, or ``None``
+        for no limit. The time is only checked between the conversion of
+        individual MathML elements, so a single expensive sympy operation
+        may exceed it.
+
+    Node count and depth are checked before any sympy objects are created.
+    If any of these budgets is exceeded, :class:`ComplexityBudgetExceeded`
+    is raised.
     """
 
     def __init__(
@@ -208,6 +281,10 @@ class SBMLMathMLParser:
         ignore_units=False,
         symbol_kwargs=None,
         evaluate=False,
+        compact_booleans=False,
+        max_nodes: int = None,
+        max_depth: int = None,
+        timeout: float = None,
     ):
         """Constructor"""
         self.ureg = ureg or _ureg or UnitRegistry()
@@ -223,6 +300,19 @@ class SBMLMathMLParser:
             {} if symbol_kwargs is None else symbol_kwargs.copy()
         )
         self.evaluate = evaluate
+        self.compact_booleans = compact_booleans
+        # numbers of converted `<cn>`s, by (type, text, separated text,
+        #  floats_as_rationals). sympy numbers are immutable and can be shared
+        #  between expressions; `pint.Quantity`s are mutable and are not
+        #  cached.
+        self._literal_cache = {}
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.timeout = timeout
+        # whether a top-level element is being parsed, and the time by which
+        #  its conversion has to finish
+        self._parsing = False
+        self._deadline = None
 
     def parse_file(self, file_like) -> sp.Expr:
         """Parse a file-like object containing MathML.
@@ -262,7 +352,149 @@ class SBMLMathMLParser:
 
         return self.parse_file(file_like=BytesIO(mathml.encode()))
 
+    def scan_str(self, mathml: str) -> MathIdentifiers:
+        """Collect the identifiers in a string containing MathML.
+
+        Like :meth:`parse_str`, but only extracts the identifiers, without
+        creating any sympy objects. See :meth:`scan_element`.
+
+        :param mathml:
+            MathML string. Expected to contain the XML prolog ``<?xml [...]?>``
+            and the MathML ``math`` element.
+        :return: The identifiers.
+        """
+        return self.scan_element(etree.fromstring(mathml.encode()))
+
+    def scan_element(self, element: etree._Element) -> MathIdentifiers:
+        """Collect the identifiers in a MathML element.
+
+        This is considerably cheaper than parsing the element and
+        collecting the identifiers from the resulting sympy expression.
+        Names are passed through :meth:`preprocess_symbol_name`.
+
+        >>> import libsbml
+        >>> ast = libsbml.parseL3Formula("lambda(x, x * a + delay(b, 2 mole))")
+        >>> identifiers = SBMLMathMLParser().scan_str(
+        ...     libsbml.writeMathMLToString(ast)
+        ... )
+        >>> sorted(identifiers.names)
+        ['a', 'b']
+        >>> identifiers.definition_urls
+        frozenset({'http://www.sbml.org/sbml/symbols/delay'})
+        >>> identifiers.units
+        frozenset({'mole'})
+
+        :param element:
+            The MathML element, e.g., a ``<math>`` element.
+        :return: The identifiers.
+        """
+        names = set()
+        bound = set()
+        definition_urls = set()
+        units = set()
+        units_attr = f"{{{self.sbml_core_ns}}}units"
+        for e in element.iter(
+            f"{{{mathml_ns}}}ci",
+            f"{{{mathml_ns}}}csymbol",
+            f"{{{mathml_ns}}}cn",
+        ):
+            if e.tag == f"{{{mathml_ns}}}ci":
+                name = self.preprocess_symbol_name(e.text.strip(), e)
+                if e.getparent().tag == f"{{{mathml_ns}}}bvar":
+                    bound.add(name)
+                else:
+                    names.add(name)
+            elif e.tag == f"{{{mathml_ns}}}csymbol":
+                definition_urls.add(e.attrib["definitionURL"])
+            elif unit := e.get(units_attr):
+                units.add(unit)
+        return MathIdentifiers(
+            names=frozenset(names - bound),
+            definition_urls=frozenset(definition_urls),
+            units=frozenset(units),
+        )
+
+    def scan_ast_node(self, ast_node: libsbml.ASTNode) -> MathIdentifiers:
+        """Collect the identifiers in a libsbml ASTNode.
+
+        Like :meth:`scan_element`, but for a :class:`libsbml.ASTNode`.
+        :meth:`preprocess_symbol_name` is called without the element.
+
+        :param ast_node: The ASTNode.
+        :return: The identifiers.
+        """
+        names = set()
+        bound = set()
+        definition_urls = set()
+        units = set()
+        stack = [ast_node]
+        while stack:
+            node = stack.pop()
+            node_type = node.getType()
+            if node_type in (libsbml.AST_NAME, libsbml.AST_FUNCTION):
+                names.add(self.preprocess_symbol_name(node.getName()))
+            elif node_type == libsbml.AST_FUNCTION_RATE_OF:
+                # libsbml doesn't report the definitionURL for rateOf
+                definition_urls.add(DEF_URL_RATE_OF)
+            elif url := node.getDefinitionURLString():
+                # csymbols (time, avogadro, delay, ...)
+                definition_urls.add(url)
+            if node.isSetUnits():
+                units.add(node.getUnits())
+            if node_type == libsbml.AST_LAMBDA:
+                bound.update(
+                    self.preprocess_symbol_name(node.getChild(i).getName())
+                    for i in range(node.getNumBvars())
+                )
+            stack.extend(
+                node.getChild(i) for i in range(node.getNumChildren())
+            )
+        return MathIdentifiers(
+            names=frozenset(names - bound),
+            definition_urls=frozenset(definition_urls),
+            units=frozenset(units),
+        )
+
+    def _check_complexity(self, element: etree._Element) -> None:
+        """Check the node and depth budgets of a MathML element."""
+        max_nodes = self.max_nodes
+        max_depth = self.max_depth
+        n_nodes = 0
+        stack = [(element, 1)]
+        while stack:
+            node, depth = stack.pop()
+            n_nodes += 1
+            if max_nodes is not None and n_nodes > max_nodes:
+                raise ComplexityBudgetExceeded("max_nodes", max_nodes)
+            if max_depth is not None and depth > max_depth:
+                raise ComplexityBudgetExceeded("max_depth", max_depth)
+            stack.extend(
+                (child, depth + 1)
+                for child in node.iterchildren(etree.Element)
+            )
+
     def _parse_element(self, element: etree._Element) -> sp.Expr:
+        if self._deadline is not None:
+            if time.perf_counter() > self._deadline:
+                raise ComplexityBudgetExceeded("timeout", self.timeout)
+        elif not self._parsing and (
+            self.max_nodes is not None
+            or self.max_depth is not None
+            or self.timeout is not None
+        ):
+            # top-level element
+            self._check_complexity(element)
+            self._parsing = True
+            if self.timeout is not None:
+                self._deadline = time.perf_counter() + self.timeout
+            try:
+                return self._handle_element(element)
+            finally:
+                self._parsing = False
+                self._deadline = None
+        return self._handle_element(element)
+
+    def _handle_element(self, element: etree._Element) -> sp.Expr:
         mathml_prefix = f"{{{mathml_ns}}}"
         if not element.tag.startswith(mathml_prefix):
             raise AssertionError(element.tag)
@@ -273,7 +505,7 @@ class SBMLMathMLParser:
         if handler := getattr(self, handler, None):
             try:
                 return handler(element)
-            except NotImplementedError:
+            except (NotImplementedError, ComplexityBudgetExceeded):
                 raise
             except Exception as e:
                 raise ValueError(
@@ -345,7 +577,9 @@ class SBMLMathMLParser:
         # explicit boolean->{int,float} conversion for non-boolean functions,
         #  since sympy does not do that automatically
         if operator.tag not in mathml_op_sympy_boolean:
-            sym_operands = list(map(_bool2num, sym_operands))
+            sym_operands = list(map(self._bool2num, sym_operands))
+        elif self.compact_booleans:
+            sym_operands = list(map(self._num2bool, sym_operands))
 
         with contextlib.suppress(KeyError):
             return mathml_op_sympy[operator.tag](
@@ -455,40 +689,33 @@ class SBMLMathMLParser:
     def handle_cn(self, element: etree._Element) -> sp.Expr:
         """Handle numbers.
 
+        Converted numbers are cached, so that repeated literals are converted
+        only once per parser.
+
         See also:
         `numerical constants in MathML <https://www.w3.org/TR/MathML2/chapter4.html#contm.cn>`_.
         """
-        handled_attrs = {
-            "type",
-            f"{{{self.sbml_core_ns}}}units",
-        }
-        if unhandled_attrs := (set(element.attrib.keys()) - handled_attrs):
+        attrib = element.attrib
+        units_attr = f"{{{self.sbml_core_ns}}}units"
+        if len(attrib) > ("type" in attrib) + (units_attr in attrib):
+            unhandled_attrs = set(attrib.keys()) - {"type", units_attr}
             raise NotImplementedError(
                 f"Unhandled <cn> attributes: {unhandled_attrs}"
             )
-        dtype = element.attrib.get("type", "real")
-        converter = {
-            "real": (lambda element: sp.Rational(element.text))
-            if self.floats_as_rationals
-            else lambda element: sp.Float(element.text),
-            "integer": lambda element: sp.Integer(element.text),
-            "rational": lambda element: sp.Rational(
-                element.text, element[0].tail
-            ),
-            "e-notation":
-            # this won't cycle. we don't have a corresponding
-            #  representation in sympy
-            lambda element: sp.Float(
-                float(element.text) * 10 ** int(element[0].tail)
-            ),
-        }.get(dtype)
-        if not converter:
-            raise NotImplementedError(f"Unhandled type: {dtype}")
-        obj = converter(element)
-
-        if not self.ignore_units and (
-            units := element.attrib.get(f"{{{self.sbml_core_ns}}}units", None)
-        ):
+        dtype = attrib.get("type", "real")
+        text = element.text
+        # the part after <sep/>
+        tail = element[0].tail if len(element) else None
+        units = None if self.ignore_units else attrib.get(units_attr)
+        key = (dtype, text, tail, self.floats_as_rationals)
+        try:
+            obj = self._literal_cache[key]
+        except KeyError:
+            obj = self._literal_cache[key] = self._convert_number(
+                dtype, text, tail
+            )
+
+        if units:
             if units not in self.ureg:
                 # TODO fixme: replace rhs by base units
                 #  this requires access to the underlying SBML model to access
@@ -500,9 +727,47 @@ class SBMLMathMLParser:
                 self.ureg.define(f"{units} = {units}")
             # TODO pint.Quantity causes issues with sympy functions:
             #  https://docs.sympy.org/latest/explanation/active-deprecations.html#non-expr-args-deprecated
-            return self.ureg.Quantity(obj, units)
+            obj = self.ureg.Quantity(obj, units)
         return obj
 
+    def _convert_number(
+        self, dtype: str, text: str, tail: str | None
+    ) -> sp.Number:
+        """Convert the content of a ``<cn>`` element of the given type."""
+        if dtype == "real":
+            stripped = text.strip()
+            # fast paths for integers and plain decimals
+            if _integer_re.fullmatch(stripped):
+                value = int(stripped)
+                return (
+                    sp.Integer(value)
+                    if self.floats_as_rationals
+                    else sp.Float(value)
+                )
+            if not self.floats_as_rationals:
+                return sp.Float(text)
+            if (match := _decimal_re.fullmatch(stripped)) and (
+                match.group(2) or match.group(3)
+            ):
+                sign, integer_part, fraction_part = match.groups()
+                return sp.Rational(
+                    int(f"{sign}{integer_part}{fraction_part}"),
+                    10 ** len(fraction_part),
+                )
+            return sp.Rational(text)
+        if dtype == "integer":
+            stripped = text.strip()
+            if _integer_re.fullmatch(stripped):
+                return sp.Integer(int(stripped))
+            return sp.Integer(text)
+        if dtype == "rational":
+            return sp.Rational(text, tail)
+        if dtype == "e-notation":
+            # this won't cycle. we don't have a corresponding
+            #  representation in sympy
+            return sp.Float(float(text) * 10 ** int(tail))
+        raise NotImplementedError(f"Unhandled type: {dtype}")
+
     def handle_piecewise(self, element: etree._Element) -> sp.Expr:
         expr_cond_pairs = []
         for e in element:
@@ -516,7 +781,7 @@ class SBMLMathMLParser:
                 # Only Boolean conditions are supported
                 #  -> convert
                 # this won't round-trip
-                cond = _num2bool(cond)
+                cond = self._num2bool(cond)
                 expr_cond_pairs.append(
                     (self._parse_element(e[0]), cond),
                 )
@@ -562,6 +827,22 @@ class SBMLMathMLParser:
             **self.symbol_kwargs,
         )
 
+    def _bool2num(self, x: sp.Basic) -> sp.Basic:
+        """Convert Booleans to numbers, see `compact_booleans`."""
+        if (
+            self.compact_booleans
+            and isinstance(x, Boolean)
+            and not isinstance(x, sp.Symbol | BooleanTrue | BooleanFalse)
+        ):
+            return BoolToNum(x)
+        return _bool2num(x)
+
+    def _num2bool(self, x: sp.Basic) -> sp.Basic:
+        """Convert numbers to Booleans, see `compact_booleans`."""
+        if self.compact_booleans and not isinstance(x, Boolean):
+            return NumToBool(x)
+        return _num2bool(x)
+
     def preprocess_symbol_name(
         self, name: str, element: etree._Element = None
     ) -> str:
@@ -1,12 +1,17 @@
 """Convenience functions for libsbml core"""
 
+import io
 import warnings
+from collections.abc import Iterator
 from numbers import Number
+from typing import IO
+from xml.dom import Node
 
 import sympy as sp
 from sympy.printing.mathml import MathMLContentPrinter
 
 from . import _DEFAULT_SBML_LEVEL, _DEFAULT_SBML_VERSION
+from .boolean import BoolToNum, NumToBool
 from .csymbol import CSymbol
 from .species_symbol import SpeciesSymbol
 
@@ -107,6 +112,105 @@ class SBMLMathMLPrinter(MathMLContentPrinter):
             f"{mathml}</math>"
         )
 
+    def iterprint(
+        self,
+        expr,
+        with_prolog=True,
+        with_math=True,
+        chunk_size: int = 2**16,
+    ) -> Iterator[str]:
+        """Convert SymPy expression to MathML, yielding chunks of text.
+
+        The concatenated chunks are identical to the output of
+        :meth:`doprint`. However, the MathML text is never held in memory
+        as a whole, and the intermediate DOM is released while the chunks
+        are produced. This reduces the peak memory usage for very large
+        expressions.
+
+        :param expr: The SymPy expression to be converted.
+        :param with_prolog: Whether to include the XML prolog.
+        :param with_math: Whether to include the <math> tags.
+        :param chunk_size:
+            Approximate size of the yielded chunks, in characters.
+
+        >>> printer = SBMLMathMLPrinter()
+        >>> expr = sp.sympify("3 * a")
+        >>> "".join(printer.iterprint(expr)) == printer.doprint(expr)
+        True
+        """
+        if isinstance(expr, float):
+            expr = sp.Float(expr)
+        try:
+            root = self._print(expr)
+        except Exception as e:
+            raise ValueError(f"MathML printing failed for {expr}") from e
+
+        if with_math:
+            prefixes = _get_attribute_prefixes(root)
+            prolog = (
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                if with_prolog
+                else ""
+            )
+            sbml_ns = f" {self.sbml_ns}" if "sbml" in prefixes else ""
+            multi_ns = f" {self.multi_ns}" if "multi" in prefixes else ""
+            yield f"{prolog}<math {self.mathml_ns}{sbml_ns}{multi_ns}>\n"
+
+        # Serialize the DOM in the same way as `Node.toxml()`, but
+        #  incrementally. The DOM is consumed in the process: children are
+        #  detached from their parents once they are on the stack, so that
+        #  they can be released as soon as they are written.
+        buffer = io.StringIO()
+        size = 0
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                # closing tag
+                buffer.write(node)
+                size += len(node)
+            elif node.nodeType == Node.ELEMENT_NODE and node.childNodes:
+                start = _element_start_tag(node)
+                buffer.write(start)
+                size += len(start)
+                stack.append(f"</{node.tagName}>")
+                stack.extend(reversed(node.childNodes))
+                node.childNodes = []
+            else:
+                start = buffer.tell()
+                node.writexml(buffer)
+                size += buffer.tell() - start
+
+            if size >= chunk_size:
+                yield _to_ascii(buffer.getvalue())
+                buffer = io.StringIO()
+                size = 0
+
+        if chunk := buffer.getvalue():
+            yield _to_ascii(chunk)
+        if with_math:
+            yield "</math>"
+
+    def doprint_to(
+        self, expr, file: IO, with_prolog=True, with_math=True
+    ) -> None:
+        """Convert SymPy expression to MathML and write it to a file.
+
+        The output is identical to :meth:`doprint`, but written
+        incrementally, see :meth:`iterprint`.
+
+        :param expr: The SymPy expression to be converted.
+        :param file: Text or binary file-like object to write to.
+        :param with_prolog: Whether to include the XML prolog.
+        :param with_math: Whether to include the <math> tags.
+        """
+        chunks = self.iterprint(
+            expr, with_prolog=with_prolog, with_math=with_math
+        )
+        if isinstance(file, io.RawIOBase | io.BufferedIOBase):
+            chunks = (chunk.encode("ascii") for chunk in chunks)
+        file.writelines(chunks)
+
     def _print_Number(self, e):
         # only try printing as int if it fits int32
         if isinstance(e, int) and _is_sbml_compatible_int(e):
@@ -182,6 +286,13 @@ class SBMLMathMLPrinter(MathMLContentPrinter):
             return self._print_CFunction(e)
         return super()._print_Function(e)
 
+    def _print_BoolToNum(self, e: BoolToNum):
+        # there is no boolean->number conversion in MathML
+        return self._print(e.rewrite(sp.Piecewise))
+
+    def _print_NumToBool(self, e: NumToBool):
+        return self._print(sp.Ne(e.args[0], 0, evaluate=False))
+
     def _print_CFunction(self, e):
         dom_element = self.dom.createElement("apply")
         csymbol = self.dom.createElement("csymbol")
@@ -198,6 +309,34 @@ class SBMLMathMLPrinter(MathMLContentPrinter):
         return dom_element
 
 
+def _get_attribute_prefixes(root) -> set[str]:
+    """Get the namespace prefixes of all attributes in the given DOM."""
+    prefixes = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.nodeType != Node.ELEMENT_NODE:
+            continue
+        prefixes.update(
+            name.split(":", 1)[0]
+            for name, _ in node.attributes.items()
+            if ":" in name
+        )
+        stack.extend(node.childNodes)
+    return prefixes
+
+
+def _element_start_tag(element) -> str:
+    """Get the start tag of a DOM element, as written by `writexml`."""
+    # a childless copy is written as `<tag .../>`
+    return element.cloneNode(False).toxml()[:-2] + ">"
+
+
+def _to_ascii(text: str) -> str:
+    """Escape non-ASCII characters as done in `MathMLPrinterBase.doprint`."""
+    return text.encode("ascii", "xmlcharrefreplace").decode()
+
+
 def _is_sbml_compatible_int(value: int) -> bool:
     """Check if integer is compatible with SBML (fits into signed int32)."""
     return 2**31 > value >= -(2**31)
@@ -0,0 +1,247 @@
+"""Conversion of all math elements of an SBML model."""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Iterator
+from typing import IO
+
+import libsbml
+import sympy as sp
+from lxml import etree
+
+from . import (
+    _DEFAULT_SBML_LEVEL,
+    _DEFAULT_SBML_VERSION,
+    _get_parser,
+    sbml_math_to_sympy,
+)
+from .mathml_parser import ComplexityBudgetExceeded, mathml_ns
+
+__all__ = [
+    "iter_math_elements",
+    "model_math_to_sympy",
+    "sbml_file_math_to_sympy",
+    "xml_document_math_to_sympy",
+]
+
+#: Attributes holding the identifier of an SBML element, in order of
+#: precedence. Matches the behaviour of :meth:`libsbml.SBase.getId`, which
+#: returns the ``variable`` or ``symbol`` attribute for rules and
+#: (event/initial) assignments.
+_ID_ATTRIBUTES = ("variable", "symbol", "id")
+
+
+def _xml_element_id(element: etree._Element) -> str:
+    """Get the identifier of an SBML XML element, or ``""``."""
+    for attr in _ID_ATTRIBUTES:
+        if element_id := element.get(attr):
+            return element_id
+    return ""
+
+
+def _xml_math_key(math: etree._Element) -> tuple[str, str]:
+    """Get the key identifying a ``<math>`` element within an SBML model.
+
+    See :func:`xml_document_math_to_sympy` for the format of the key.
+    """
+    container = math.getparent()
+    ids = []
+    element = container
+    while (parent := element.getparent()) is not None and (
+        etree.QName(element).localname != "model"
+    ):
+        if element_id := _xml_element_id(element):
+            ids.append(element_id)
+        elif etree.QName(parent).localname.startswith("listOf"):
+            index = sum(
+                1 for _ in element.itersiblings(etree.Element, preceding=True)
+            )
+            ids.append(f"#{index}")
+        element = parent
+
+    return etree.QName(container).localname, ".".join(reversed(ids))
+
+
+def _sbase_math_key(
+    sbase: libsbml.SBase, list_indices: dict[int, int] | None = None
+) -> tuple[str, str]:
+    """Get the key identifying the math of an SBML element within its model.
+
+    See :func:`xml_document_math_to_sympy` for the format of the key.
+
+    :param sbase: The SBML element.
+    :param list_indices:
+        Positions of elements within their ``ListOf`` parents, by the address
+        of the underlying libsbml object (see :func:`iter_math_elements`).
+        If not provided, the positions are searched for.
+    """
+    ids = []
+    element = sbase
+    while (parent := element.getParentSBMLObject()) is not None and (
+        not isinstance(element, libsbml.Model)
+    ):
+        if element_id := element.getId():
+            ids.append(element_id)
+        elif isinstance(parent, libsbml.ListOf):
+            if list_indices is not None:
+                index = list_indices[int(element.this)]
+            else:
+                index = next(
+                    i for i in range(parent.size()) if parent.get(i) == element
+                )
+            ids.append(f"#{index}")
+        element = parent
+
+    return sbase.getElementName(), ".".join(reversed(ids))
+
+
+def iter_math_elements(
+    model: libsbml.Model,
+) -> Iterator[tuple[tuple[str, str], libsbml.SBase]]:
+    """Iterate over all elements of an SBML model that have math set.
+
+    Args:
+        model: The SBML model.
+
+    Returns:
+        Iterator over ``(key, element)`` tuples, where ``key`` is the key
+        as described in :func:`xml_document_math_to_sympy`.
+    """
+    # `getListOfAllElements` lists every `ListOf` before its items, so the
+    #  positions of all (unnamed) ancestors are known when they are needed
+    list_indices = {}
+    for element in model.getListOfAllElements():
+        if isinstance(element, libsbml.ListOf):
+            for index in range(element.size()):
+                list_indices[int(element.get(index).this)] = index
+        elif (is_set_math := getattr(element, "isSetMath", None)) and (
+            is_set_math()
+        ):
+            yield _sbase_math_key(element, list_indices), element
+
+
+def xml_document_math_to_sympy(
+    document: etree._ElementTree | etree._Element,
+    skip_exceeded: bool = False,
+    **kwargs,
+) -> dict[tuple[str, str], sp.Basic]:
+    """Convert all math elements of an SBML document parsed with lxml.
+
+    All ``<math>`` elements are collected in a single pass and converted
+    directly from the lxml tree, i.e. without going through libsbml or
+    serializing the individual math elements.
+
+    >>> from lxml import etree
+    >>> doc = etree.fromstring(
+    ...     '<sbml xmlns="http://www.sbml.org/sbml/level3/version2/core" '
+    ...     'level="3" version="2"><model><listOfReactions>'
+    ...     '<reaction id="R1"><kineticLaw>'
+    ...     '<math xmlns="http://www.w3.org/1998/Math/MathML">'
+    ...     '<apply><times/><ci> k </ci><ci> A </ci></apply>'
+    ...     '</math></kineticLaw></reaction>'
+    ...     '</listOfReactions></model></sbml>'
+    ... )
+    >>> xml_document_math_to_sympy(doc)
+    {('kineticLaw', 'R1'): A*k}
+
+    Args:
+        document:
+            The SBML document (or its root element) as parsed by lxml.
+        skip_exceeded:
+            Whether to omit math elements exceeding the complexity budgets
+            of the parser (see the ``max_nodes``, ``max_depth`` and
+            ``timeout`` arguments of :class:`SBMLMathMLParser`) from the
+            result, instead of raising
+            :class:`sbmlmath.mathml_parser.ComplexityBudgetExceeded`.
+        kwargs:
+            Additional keyword arguments passed to
+            :attr:`SBMLMathMLParser.__init__`.
+            The SBML level and version are taken from the document.
+
+    Returns:
+        The converted expressions, indexed by ``(element_name, element_id)``,
+        where ``element_name`` is the name of the SBML element containing
+        the math element (e.g., ``"kineticLaw"``, ``"assignmentRule"``), and
+        ``element_id`` the ids of the enclosing SBML elements below the
+        model, joined by ``"."`` (e.g., ``"R1"`` for the kinetic law of
+        reaction ``R1``, or ``"E1.x"`` for the event assignment to ``x``
+        in event ``E1``). List items without an id are identified by their
+        position in the list, prefixed by ``"#"``.
+    """
+    root = (
+        document.getroot()
+        if isinstance(document, etree._ElementTree)
+        else document
+    )
+    parser = _get_parser(
+        int(root.get("level", _DEFAULT_SBML_LEVEL)),
+        int(root.get("version", _DEFAULT_SBML_VERSION)),
+        **kwargs,
+    )
+
+    result = {}
+    for math in root.xpath("//mathml:math", namespaces={"mathml": mathml_ns}):
+        for element in math.iterchildren(etree.Element):
+            try:
+                result[_xml_math_key(math)] = parser._parse_element(element)
+            except ComplexityBudgetExceeded:
+                if not skip_exceeded:
+                    raise
+            break
+    return result
+
+
+def model_math_to_sympy(
+    model: libsbml.Model, skip_exceeded: bool = False, **kwargs
+) -> dict[tuple[str, str], sp.Basic]:
+    """Convert all math elements of a libsbml model.
+
+    Args:
+        model:
+            The SBML model.
+        skip_exceeded:
+            See :func:`xml_document_math_to_sympy`.
+        kwargs:
+            Additional keyword arguments passed to
+            :attr:`SBMLMathMLParser.__init__`.
+
+    Returns:
+        The converted expressions, indexed as described in
+        :func:`xml_document_math_to_sympy`.
+    """
+    result = {}
+    for key, element in iter_math_elements(model):
+        try:
+            result[key] = sbml_math_to_sympy(element, **kwargs)
+        except ComplexityBudgetExceeded:
+            if not skip_exceeded:
+                raise
+    return result
+
+
+def sbml_file_math_to_sympy(
+    file: str | os.PathLike | IO, skip_exceeded: bool = False, **kwargs
+) -> dict[tuple[str, str], sp.Basic]:
+    """Convert all math elements of an SBML file.
+
+    The file is parsed with lxml, see :func:`xml_document_math_to_sympy`.
+
+    Args:
+        file:
+            The SBML file (filename or file-like object).
+        skip_exceeded:
+            See :func:`xml_document_math_to_sympy`.
+        kwargs:
+            Additional keyword arguments passed to
+            :attr:`SBMLMathMLParser.__init__`.
+
+    Returns:
+        The converted expressions, indexed as described in
+        :func:`xml_document_math_to_sympy`.
+    """
+    # Using `lxml` to parse untrusted data is known to be vulnerable to XML
+    #  attacks
+    return xml_document_math_to_sympy(
+        etree.parse(file), skip_exceeded=skip_exceeded, **kwargs
+    )
@@ -0,0 +1,311 @@
+"""Resolution of SBML ``rateOf()`` calls."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+import libsbml
+import sympy as sp
+from pint import Quantity
+
+from .cfunction import DEF_URL_RATE_OF
+from .csymbol import CSymbol, TimeSymbol
+from .model import _sbase_math_key, model_math_to_sympy
+
+__all__ = ["RateOfResolver", "resolve_rate_of"]
+
+
+def _is_rate_of(expr: sp.Basic) -> bool:
+    return getattr(expr.func, "definition_url", None) == DEF_URL_RATE_OF
+
+
+class RateOfResolver:
+    """Replaces ``rateOf(x)`` by the rate expression of ``x``.
+
+    The rate of a model entity is determined by
+
+    * its rate rule,
+    * the time derivative of its assignment rule (chain rule),
+    * for species, the reactions it participates in, taking into account
+      stoichiometries, conversion factors and, for concentrations, the
+      compartment size,
+    * or is ``0`` otherwise.
+
+    The rate expression of each entity is built only once, and rate
+    expressions that contain ``rateOf()`` themselves are resolved
+    recursively. Cyclic dependencies are rejected.
+    Resolved subexpressions are memoized and shared across all
+    expressions handled by the same instance.
+
+    Function definitions are not inlined, and local parameters of kinetic
+    laws are not distinguished from global ones.
+
+    >>> import libsbml
+    >>> from sbmlmath import rate_of
+    >>> doc = libsbml.SBMLDocument(3, 2)
+    >>> model = doc.createModel()
+    >>> for species_id in ("A", "B"):
+    ...     species = model.createSpecies()
+    ...     _ = species.setId(species_id), species.setCompartment("C")
+    ...     _ = species.setHasOnlySubstanceUnits(True)
+    >>> reaction = model.createReaction()
+    >>> _ = reaction.setId("R"), reaction.createReactant().setSpecies("A")
+    >>> product = reaction.createProduct()
+    >>> _ = product.setSpecies("B"), product.setStoichiometry(2)
+    >>> law = reaction.createKineticLaw()
+    >>> _ = law.setMath(libsbml.parseL3Formula("k * A"))
+    >>> resolver = RateOfResolver(model)
+    >>> resolver.resolve(sp.sympify("a") * rate_of(sp.Symbol("B")))
+    a*(2*A*k)
+
+    :param model: The SBML model.
+    :param expressions:
+        The converted math of the model, as returned by
+        :func:`sbmlmath.model_math_to_sympy`. If not provided, the model
+        math is converted with default options.
+    :param symbol_kwargs:
+        Keyword arguments for constructing :class:`sympy.Symbol` for model
+        entities, as passed to :class:`SBMLMathMLParser`.
+    :param evaluate:
+        Whether to evaluate the expressions resulting from substituting the
+        rate expressions.
+    """
+
+    def __init__(
+        self,
+        model: libsbml.Model,
+        expressions: Mapping[tuple[str, str], sp.Basic] | None = None,
+        symbol_kwargs: dict | None = None,
+        evaluate: bool = False,
+    ):
+        self.model = model
+        self.expressions = (
+            model_math_to_sympy(model)
+            if expressions is None
+            else dict(expressions)
+        )
+        self.symbol_kwargs = (
+            {} if symbol_kwargs is None else symbol_kwargs.copy()
+        )
+        self.evaluate = evaluate
+        #: Rate expressions, by entity id
+        self.rates: dict[str, sp.Expr] = {}
+        # resolved subexpressions
+        self._cache: dict[sp.Basic, sp.Basic] = {}
+        # rates currently being built, for cycle detection
+        self._resolving: set[str] = set()
+        # species id -> [(stoichiometry, kinetic law)], built on demand
+        self._species_reactions: dict[str, list] | None = None
+
+    def _symbol(self, symbol_id: str) -> sp.Symbol:
+        return sp.Symbol(symbol_id, **self.symbol_kwargs)
+
+    def rate(self, symbol_id: str) -> sp.Expr:
+        """Get the rate expression of the given model entity.
+
+        :param symbol_id: The id of the model entity.
+        :return: The rate expression, without any ``rateOf()``.
+        """
+        try:
+            return self.rates[symbol_id]
+        except KeyError:
+            pass
+
+        if symbol_id in self._resolving:
+            raise ValueError(
+                f"Cyclic rateOf dependency involving `{symbol_id}`."
+            )
+        self._resolving.add(symbol_id)
+        try:
+            rate = self._build_rate(symbol_id)
+        finally:
+            self._resolving.remove(symbol_id)
+        self.rates[symbol_id] = rate
+        return rate
+
+    def _build_rate(self, symbol_id: str) -> sp.Expr:
+        if rule := self.model.getRule(symbol_id):
+            if rule.isRate():
+                return self.resolve(self.expressions[("rateRule", symbol_id)])
+            if rule.isAssignment():
+                return self._total_derivative(
+                    self.resolve(
+                        self.expressions[("assignmentRule", symbol_id)]
+                    )
+                )
+
+        element = self.model.getElementBySId(symbol_id)
+        if element is None:
+            raise ValueError(f"Unknown model entity `{symbol_id}`.")
+
+        if (
+            not isinstance(element, libsbml.Species)
+            or element.getBoundaryCondition()
+            or element.getConstant()
+        ):
+            return sp.Integer(0)
+
+        return self._species_rate(element)
+
+    def _total_derivative(self, expr: sp.Expr) -> sp.Expr:
+        """Time derivative of the given expression (chain rule)."""
+        result = sp.Integer(0)
+        for symbol in expr.free_symbols:
+            if (
+                isinstance(symbol, CSymbol)
+                and symbol.definition_url == TimeSymbol.DEFINITION_URL
+            ):
+                result += expr.diff(symbol)
+            elif (
+                not isinstance(symbol, CSymbol)
+                and (rate := self.rate(symbol.name)) != 0
+            ):
+                result += expr.diff(symbol) * rate
+        return result
+
+    def _species_rate(self, species: libsbml.Species) -> sp.Expr:
+        """Rate of change of a species due to reactions."""
+        if self._species_reactions is None:
+            self._species_reactions = self._index_reactions()
+
+        amount_rate = sp.Add(
+            *(
+                stoichiometry * self.resolve(kinetic_law)
+                for stoichiometry, kinetic_law in self._species_reactions.get(
+                    species.getId(), ()
+                )
+            )
+        )
+        if species.isSetConversionFactor():
+            amount_rate *= self._symbol(species.getConversionFactor())
+        elif self.model.isSetConversionFactor():
+            amount_rate *= self._symbol(self.model.getConversionFactor())
+
+        compartment = self.model.getCompartment(species.getCompartment())
+        if (
+            species.getHasOnlySubstanceUnits()
+            or compartment is None
+            or compartment.getSpatialDimensions() == 0
+        ):
+            return amount_rate
+
+        # concentration: d(n/V)/dt = (dn/dt - c dV/dt) / V
+        size = self._symbol(compartment.getId())
+        return (
+            amount_rate
+            - self._symbol(species.getId()) * self.rate(compartment.getId())
+        ) / size
+
+    def _index_reactions(self) -> dict[str, list]:
+        """Index the reactions by participating species."""
+        index = {}
+        for reaction in self.model.getListOfReactions():
+            key = ("kineticLaw", reaction.getId())
+            if key not in self.expressions:
+                raise ValueError(
+                    f"Reaction `{reaction.getId()}` has no kinetic law."
+                )
+            kinetic_law = self.expressions[key]
+            for sign, species_references in (
+                (-1, reaction.getListOfReactants()),
+                (1, reaction.getListOfProducts()),
+            ):
+                for species_reference in species_references:
+                    index.setdefault(
+                        species_reference.getSpecies(), []
+                    ).append(
+                        (
+                            sign * self._stoichiometry(species_reference),
+                            kinetic_law,
+                        )
+                    )
+        return index
+
+    def _stoichiometry(
+        self, species_reference: libsbml.SpeciesReference
+    ) -> sp.Expr:
+        """Get the stoichiometry of a species reference."""
+        if species_reference.isSetStoichiometryMath():
+            # SBML L2
+            return self.resolve(
+                self.expressions[
+                    _sbase_math_key(species_reference.getStoichiometryMath())
+                ]
+            )
+        sr_id = species_reference.getId()
+        if sr_id and (
+            not species_reference.getConstant()
+            or self.model.getRule(sr_id)
+            or self.model.getInitialAssignment(sr_id)
+        ):
+            return self._symbol(sr_id)
+        if not species_reference.isSetStoichiometry():
+            # undefined in SBML L3, but commonly treated as 1
+            return sp.Integer(1)
+        return sp.nsimplify(species_reference.getStoichiometry())
+
+    def resolve(self, expr: sp.Basic | Quantity) -> sp.Basic | Quantity:
+        """Replace all ``rateOf()`` calls in the given expression.
+
+        :param expr: The expression.
+        :return: The expression with all ``rateOf(x)`` replaced by the rate
+            expression of ``x``.
+        """
+        if isinstance(expr, Quantity):
+            magnitude = self.resolve(expr.magnitude)
+            if magnitude is expr.magnitude:
+                return expr
+            return type(expr)(magnitude, expr.units)
+        if not isinstance(expr, sp.Basic) or not expr.args:
+            return expr
+
+        try:
+            return self._cache[expr]
+        except KeyError:
+            pass
+
+        if _is_rate_of(expr):
+            (arg,) = expr.args
+            if (
+                isinstance(arg, CSymbol)
+                and arg.definition_url == TimeSymbol.DEFINITION_URL
+            ):
+                result = sp.Integer(1)
+            elif isinstance(arg, sp.Symbol) and not isinstance(arg, CSymbol):
+                result = self.rate(arg.name)
+            else:
+                raise ValueError(f"Unsupported rateOf argument: {arg}")
+        else:
+            args = tuple(self.resolve(arg) for arg in expr.args)
+            if args == expr.args:
+                result = expr
+            else:
+                with sp.evaluate(self.evaluate):
+                    result = expr.func(*args)
+
+        self._cache[expr] = result
+        return result
+
+
+def resolve_rate_of(
+    model: libsbml.Model,
+    expressions: Mapping[tuple[str, str], sp.Basic] | None = None,
+    **kwargs,
+) -> dict[tuple[str, str], sp.Basic]:
+    """Resolve all ``rateOf()`` calls in the math of a model.
+
+    :param model: The SBML model.
+    :param expressions:
+        The converted math of the model, as returned by
+        :func:`sbmlmath.model_math_to_sympy`. If not provided, the model
+        math is converted with default options.
+    :param kwargs: Passed to :class:`RateOfResolver`.
+    :return:
+        The math elements of the model with all ``rateOf()`` calls
+        replaced by the respective rate expressions.
+    """
+    resolver = RateOfResolver(model, expressions=expressions, **kwargs)
+    return {
+        key: resolver.resolve(expr)
+        for key, expr in resolver.expressions.items()
+    }
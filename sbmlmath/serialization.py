@@ -0,0 +1,404 @@
+"""Compact binary serialization of parsed SBML math.
+
+Expressions are encoded as a flat array of opcodes in postfix order, and
+tables of deduplicated atoms (symbols, numbers, constants) and heads
+(functions, operators, units). Definition URLs and encodings of
+:class:`CSymbol` and :class:`CFunction`, the attributes of
+:class:`SpeciesSymbol`, symbol assumptions, and ``pint`` units are preserved.
+Subexpressions that are shared (i.e. identical objects) within the
+serialized expressions are stored only once.
+
+>>> import sympy as sp
+>>> from sbmlmath import TimeSymbol, rate_of
+>>> a = sp.Symbol("a", real=True)
+>>> expr = rate_of(a) * TimeSymbol("t") + a
+>>> loads(dumps(expr)) == expr
+True
+
+The format is versioned; data written with a different format version
+cannot be read. Only numbers, symbols, and sympy and sbmlmath classes are
+created when deserializing; any other content is rejected.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import Any
+
+import sympy as sp
+from pint import Quantity, UnitRegistry
+from sympy.core.function import UndefinedFunction
+
+from .cfunction import CFunction
+from .csymbol import CSymbol
+from .species_symbol import SpeciesSymbol
+
+__all__ = ["dumps", "dumps_many", "loads", "loads_many"]
+
+_MAGIC = b"SBMM"
+_FORMAT_VERSION = 1
+# magic, format version, opcode typecode, number of expressions,
+#  length of the tables
+_HEADER = struct.Struct("<4sBcII")
+
+# opcode tags (lowest two bits of each opcode)
+_ATOM = 0
+_HEAD = 1
+_REF = 2
+
+#: Classes allowed as heads of type ``"t"``, by module and qualified name.
+#: Populated on demand by :func:`_allowed_head`.
+_ALLOWED_HEADS: dict[tuple[str, str], type] = {}
+
+_OPTIONAL_STR = (str, type(None))
+
+
+def _assumptions(sym: sp.Symbol) -> tuple[tuple[str, bool], ...]:
+    """Get the assumptions a symbol was created with."""
+    # `_assumptions_orig` is only available in sympy>=1.12
+    assumptions = getattr(sym, "_assumptions_orig", None)
+    if assumptions is None:
+        assumptions = sym.assumptions0
+    return tuple(sorted(assumptions.items()))
+
+
+def _atom_entry(atom: Any) -> tuple:
+    """Get the table entry for an atom."""
+    if isinstance(atom, CSymbol):
+        return (
+            "cs",
+            atom.name,
+            atom.definition_url,
+            atom.encoding,
+            _assumptions(atom),
+        )
+    if isinstance(atom, SpeciesSymbol):
+        return (
+            "ss",
+            atom.name,
+            atom.representation_type,
+            atom.species_reference,
+            _assumptions(atom),
+        )
+    if isinstance(atom, sp.Dummy):
+        return ("d", atom.name, atom.dummy_index, _assumptions(atom))
+    if isinstance(atom, sp.Symbol):
+        return ("s", atom.name, _assumptions(atom))
+    if isinstance(atom, sp.Integer):
+        return ("i", int(atom))
+    if isinstance(atom, sp.Rational):
+        return ("r", int(atom.p), int(atom.q))
+    if isinstance(atom, sp.Float) and atom.is_finite:
+        return ("f", tuple(map(int, atom._mpf_)), atom._prec)
+    if isinstance(atom, sp.Basic) and (
+        getattr(sp.S, type(atom).__name__, None) is atom
+    ):
+        return ("S", type(atom).__name__)
+    if isinstance(atom, bool | int | float):
+        return ("n", atom)
+    raise TypeError(f"Cannot serialize {atom!r} of type {type(atom)}.")
+
+
+def _check_types(entry: list, *types: type | tuple[type, ...]) -> list:
+    """Check the types of the data of a table entry.
+
+    :return: The data of the entry.
+    :raises ValueError: If the entry does not match the expected types.
+    """
+    data = entry[1:]
+    if len(data) != len(types) or not all(
+        isinstance(value, type_)
+        for value, type_ in zip(data, types, strict=True)
+    ):
+        raise ValueError(f"Invalid table entry: {entry}")
+    return data
+
+
+def _load_assumptions(entry: list, assumptions: list) -> dict[str, bool]:
+    """Get the assumptions from a table entry."""
+    if not all(
+        isinstance(pair, list)
+        and len(pair) == 2
+        and isinstance(pair[0], str)
+        and isinstance(pair[1], bool)
+        for pair in assumptions
+    ):
+        raise ValueError(f"Invalid table entry: {entry}")
+    return dict(assumptions)
+
+
+def _load_atom(entry: list) -> Any:  # noqa C901
+    """Create an atom from its table entry."""
+    kind = entry[0]
+    if kind == "cs":
+        name, definition_url, encoding, assumptions = _check_types(
+            entry, str, str, str, list
+        )
+        return CSymbol(
+            name,
+            definition_url=definition_url,
+            encoding=encoding,
+            **_load_assumptions(entry, assumptions),
+        )
+    if kind == "ss":
+        name, representation_type, species_reference, assumptions = (
+            _check_types(entry, str, _OPTIONAL_STR, _OPTIONAL_STR, list)
+        )
+        return SpeciesSymbol(
+            name,
+            representation_type=representation_type,
+            species_reference=species_reference,
+            **_load_assumptions(entry, assumptions),
+        )
+    if kind == "d":
+        name, dummy_index, assumptions = _check_types(entry, str, int, list)
+        return sp.Dummy(
+            name,
+            dummy_index=dummy_index,
+            **_load_assumptions(entry, assumptions),
+        )
+    if kind == "s":
+        name, assumptions = _check_types(entry, str, list)
+        return sp.Symbol(name, **_load_assumptions(entry, assumptions))
+    if kind == "i":
+        (value,) = _check_types(entry, int)
+        return sp.Integer(value)
+    if kind == "r":
+        return sp.Rational(*_check_types(entry, int, int))
+    if kind == "f":
+        mpf, precision = _check_types(entry, list, int)
+        if len(mpf) != 4 or not all(isinstance(x, int) for x in mpf):
+            raise ValueError(f"Invalid atom: {entry}")
+        return sp.Float._new(tuple(mpf), precision)
+    if kind == "S":
+        (name,) = _check_types(entry, str)
+        singleton = getattr(sp.S, name, None)
+        if not isinstance(singleton, sp.Basic) or not singleton.is_Atom:
+            raise ValueError(f"Invalid atom: {entry}")
+        return singleton
+    if kind == "n":
+        (value,) = _check_types(entry, (bool, int, float))
+        return value
+    raise ValueError(f"Invalid atom: {entry}")
+
+
+def _head_entry(node: Any) -> tuple:
+    """Get the table entry for the head of a non-atomic expression."""
+    if isinstance(node, Quantity):
+        return ("u", str(node.units))
+    func = node.func
+    if isinstance(func, CFunction):
+        return (
+            "c",
+            type(func).__name__,
+            func.name,
+            func.definition_url,
+            func.encoding,
+        )
+    if isinstance(func, UndefinedFunction):
+        return ("uf", func.name, tuple(sorted(func._kwargs.items())))
+    return ("t", func.__module__, func.__qualname__)
+
+
+def _allowed_head(module_name: str, qualname: str) -> type | None:
+    """Get the class that may be used as head of type ``"t"``.
+
+    Only subclasses of :class:`sympy.Basic` defined in sympy or sbmlmath
+    are allowed, and only if their module is already imported.
+
+    :return: The class, or ``None`` if it is not allowed.
+    """
+    key = (module_name, qualname)
+    if key not in _ALLOWED_HEADS:
+        # (re-)collect the classes, as further modules may have been
+        #  imported since the last call
+        stack = [sp.Basic]
+        while stack:
+            cls = stack.pop()
+            stack.extend(type.__subclasses__(cls))
+            module = cls.__module__ or ""
+            if module.partition(".")[0] in ("sympy", "sbmlmath") and not (
+                isinstance(cls, UndefinedFunction | CFunction)
+            ):
+                _ALLOWED_HEADS[(module, cls.__qualname__)] = cls
+    return _ALLOWED_HEADS.get(key)
+
+
+def _load_head(entry: list, ureg: UnitRegistry):
+    """Get the constructor for the head described by the table entry."""
+    kind = entry[0]
+    if kind == "u":
+        (units,) = _check_types(entry, str)
+        if units not in ureg:
+            # see SBMLMathMLParser.handle_cn
+            ureg.define(f"{units} = {units}")
+        return lambda magnitude: ureg.Quantity(magnitude, units)
+    if kind == "c":
+        class_name, name, definition_url, encoding = _check_types(
+            entry, str, str, str, str
+        )
+        classes = {
+            cls.__name__: cls
+            for cls in CFunction._definition_url_to_derived_class.values()
+        }
+        cls = classes.get(class_name, CFunction)
+        return cls(name, definition_url=definition_url, encoding=encoding)
+    if kind == "uf":
+        name, assumptions = _check_types(entry, str, list)
+        return sp.Function(name, **_load_assumptions(entry, assumptions))
+    if kind == "t":
+        module_name, qualname = _check_types(entry, str, str)
+        if (cls := _allowed_head(module_name, qualname)) is None:
+            raise ValueError(f"Disallowed head: {entry}")
+        return cls
+    raise ValueError(f"Invalid head: {entry}")
+
+
+def _is_atom(node: Any) -> bool:
+    if isinstance(node, Quantity):
+        return False
+    if isinstance(node, sp.Basic):
+        return node.is_Atom
+    return True
+
+
+def dumps_many(exprs: Sequence[sp.Basic | Quantity]) -> bytes:
+    """Serialize multiple expressions.
+
+    The expressions share the symbol and constant tables.
+
+    :param exprs: The expressions to serialize.
+    :return: The serialized expressions.
+    """
+    ops = array("I")
+    atoms: dict[tuple, int] = {}
+    heads: dict[tuple, int] = {}
+    # indices of composite nodes that were already serialized, by id
+    nodes: dict[int, int] = {}
+    # keep the visited nodes alive, so their ids cannot be reused
+    visited = []
+
+    for expr in exprs:
+        stack = [(expr, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done:
+                entry = _head_entry(node)
+                head = heads.setdefault(entry, len(heads))
+                args = (node.m,) if isinstance(node, Quantity) else node.args
+                ops.append(head << 2 | _HEAD)
+                ops.append(len(args))
+                nodes[id(node)] = len(nodes)
+                visited.append(node)
+            elif _is_atom(node):
+                atom = atoms.setdefault(_atom_entry(node), len(atoms))
+                ops.append(atom << 2 | _ATOM)
+            elif (index := nodes.get(id(node))) is not None:
+                ops.append(index << 2 | _REF)
+            else:
+                stack.append((node, True))
+                args = (node.m,) if isinstance(node, Quantity) else node.args
+                stack.extend((arg, False) for arg in reversed(args))
+
+    tables = json.dumps([list(atoms), list(heads)]).encode()
+    # use 16-bit opcodes where possible
+    if not ops or max(ops) < 2**16:
+        ops = array("H", ops)
+    if sys.byteorder != "little":
+        ops.byteswap()
+    return (
+        _HEADER.pack(
+            _MAGIC,
+            _FORMAT_VERSION,
+            ops.typecode.encode(),
+            len(exprs),
+            len(tables),
+        )
+        + tables
+        + ops.tobytes()
+    )
+
+
+def loads_many(
+    data: bytes, ureg: UnitRegistry | None = None
+) -> list[sp.Basic | Quantity]:
+    """Deserialize expressions serialized by :func:`dumps_many`.
+
+    :param data: The serialized expressions.
+    :param ureg:
+        The :class:`pint.UnitRegistry` to use for quantities. Defaults to the
+        default registry of :class:`SBMLMathMLParser`.
+    :return: The expressions.
+    """
+    if ureg is None:
+        from .mathml_parser import _ureg as ureg
+
+    magic, version, typecode, n_exprs, tables_len = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("Not a serialized sbmlmath expression.")
+    if version != _FORMAT_VERSION:
+        raise ValueError(f"Unsupported format version: {version}.")
+
+    offset = _HEADER.size
+    atom_entries, head_entries = json.loads(data[offset : offset + tables_len])
+    if not all(
+        isinstance(entry, list) and entry
+        for entry in (*atom_entries, *head_entries)
+    ):
+        raise ValueError("Corrupted data.")
+    atoms = [_load_atom(entry) for entry in atom_entries]
+    heads = [_load_head(entry, ureg) for entry in head_entries]
+    ops = array(typecode.decode())
+    ops.frombytes(data[offset + tables_len :])
+    if sys.byteorder != "little":
+        ops.byteswap()
+
+    stack = []
+    nodes = []
+    op_iter = iter(ops)
+    with sp.evaluate(False):
+        for op in op_iter:
+            tag = op & 3
+            if tag == _ATOM:
+                stack.append(atoms[op >> 2])
+            elif tag == _REF:
+                stack.append(nodes[op >> 2])
+            else:
+                n_args = next(op_iter)
+                split = len(stack) - n_args
+                node = heads[op >> 2](*stack[split:])
+                del stack[split:]
+                nodes.append(node)
+                stack.append(node)
+
+    if len(stack) != n_exprs:
+        raise ValueError("Corrupted data.")
+    return stack
+
+
+def dumps(expr: sp.Basic | Quantity) -> bytes:
+    """Serialize an expression.
+
+    :param expr: The expression to serialize.
+    :return: The serialized expression.
+    """
+    return dumps_many([expr])
+
+
+def loads(
+    data: bytes, ureg: UnitRegistry | None = None
+) -> sp.Basic | Quantity:
+    """Deserialize an expression serialized by :func:`dumps`.
+
+    :param data: The serialized expression.
+    :param ureg:
+        The :class:`pint.UnitRegistry` to use for quantities. Defaults to the
+        default registry of :class:`SBMLMathMLParser`.
+    :return: The expression.
+    """
+    (expr,) = loads_many(data, ureg=ureg)
+    return expr
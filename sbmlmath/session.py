@@ -0,0 +1,117 @@
+"""Incremental conversion of the math elements of an SBML model."""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+
+import libsbml
+import sympy as sp
+
+from . import _get_parser, _get_sbml_namespaces
+from .model import iter_math_elements
+
+__all__ = ["MathChanges", "ModelMathSession"]
+
+
+@dataclass(frozen=True)
+class MathChanges:
+    """Changes of the math elements of a model between two conversions.
+
+    All elements are identified by keys as described in
+    :func:`sbmlmath.xml_document_math_to_sympy`.
+    """
+
+    #: Keys of math elements that were added.
+    added: frozenset[tuple[str, str]] = field(default_factory=frozenset)
+    #: Keys of math elements whose math changed.
+    changed: frozenset[tuple[str, str]] = field(default_factory=frozenset)
+    #: Keys of math elements that were removed.
+    removed: frozenset[tuple[str, str]] = field(default_factory=frozenset)
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+class ModelMathSession:
+    """Keeps the converted math of an SBML model up to date.
+
+    On :meth:`refresh`, only math elements whose MathML changed since the
+    previous conversion are re-parsed. Changes are detected based on a hash
+    of the MathML.
+
+    The parser is taken from the parser pool of the calling thread (see
+    :func:`sbmlmath.sbml_math_to_sympy`). Parsers are not thread-safe, so
+    the session should be refreshed in the thread that created it.
+
+    >>> import libsbml
+    >>> doc = libsbml.SBMLDocument(3, 2)
+    >>> model = doc.createModel()
+    >>> rule = model.createAssignmentRule()
+    >>> _ = rule.setVariable("x"), rule.setMath(libsbml.parseL3Formula("a"))
+    >>> session = ModelMathSession(model)
+    >>> session.expressions
+    {('assignmentRule', 'x'): a}
+    >>> _ = rule.setMath(libsbml.parseL3Formula("2 * a"))
+    >>> session.refresh()
+    MathChanges(added=frozenset(), changed=frozenset({('assignmentRule', 'x')}), removed=frozenset())
+    >>> session.expressions
+    {('assignmentRule', 'x'): 2*a}
+
+    Args:
+        model:
+            The SBML model. The model is expected to be modified in-place
+            between calls to :meth:`refresh`.
+        kwargs:
+            Additional keyword arguments passed to
+            :attr:`SBMLMathMLParser.__init__`.
+    """
+
+    def __init__(self, model: libsbml.Model, **kwargs):
+        self.model = model
+        self.parser = _get_parser(
+            model.getLevel(), model.getVersion(), **kwargs
+        )
+        self._sbml_ns = _get_sbml_namespaces(
+            model.getLevel(), model.getVersion()
+        )
+        #: The converted expressions, indexed by math element key
+        self.expressions: dict[tuple[str, str], sp.Basic] = {}
+        self._hashes: dict[tuple[str, str], bytes] = {}
+        self.refresh()
+
+    def refresh(self) -> MathChanges:
+        """Update the converted expressions from the current model.
+
+        Returns:
+            The math elements that were added, changed or removed since the
+            last refresh.
+        """
+        added = set()
+        changed = set()
+        seen = set()
+        for key, element in iter_math_elements(self.model):
+            seen.add(key)
+            mathml = libsbml.writeMathMLWithNamespaceToString(
+                element.getMath(), self._sbml_ns
+            )
+            content_hash = hashlib.blake2b(
+                mathml.encode(), digest_size=16
+            ).digest()
+            if (old_hash := self._hashes.get(key)) == content_hash:
+                continue
+
+            self.expressions[key] = self.parser.parse_str(mathml)
+            self._hashes[key] = content_hash
+            (added if old_hash is None else changed).add(key)
+
+        removed = self._hashes.keys() - seen
+        for key in removed:
+            del self.expressions[key]
+            del self._hashes[key]
+
+        return MathChanges(
+            added=frozenset(added),
+            changed=frozenset(changed),
+            removed=frozenset(removed),
+        )
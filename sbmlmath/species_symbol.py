@@ -63,6 +63,21 @@ class SpeciesSymbol(sp.Dummy):
 
         return obj
 
+    def __reduce_ex__(self, protocol):
+        # Re-create through the constructor to restore the attributes and
+        #  to return the cached instance where available.
+        # `_assumptions_orig` is only available in sympy>=1.12
+        assumptions = getattr(self, "_assumptions_orig", None)
+        if assumptions is None:
+            assumptions = self.assumptions0
+        return _new_species_symbol, (
+            type(self),
+            self.name,
+            self.representation_type,
+            self.species_reference,
+            assumptions,
+        )
+
     def __repr__(self):
         rt = (
             f"representation_type={self.representation_type}"
@@ -77,3 +92,19 @@ class SpeciesSymbol(sp.Dummy):
         rt = f"{rt}, " if rt and sr else rt
 
         return f"<{self.name}({rt}{sr})>"
+
+
+def _new_species_symbol(
+    cls: type[SpeciesSymbol],
+    name: str,
+    representation_type: str | None,
+    species_reference: str | None,
+    assumptions: dict[str, bool],
+) -> SpeciesSymbol:
+    """Create a :class:`SpeciesSymbol` (for unpickling)."""
+    return cls(
+        name,
+        representation_type=representation_type,
+        species_reference=species_reference,
+        **assumptions,
+    )
@@ -0,0 +1,380 @@
+"""Structural hashing of parsed SBML math and round-trip checking.
+
+Comparing large unevaluated SymPy trees with ``==`` is slow, and
+:class:`sympy.Dummy`-based symbols such as :class:`SpeciesSymbol` only
+compare equal to themselves. The structural hash defined here is computed in
+a single linear pass and reflects the SBML semantics of an expression:
+
+* ``<csymbol>`` symbols and functions are identified by their definition
+  URL and encoding, not by their name (as for ``==`` on :class:`CSymbol`),
+* the ``multi`` attributes of :class:`SpeciesSymbol` are taken into
+  account,
+* units of ``pint`` quantities are taken into account,
+* numbers are compared by their value as double-precision floats, which is
+  how SBML defines numbers (e.g., ``Integer(2)``, ``Float(2.0)`` and
+  ``Rational(4, 2)`` have the same hash),
+* the order of the operands of commutative operators is irrelevant, and
+  nested applications of associative operators are flattened
+  (``(a + b) + c`` and ``c + (b + a)`` have the same hash).
+
+>>> import sympy as sp
+>>> a, b = sp.symbols("a b")
+>>> structural_hash(sp.Add(sp.Add(a, b, evaluate=False), 2, evaluate=False)) \\
+...     == structural_hash(sp.Add(sp.Float(2), b, a, evaluate=False))
+True
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+import sympy as sp
+from lxml import etree
+from pint import Quantity
+from sympy.core.function import UndefinedFunction
+
+from .cfunction import CFunction
+from .csymbol import CSymbol
+from .mathml_parser import SBMLMathMLParser
+from .mathml_printer import SBMLMathMLPrinter
+from .model import xml_document_math_to_sympy
+from .species_symbol import SpeciesSymbol
+
+__all__ = [
+    "RoundTripMismatch",
+    "StructuralHasher",
+    "check_files_round_trip",
+    "canonicalize",
+    "check_round_trip",
+    "structural_hash",
+]
+
+#: Associative and commutative operators, whose nested applications are
+#: flattened, and whose operands are unordered.
+_FLATTENED = (sp.Add, sp.Mul, sp.And, sp.Or, sp.Max, sp.Min)
+#: Commutative operators, whose operands are unordered.
+_UNORDERED = (sp.Eq, sp.Ne, sp.Xor)
+
+
+def _digest(head: str, *parts: bytes) -> bytes:
+    return hashlib.blake2b(
+        b"\0".join((head.encode(), *parts)), digest_size=16
+    ).digest()
+
+
+def _leaf_digest(leaf: Any) -> bytes:
+    """Compute the hash of an atomic expression."""
+    if isinstance(leaf, CSymbol):
+        return _digest(
+            "csymbol", leaf.definition_url.encode(), leaf.encoding.encode()
+        )
+    if isinstance(leaf, SpeciesSymbol):
+        return _digest(
+            "species",
+            leaf.name.encode(),
+            str(leaf.representation_type).encode(),
+            str(leaf.species_reference).encode(),
+        )
+    if isinstance(leaf, sp.Symbol):
+        return _digest("ci", leaf.name.encode())
+    if isinstance(leaf, sp.Number | int | float) and not isinstance(
+        leaf, bool
+    ):
+        return _digest("cn", struct.pack("<d", float(leaf)))
+    if isinstance(leaf, sp.Basic):
+        # constants like pi, true, ...
+        return _digest(type(leaf).__name__)
+    if isinstance(leaf, bool):
+        return _digest(str(sp.sympify(leaf)))
+    raise TypeError(f"Cannot hash {leaf!r} of type {type(leaf)}.")
+
+
+def _head(node: Any) -> str:
+    """Get the string identifying the head of a non-atomic expression."""
+    if isinstance(node, Quantity):
+        return f"units:{node.units}"
+    func = node.func
+    if isinstance(func, CFunction):
+        return f"csymbol:{func.definition_url}:{func.encoding}"
+    if isinstance(func, UndefinedFunction):
+        return f"function:{func.name}"
+    return func.__name__
+
+
+def _children(node: Any) -> tuple:
+    if isinstance(node, Quantity):
+        return (node.m,)
+    if isinstance(node, sp.Basic):
+        return node.args
+    return ()
+
+
+class StructuralHasher:
+    """Computes structural hashes (see :mod:`sbmlmath.structural`).
+
+    Hashes of subexpressions are memoized per instance, so subexpressions
+    that are shared between several expressions hashed with the same
+    instance are only processed once. The hasher keeps references to all
+    hashed expressions.
+    """
+
+    _leaf_digest = staticmethod(_leaf_digest)
+
+    def __init__(self):
+        # id -> (expression, digest, flattened operand digests)
+        self._cache: dict[int, tuple[Any, bytes, tuple[bytes, ...]]] = {}
+
+    def __call__(self, expr: sp.Basic | Quantity) -> bytes:
+        """Compute the structural hash of the given expression.
+
+        :param expr: The expression.
+        :return: The 16-byte structural hash.
+        """
+        cache = self._cache
+        stack = [(expr, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not children_done:
+                if id(node) in cache:
+                    continue
+                if children := _children(node):
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in children)
+                else:
+                    cache[id(node)] = (node, self._leaf_digest(node), ())
+                continue
+
+            head = _head(node)
+            children = _children(node)
+            flattened = ()
+            if isinstance(node, _FLATTENED):
+                operands = []
+                for child in children:
+                    _, digest, child_flattened = cache[id(child)]
+                    if type(child) is type(node):
+                        operands.extend(child_flattened)
+                    else:
+                        operands.append(digest)
+                flattened = tuple(sorted(operands))
+                digest = _digest(head, *flattened)
+            else:
+                digests = [cache[id(child)][1] for child in children]
+                if isinstance(node, _UNORDERED):
+                    digests.sort()
+                digest = _digest(head, *digests)
+            cache[id(node)] = (node, digest, flattened)
+
+        return cache[id(expr)][1]
+
+
+def structural_hash(expr: sp.Basic | Quantity) -> bytes:
+    """Compute the structural hash of an expression.
+
+    See :mod:`sbmlmath.structural` for details.
+
+    :param expr: The expression.
+    :return: The 16-byte structural hash.
+    """
+    return StructuralHasher()(expr)
+
+
+def _is_renamable(node: Any) -> bool:
+    """Whether the node is a symbol that is renamed by
+    :func:`canonicalize`."""
+    return isinstance(node, sp.Symbol) and not isinstance(node, CSymbol)
+
+
+class _ShapeHasher(StructuralHasher):
+    """Structural hasher that ignores the names of renamable symbols."""
+
+    @staticmethod
+    def _leaf_digest(leaf: Any) -> bytes:
+        if _is_renamable(leaf):
+            return _digest("ci")
+        return _leaf_digest(leaf)
+
+
+def _renamed(sym: sp.Symbol, name: str) -> sp.Symbol:
+    """Create a symbol of the same type and with the same assumptions and
+    attributes as the given symbol, but with a different name."""
+    assumptions = getattr(sym, "_assumptions_orig", None)
+    if assumptions is None:
+        assumptions = sym.assumptions0
+    if isinstance(sym, SpeciesSymbol):
+        return SpeciesSymbol(
+            name,
+            representation_type=sym.representation_type,
+            species_reference=sym.species_reference,
+            **assumptions,
+        )
+    return type(sym)(name, **assumptions)
+
+
+def _xreplace(
+    expr: sp.Basic | Quantity, mapping: Mapping[sp.Basic, sp.Basic]
+) -> sp.Basic | Quantity:
+    """:meth:`sympy.Basic.xreplace` that also handles quantities, and that
+    preserves the structure of unevaluated expressions."""
+    if isinstance(expr, Quantity):
+        return type(expr)(_xreplace(expr.m, mapping), expr.units)
+    if isinstance(expr, sp.Basic):
+        with sp.evaluate(False):
+            return expr.xreplace(mapping)
+    return expr
+
+
+def canonicalize(
+    expr: sp.Basic | Quantity,
+) -> tuple[sp.Basic | Quantity, tuple[sp.Symbol, ...]]:
+    """Rename the symbols of an expression to canonical placeholders.
+
+    Symbols, except for csymbols, are renamed to ``_0``, ``_1``, ... in the
+    order of their first occurrence. The operands of commutative operators
+    are visited in an order that does not depend on symbol names, so that
+    expressions that only differ in symbol names or operand order usually
+    have the same canonical form (and thus the same structural hash).
+    For expressions with symmetric structure, e.g. ``a * b / (K + a)`` and
+    ``b * a / (K + a)``, this is not guaranteed.
+
+    Placeholders have the same type, assumptions, and multi attributes as
+    the symbols they replace.
+
+    >>> import sympy as sp
+    >>> a, b, k1, k2 = sp.symbols("a b k1 k2")
+    >>> canonicalize(k1 * a)
+    (_0*_1, (a, k1))
+    >>> structural_hash(canonicalize(k1 * a)[0]) \\
+    ...     == structural_hash(canonicalize(b * k2)[0])
+    True
+
+    :param expr: The expression.
+    :return:
+        The canonical expression, and the original symbols by placeholder
+        index.
+    """
+    shape = _ShapeHasher()
+    shape(expr)
+    symbols = {}
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if _is_renamable(node):
+            symbols.setdefault(node, None)
+            continue
+        children = _children(node)
+        if isinstance(node, _FLATTENED + _UNORDERED):
+            children = sorted(
+                children, key=lambda child: shape._cache[id(child)][1]
+            )
+        stack.extend(reversed(children))
+
+    return _xreplace(
+        expr,
+        {sym: _renamed(sym, f"_{i}") for i, sym in enumerate(symbols)},
+    ), tuple(symbols)
+
+
+@dataclass
+class RoundTripMismatch:
+    """A math element that did not survive printing and re-parsing."""
+
+    #: The key of the math element (see
+    #: :func:`sbmlmath.xml_document_math_to_sympy`).
+    key: tuple[str, str]
+    #: The original expression.
+    expr: sp.Basic | Quantity
+    #: The re-parsed expression, or ``None`` if printing or parsing failed.
+    round_tripped: sp.Basic | Quantity | None = None
+    #: The MathML generated from :attr:`expr`, if printing succeeded.
+    mathml: str | None = None
+    #: The exception raised during printing or re-parsing, if any.
+    error: Exception | None = None
+
+
+def check_round_trip(
+    exprs: Mapping[tuple[str, str], sp.Basic | Quantity],
+    sbml_level: int = 3,
+    sbml_version: int = 2,
+    **kwargs,
+) -> list[RoundTripMismatch]:
+    """Check expressions for round-trip fidelity.
+
+    Each expression is printed with :class:`SBMLMathMLPrinter`, re-parsed
+    with :class:`SBMLMathMLParser`, and compared to the original by
+    structural hash. Numeric literals are printed without units, unless
+    they are :class:`pint.Quantity` objects.
+
+    :param exprs:
+        The expressions to check, e.g., as returned by
+        :func:`sbmlmath.model_math_to_sympy`.
+    :param sbml_level: The SBML level to print and parse.
+    :param sbml_version: The SBML version to print and parse.
+    :param kwargs:
+        Additional keyword arguments passed to
+        :attr:`SBMLMathMLParser.__init__`.
+    :return: The elements that did not survive the round trip.
+    """
+    printer = SBMLMathMLPrinter(
+        sbml_level=sbml_level,
+        sbml_version=sbml_version,
+        literals_dimensionless=False,
+    )
+    parser = SBMLMathMLParser(
+        sbml_level=sbml_level, sbml_version=sbml_version, **kwargs
+    )
+    hasher = StructuralHasher()
+    mismatches = []
+    for key, expr in exprs.items():
+        mathml = None
+        try:
+            mathml = printer.doprint(expr)
+            round_tripped = parser.parse_str(mathml)
+        except Exception as e:
+            mismatches.append(
+                RoundTripMismatch(key=key, expr=expr, mathml=mathml, error=e)
+            )
+            continue
+        if hasher(expr) != hasher(round_tripped):
+            mismatches.append(
+                RoundTripMismatch(
+                    key=key,
+                    expr=expr,
+                    round_tripped=round_tripped,
+                    mathml=mathml,
+                )
+            )
+    return mismatches
+
+
+def check_files_round_trip(
+    files: Iterable[str | os.PathLike], **kwargs
+) -> Iterator[tuple[str | os.PathLike, RoundTripMismatch]]:
+    """Check the math of a corpus of SBML files for round-trip fidelity.
+
+    See :func:`check_round_trip`.
+
+    :param files: The SBML files.
+    :param kwargs:
+        Additional keyword arguments passed to
+        :attr:`SBMLMathMLParser.__init__`.
+    :return: Iterator over ``(file, mismatch)`` tuples for all math elements
+        that did not survive the round trip.
+    """
+    for file in files:
+        # Using `lxml` to parse untrusted data is known to be vulnerable to
+        #  XML attacks
+        document = etree.parse(file)
+        root = document.getroot()
+        exprs = xml_document_math_to_sympy(document, **kwargs)
+        for mismatch in check_round_trip(
+            exprs,
+            sbml_level=int(root.get("level")),
+            sbml_version=int(root.get("version")),
+            **kwargs,
+        ):
+            yield file, mismatch
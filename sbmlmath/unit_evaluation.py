@@ -0,0 +1,269 @@
+"""Vectorized numerical evaluation of expressions with units.
+
+With ``ignore_units=False``, :class:`SBMLMathMLParser` represents
+``<cn>`` elements with units as :class:`pint.Quantity` objects inside the
+sympy expressions. :class:`QuantityFunction` evaluates such expressions
+for whole arrays of argument values with units.
+
+All magnitudes are converted to base units. Literal quantities are
+converted once, when the function is created. Arguments are converted
+once per call, as whole arrays. The units of the result are derived from
+the units of the arguments and cached per combination of argument units.
+Numbers without units are treated as having undeclared units, i.e., they
+are compatible with any units.
+
+Requires ``numpy``.
+
+>>> import numpy as np
+>>> import sympy as sp
+>>> from sbmlmath.mathml_parser import _ureg as ureg
+>>> x, k = sp.symbols("x k")
+>>> # (2 mM) * x * k
+>>> f = QuantityFunction([x, k], ureg.Quantity(2, "mmol/l") * x * k)
+>>> f(np.array([1.0, 2.0]), ureg.Quantity(np.array([0.5, 1]), "1/s"))
+<Quantity([1. 4.], 'mole / second / meter ** 3')>
+>>> f(np.array([1.0, 2.0]), ureg.Quantity(np.array([0.5, 1]), "1/min"))
+<Quantity([0.01666667 0.06666667], 'mole / second / meter ** 3')>
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import numpy as np
+import sympy as sp
+from pint import DimensionalityError, Quantity, Unit, UnitRegistry
+
+from .csymbol import CSymbol
+
+__all__ = ["QuantityFunction"]
+
+#: Functions that return a value in the units of their (first) argument
+_UNIT_PRESERVING_FUNCTIONS = (sp.Abs, sp.floor, sp.ceiling)
+
+
+class QuantityFunction:
+    """An expression with units, compiled for arrays of quantities.
+
+    :param symbols: The arguments of the function.
+    :param expr:
+        The expression, as returned by :class:`SBMLMathMLParser` with
+        ``ignore_units=False``. May be a :class:`pint.Quantity`, or contain
+        :class:`pint.Quantity` objects.
+    :param ureg:
+        The unit registry of the quantities. Defaults to the default
+        registry of :class:`SBMLMathMLParser`.
+    :param output_units:
+        Units to convert the result to. Defaults to the base units derived
+        from the arguments.
+    """
+
+    def __init__(
+        self,
+        symbols: Sequence[sp.Symbol],
+        expr: sp.Basic | Quantity,
+        ureg: UnitRegistry | None = None,
+        output_units: str | Unit | None = None,
+    ):
+        if ureg is None:
+            from .mathml_parser import _ureg as ureg
+
+        self.symbols = tuple(symbols)
+        self.expr = expr
+        self.ureg = ureg
+        self.output_units = output_units
+        self._dimensionless = ureg.dimensionless
+        # (factor, base units), by units
+        self._base_units: dict[Unit, tuple[float, Unit]] = {}
+        # result units, by the base units of the arguments
+        self._result_units: dict[tuple[Unit, ...], Unit] = {}
+
+        self._magnitude_expr = self._to_base_magnitude(expr)
+        self._func = sp.lambdify(
+            self.symbols, self._magnitude_expr, modules="numpy"
+        )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self.symbols)}, {self.expr})"
+
+    def _to_base(self, units: Unit) -> tuple[float, Unit]:
+        """Get the conversion factor to, and the base units of, the given
+        units."""
+        try:
+            return self._base_units[units]
+        except KeyError:
+            pass
+        quantity = self.ureg.Quantity(1.0, units)
+        if not quantity._is_multiplicative:
+            raise NotImplementedError(f"Unsupported offset units: {units}")
+        base = quantity.to_base_units()
+        result = self._base_units[units] = (float(base.m), base.u)
+        return result
+
+    def _to_base_magnitude(self, expr: sp.Basic | Quantity) -> sp.Basic:
+        """Replace quantities by their magnitudes in base units."""
+        if isinstance(expr, Quantity):
+            factor, _ = self._to_base(expr.u)
+            magnitude = self._to_base_magnitude(expr.m)
+            return magnitude if factor == 1 else magnitude * factor
+        if isinstance(expr, CSymbol) and expr.definition_url == (
+            "http://www.sbml.org/sbml/symbols/avogadro"
+        ):
+            return sp.Float(float(expr))
+        if not isinstance(expr, sp.Basic):
+            return sp.sympify(expr)
+        if not expr.args:
+            return expr
+        return expr.func(*map(self._to_base_magnitude, expr.args))
+
+    def result_units(self, *units: Unit) -> Unit:
+        """Get the (base) units of the result for the given argument units.
+
+        :param units: The units of the arguments.
+        :return: The units of the result in base units.
+        :raises pint.DimensionalityError:
+            If the expression is not dimensionally consistent.
+        """
+        key = tuple(self._to_base(u)[1] for u in units)
+        try:
+            return self._result_units[key]
+        except KeyError:
+            pass
+        result = self._units(
+            self.expr, dict(zip(self.symbols, key, strict=True))
+        )
+        if result is None:
+            result = self._dimensionless
+        self._result_units[key] = result
+        return result
+
+    def _units(  # noqa C901
+        self, expr: sp.Basic | Quantity, symbol_units: dict[sp.Symbol, Unit]
+    ) -> Unit | None:
+        """Derive the base units of an expression.
+
+        Numbers without units have undeclared units, which are represented
+        by ``None`` and are compatible with any units.
+        """
+        if isinstance(expr, Quantity):
+            units = self._to_base(expr.u)[1]
+            if (magnitude_units := self._units(expr.m, symbol_units)) is None:
+                return units
+            return magnitude_units * units
+        if isinstance(expr, sp.Symbol):
+            # includes avogadro, which has units of `avogadro`, i.e., is
+            #  dimensionless
+            return symbol_units.get(expr, self._dimensionless)
+        if not isinstance(expr, sp.Basic) or expr.is_Number:
+            return None
+        if not expr.args:
+            # NumberSymbols, BooleanAtoms
+            return self._dimensionless
+
+        if expr.is_Pow:
+            base, exponent = expr.args
+            base_units = self._units(base, symbol_units)
+            self._require_dimensionless(exponent, symbol_units)
+            if base_units is None or base_units == self._dimensionless:
+                return base_units
+            if not exponent.is_Number:
+                raise DimensionalityError(
+                    base_units,
+                    self._dimensionless,
+                    extra_msg=f" in {expr}: non-numeric exponent",
+                )
+            return base_units ** float(exponent)
+
+        if expr.is_Mul:
+            result = None
+            for arg in expr.args:
+                if (units := self._units(arg, symbol_units)) is not None:
+                    result = units if result is None else result * units
+            return result
+
+        if isinstance(expr, sp.Piecewise):
+            for _, condition in expr.args:
+                self._units(condition, symbol_units)
+            return self._same_units(
+                expr, [arg.expr for arg in expr.args], symbol_units
+            )
+
+        if isinstance(expr, sp.core.relational.Relational):
+            self._same_units(expr, expr.args, symbol_units)
+            return self._dimensionless
+
+        if isinstance(expr, sp.logic.boolalg.Boolean):
+            for arg in expr.args:
+                self._units(arg, symbol_units)
+            return self._dimensionless
+
+        if expr.is_Add or isinstance(expr, sp.Max | sp.Min):
+            return self._same_units(expr, expr.args, symbol_units)
+
+        if isinstance(expr, _UNIT_PRESERVING_FUNCTIONS):
+            return self._units(expr.args[0], symbol_units)
+
+        if isinstance(expr, sp.Function):
+            for arg in expr.args:
+                self._require_dimensionless(arg, symbol_units)
+            return self._dimensionless
+
+        raise NotImplementedError(f"Unhandled expression type: {expr.func}")
+
+    def _same_units(
+        self,
+        expr: sp.Basic,
+        args: Sequence[sp.Basic],
+        symbol_units: dict[sp.Symbol, Unit],
+    ) -> Unit | None:
+        """Check that all arguments have compatible units and return them."""
+        result = None
+        for arg in args:
+            if (units := self._units(arg, symbol_units)) is None:
+                continue
+            if result is None:
+                result = units
+            elif units != result:
+                raise DimensionalityError(
+                    result, units, extra_msg=f" in {expr}"
+                )
+        return result
+
+    def _require_dimensionless(
+        self, expr: sp.Basic, symbol_units: dict[sp.Symbol, Unit]
+    ) -> None:
+        units = self._units(expr, symbol_units)
+        if units is not None and units != self._dimensionless:
+            raise DimensionalityError(
+                units, self._dimensionless, extra_msg=f" in {expr}"
+            )
+
+    def __call__(self, *args: Quantity | np.ndarray | float) -> Quantity:
+        """Evaluate the expression.
+
+        :param args:
+            The argument values, as :class:`pint.Quantity` objects with
+            scalar or array magnitudes, or as plain numbers or arrays,
+            which are considered dimensionless. Arrays are broadcast.
+        :return: The values of the expression.
+        """
+        magnitudes = []
+        units = []
+        for arg in args:
+            if isinstance(arg, Quantity):
+                factor, base_units = self._to_base(arg.u)
+                magnitude = np.asarray(arg.m)
+                magnitudes.append(
+                    magnitude if factor == 1 else magnitude * factor
+                )
+                units.append(base_units)
+            else:
+                magnitudes.append(np.asarray(arg))
+                units.append(self._dimensionless)
+
+        result = self.ureg.Quantity(
+            self._func(*magnitudes), self.result_units(*units)
+        )
+        if self.output_units is not None:
+            return result.to(self.output_units)
+        return result
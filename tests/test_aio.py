@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import aclosing
+
+import libsbml
+import pytest
+
+from sbmlmath import (
+    ComplexityBudgetExceeded,
+    aio,
+    model_math_to_sympy,
+    sbml_file_math_to_sympy,
+)
+from sbmlmath.aio import *
+
+
+def _create_model_file(path, formula):
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    rule = model.createAssignmentRule()
+    rule.setVariable("x")
+    rule.setMath(libsbml.parseL3Formula(formula))
+    libsbml.writeSBMLToFile(doc, str(path))
+    return doc
+
+
+def test_aiter_math_to_sympy(tmp_path):
+    files = [tmp_path / f"model_{i}.xml" for i in range(5)]
+    for i, file in enumerate(files):
+        _create_model_file(file, f"a * {i + 1}")
+    files.append(tmp_path / "does_not_exist.xml")
+
+    async def run():
+        with ThreadPoolExecutor(2) as executor:
+            return {
+                source: result
+                async for source, result in aiter_math_to_sympy(
+                    files,
+                    executor=executor,
+                    max_concurrency=2,
+                    return_exceptions=True,
+                )
+            }
+
+    results = asyncio.run(run())
+    assert set(results) == set(files)
+    for file in files[:-1]:
+        assert results[file] == sbml_file_math_to_sympy(file)
+    assert isinstance(results[files[-1]], OSError)
+
+    async def run_raising():
+        async for _ in aiter_math_to_sympy(files[::-1]):
+            pass
+
+    with pytest.raises(OSError):
+        asyncio.run(run_raising())
+
+
+def test_amodel_math_to_sympy(tmp_path):
+    doc = _create_model_file(tmp_path / "model.xml", "a + b")
+    expected = model_math_to_sympy(doc.getModel())
+    assert expected == sbml_file_math_to_sympy(tmp_path / "model.xml")
+
+    assert (
+        asyncio.run(amodel_math_to_sympy(doc.getModel(), ignore_units=True))
+        == expected
+    )
+    assert (
+        asyncio.run(asbml_file_math_to_sympy(tmp_path / "model.xml"))
+        == expected
+    )
+
+
+def test_aiter_math_to_sympy_process_pool(tmp_path):
+    files = [tmp_path / f"model_{i}.xml" for i in range(3)]
+    for i, file in enumerate(files):
+        _create_model_file(file, f"a * {i + 1}")
+    too_large = tmp_path / "too_large.xml"
+    _create_model_file(too_large, " + ".join(f"a{i}" for i in range(20)))
+
+    async def run():
+        with ProcessPoolExecutor(2) as executor:
+            return {
+                source: result
+                async for source, result in aiter_math_to_sympy(
+                    [*files, too_large],
+                    executor=executor,
+                    max_concurrency=2,
+                    return_exceptions=True,
+                    max_nodes=10,
+                )
+            }
+
+    results = asyncio.run(run())
+    assert set(results) == {*files, too_large}
+    for file in files:
+        assert results[file] == sbml_file_math_to_sympy(file)
+    assert isinstance(results[too_large], ComplexityBudgetExceeded)
+    assert results[too_large].budget == "max_nodes"
+
+    with ProcessPoolExecutor(1) as executor:
+        assert asyncio.run(
+            asbml_file_math_to_sympy(files[0], executor=executor)
+        ) == sbml_file_math_to_sympy(files[0])
+
+
+def _tracking_convert(monkeypatch, blocking=()):
+    """Replace the conversion by one recording the started conversions and
+    the maximum number of concurrent conversions. Conversions of the
+    sources in ``blocking`` wait for the returned event."""
+    lock = threading.Lock()
+    release = threading.Event()
+    state = {"started": [], "running": 0, "max_running": 0}
+
+    def convert(source, kwargs):
+        with lock:
+            state["started"].append(source)
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+        if source in blocking:
+            release.wait(10)
+        time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+        return source
+
+    monkeypatch.setattr(aio, "_convert", convert)
+    return state, release
+
+
+def test_aiter_math_to_sympy_backpressure(monkeypatch):
+    state, _ = _tracking_convert(monkeypatch)
+    taken = []
+
+    def sources():
+        for i in range(20):
+            taken.append(i)
+            yield i
+
+    async def run():
+        results = []
+        with ThreadPoolExecutor(8) as executor:
+            async for _source, result in aiter_math_to_sympy(
+                sources(), executor=executor, max_concurrency=3
+            ):
+                results.append(result)
+                # sources are only taken when a slot is free
+                assert len(taken) < len(results) + 3
+                await asyncio.sleep(0.02)
+        return results
+
+    assert sorted(asyncio.run(run())) == list(range(20))
+    assert state["max_running"] <= 3
+
+
+def test_aiter_math_to_sympy_cancel(monkeypatch):
+    state, release = _tracking_convert(monkeypatch, blocking={1})
+    taken = []
+
+    def sources():
+        for i in range(10):
+            taken.append(i)
+            yield i
+
+    async def run():
+        with ThreadPoolExecutor(1) as executor:
+            try:
+                async with aclosing(
+                    aiter_math_to_sympy(
+                        sources(), executor=executor, max_concurrency=3
+                    )
+                ) as results:
+                    async for source, _result in results:
+                        assert source == 0
+                        break
+            finally:
+                # let the cancellation callbacks run
+                await asyncio.sleep(0)
+                release.set()
+
+    asyncio.run(run())
+    # 0 finished, 1 was running, 2 was pending and is cancelled
+    assert taken == [0, 1, 2]
+    assert state["started"] == [0, 1]
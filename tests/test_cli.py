@@ -0,0 +1,168 @@
+import json
+import os
+from pathlib import Path
+
+import libsbml
+import pytest
+import sympy as sp
+
+from sbmlmath import cli
+from sbmlmath.cli import convert_file, main, read_serialized
+
+
+def _write_models(directory):
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    reaction = model.createReaction()
+    reaction.setId("R1")
+    reaction.createKineticLaw().setMath(libsbml.parseL3Formula("k * A"))
+    rule = model.createAssignmentRule()
+    rule.setVariable("x")
+    rule.setMath(libsbml.parseL3Formula("exp(0.5 * time)"))
+    (directory / "sub").mkdir(parents=True)
+    libsbml.writeSBMLToFile(doc, str(directory / "sub" / "model1.xml"))
+
+    # unsupported math in one element
+    sbml = libsbml.writeSBMLToString(doc).replace(
+        "<cn> 0.5 </cn>",
+        '<cn type="complex-cartesian"> 1 <sep/> 2 </cn>',
+    )
+    assert "complex-cartesian" in sbml
+    (directory / "model2.xml").write_text(sbml)
+    (directory / "broken.xml").write_text("<sbml")
+    (directory / "ignored.txt").write_text("")
+
+
+@pytest.mark.parametrize("output_format", ["srepr", "serialized", "mathml"])
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_cli(tmp_path, output_format, jobs):
+    input_dir = tmp_path / "models"
+    output_dir = tmp_path / "out"
+    report_file = tmp_path / "report.json"
+    _write_models(input_dir)
+
+    exit_code = main(
+        [
+            str(input_dir),
+            "-o",
+            str(output_dir),
+            "-f",
+            output_format,
+            "-j",
+            str(jobs),
+            "--report",
+            str(report_file),
+        ]
+    )
+    assert exit_code == 1
+
+    report = json.loads(report_file.read_text())
+    assert report["n_files"] == 3
+    assert report["n_failed_files"] == 1
+    assert report["n_elements"] == 4
+    assert report["n_failed_elements"] == 1
+    files = {
+        file_report["file"].removeprefix(str(input_dir) + "/"): file_report
+        for file_report in report["files"]
+    }
+    assert set(files) == {"broken.xml", "model2.xml", "sub/model1.xml"}
+    assert files["broken.xml"]["error"].startswith("XMLSyntaxError")
+    assert [
+        (element["element_id"], element["error"] is None)
+        for element in files["model2.xml"]["elements"]
+    ] == [("x", False), ("R1", True)]
+    assert all(
+        element["seconds"] >= 0
+        for file_report in report["files"]
+        for element in file_report["elements"]
+    )
+
+    suffix = {
+        "srepr": ".srepr.txt",
+        "serialized": ".sbmlmath",
+        "mathml": ".mathml.xml",
+    }[output_format]
+    output_file = output_dir / "sub" / f"model1.xml{suffix}"
+    assert files["sub/model1.xml"]["output"] == str(output_file)
+    A, k = sp.symbols("A k")
+    if output_format == "srepr":
+        lines = output_file.read_text().splitlines()
+        assert lines[1] == f"kineticLaw\tR1\t{sp.srepr(A * k)}"
+    elif output_format == "serialized":
+        results = read_serialized(output_file)
+        assert results[("kineticLaw", "R1")].doit() == k * A
+        # successfully converted elements are written
+        results = read_serialized(output_dir / f"model2.xml{suffix}")
+        assert list(results) == [("kineticLaw", "R1")]
+    else:
+        doc = libsbml.readSBMLFromString(
+            (input_dir / "sub" / "model1.xml").read_text()
+        )
+        text = output_file.read_text()
+        assert '<element name="kineticLaw" id="R1"><math' in text
+        assert text.count("<math ") == doc.getModel().getNumReactions() + 1
+
+
+def test_cli_report_only(tmp_path, capsys):
+    _write_models(tmp_path)
+    assert main([str(tmp_path / "sub"), "--report", "-"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["n_elements"] == 2
+    assert report["files"][0]["output"] is None
+
+
+def test_cli_budgets(tmp_path, capsys):
+    _write_models(tmp_path)
+    # `exp(0.5 * time)` exceeds the budget, but is not a failure
+    assert (
+        main([str(tmp_path / "sub"), "--max-nodes", "5", "--report", "-"]) == 0
+    )
+    captured = capsys.readouterr()
+    report = json.loads(captured.out)
+    assert report["options"]["max_nodes"] == 5
+    assert report["n_failed_elements"] == 0
+    assert report["n_skipped_elements"] == 1
+    assert [
+        (element["element_id"], element["exceeded"])
+        for element in report["files"][0]["elements"]
+    ] == [("x", "max_nodes"), ("R1", None)]
+    assert "Converted 1/2 math elements" in captured.err
+    assert "(1 skipped)" in captured.err
+
+
+def test_cli_output_collision(tmp_path, capsys):
+    for directory in ("a", "b"):
+        _write_models(tmp_path / directory)
+    inputs = [str(tmp_path / d / "sub" / "model1.xml") for d in ("a", "b")]
+    output_dir = tmp_path / "out"
+
+    assert main([*inputs, "-o", str(output_dir)]) == 2
+    assert "would both be written to" in capsys.readouterr().err
+    assert not output_dir.exists()
+
+    # no conflict without outputs, or for the same input
+    assert main(inputs) == 0
+    assert main([inputs[0], inputs[0], "-o", str(output_dir)]) == 0
+
+
+def _crash_on_broken(file, *args):
+    if Path(file).name == "broken.xml":
+        os._exit(1)
+    return convert_file(file, *args)
+
+
+def test_cli_worker_crash(tmp_path, monkeypatch):
+    input_dir = tmp_path / "models"
+    report_file = tmp_path / "report.json"
+    _write_models(input_dir)
+    # the worker process dies while converting `broken.xml`
+    monkeypatch.setattr(cli, "convert_file", _crash_on_broken)
+
+    exit_code = main([str(input_dir), "-j", "2", "--report", str(report_file)])
+    assert exit_code == 1
+
+    report = json.loads(report_file.read_text())
+    assert report["n_files"] == 3
+    files = {Path(r["file"]).name: r for r in report["files"]}
+    assert files["broken.xml"]["error"].startswith("BrokenProcessPool")
+    assert files["broken.xml"]["elements"] == []
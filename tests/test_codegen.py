@@ -0,0 +1,159 @@
+import libsbml
+import pytest
+import sympy as sp
+
+np = pytest.importorskip("numpy")
+
+from sbmlmath import avogadro, codegen  # noqa: E402
+from sbmlmath.codegen import (  # noqa: E402
+    generate_module_source,
+    load_module,
+    model_hash,
+)
+
+
+def _create_model() -> libsbml.SBMLDocument:
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    model.setId("test_model")
+    compartment = model.createCompartment()
+    compartment.setId("C")
+    compartment.setConstant(True)
+    for species_id, constant in (("A", False), ("B", False), ("E", True)):
+        species = model.createSpecies()
+        species.setId(species_id)
+        species.setCompartment("C")
+        species.setHasOnlySubstanceUnits(True)
+        species.setBoundaryCondition(False)
+        species.setConstant(constant)
+
+    function_definition = model.createFunctionDefinition()
+    function_definition.setId("mm")
+    function_definition.setMath(
+        libsbml.parseL3Formula("lambda(s, v, km, v * s / (km + s))")
+    )
+
+    reaction = model.createReaction()
+    reaction.setId("R1")
+    reaction.createReactant().setSpecies("A")
+    reaction.createProduct().setSpecies("B")
+    reaction.createKineticLaw().setMath(
+        libsbml.parseL3Formula("mm(A, vmax, km) * switch")
+    )
+
+    for variable, formula in (
+        ("total", "A + B"),
+        ("switch", "piecewise(0, time > t_off, 1)"),
+        ("fraction", "B / total"),
+    ):
+        rule = model.createAssignmentRule()
+        rule.setVariable(variable)
+        rule.setMath(libsbml.parseL3Formula(formula))
+    rule = model.createRateRule()
+    rule.setVariable("z")
+    rule.setMath(libsbml.parseL3Formula("rateOf(B) * avogadro"))
+
+    event = model.createEvent()
+    event.setId("E1")
+    event.createTrigger().setMath(libsbml.parseL3Formula("fraction >= 0.5"))
+    return doc
+
+
+def test_load_module(tmp_path):
+    doc = _create_model()
+    model = doc.getModel()
+    observables = {"obs": sp.sympify("2 * A + t_off")}
+
+    module = load_module(model, tmp_path, observables=observables)
+    assert module.MODEL_HASH == model_hash(model, observables)
+    assert module.STATES == ("A", "B", "z")
+    assert module.PARAMETERS == ("km", "t_off", "vmax")
+    assert module.ASSIGNMENT_RULES == ("total", "switch", "fraction")
+    assert module.EVENTS == ("E1",)
+    assert module.OBSERVABLES == ("obs",)
+
+    x = [3.0, 1.0, 0.0]
+    p = [1.0, 10.0, 2.0]
+    flux = 2.0 * 3.0 / (1.0 + 3.0)
+    np.testing.assert_allclose(
+        module.rhs(0.0, x, p), [-flux, flux, flux * float(avogadro)]
+    )
+    # piecewise
+    np.testing.assert_allclose(module.rhs(20.0, x, p), [0.0, 0.0, 0.0])
+    np.testing.assert_allclose(
+        module.assignment_rules(0.0, x, p), [4.0, 1.0, 0.25]
+    )
+    np.testing.assert_array_equal(module.event_triggers(0.0, x, p), [False])
+    np.testing.assert_allclose(module.observables(0.0, x, p), [16.0])
+
+    # batches of states
+    batch = np.array([[3.0, 1.0], [1.0, 3.0], [0.0, 0.0]])
+    np.testing.assert_array_equal(
+        module.event_triggers(0.0, batch, p), [[False, True]]
+    )
+    assert module.rhs(0.0, batch, p).shape == (3, 2)
+
+    # cached in this process, and on disk
+    assert load_module(model, tmp_path, observables=observables) is module
+    (file,) = tmp_path.glob("*.py")
+    assert file.name == f"{module.__name__}.py"
+    assert file.read_text() == generate_module_source(model, observables)
+
+
+def test_load_module_cached(tmp_path, monkeypatch):
+    import sys
+
+    doc = _create_model()
+    model = doc.getModel()
+    module = load_module(model, tmp_path)
+    del sys.modules[module.__name__]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Module should not be regenerated.")
+
+    monkeypatch.setattr(codegen, "generate_module_source", fail)
+    reloaded = load_module(model, tmp_path)
+    assert reloaded is not module
+    assert reloaded.MODEL_HASH == module.MODEL_HASH
+
+    # changed model -> new module
+    model.getRule("total").setMath(libsbml.parseL3Formula("A + 2 * B"))
+    with pytest.raises(AssertionError, match="regenerated"):
+        load_module(model, tmp_path)
+
+
+def test_local_parameters(tmp_path):
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    species = model.createSpecies()
+    species.setId("A")
+    species.setCompartment("C")
+    species.setHasOnlySubstanceUnits(True)
+    species.setBoundaryCondition(False)
+    species.setConstant(False)
+    for reaction_id, formula in (("R1", "k * A"), ("R2", "k * k_global")):
+        reaction = model.createReaction()
+        reaction.setId(reaction_id)
+        reaction.createReactant().setSpecies("A")
+        kinetic_law = reaction.createKineticLaw()
+        kinetic_law.setMath(libsbml.parseL3Formula(formula))
+        kinetic_law.createLocalParameter().setId("k")
+    # a global parameter of the same id, shadowed in the kinetic laws
+    model.createParameter().setId("k")
+    model.createParameter().setId("k_global")
+    observables = {"obs": sp.sympify("k * A")}
+
+    module = load_module(model, tmp_path, observables=observables)
+    assert module.PARAMETERS == ("R1.k", "R2.k", "k", "k_global")
+    x = [3.0]
+    p = [2.0, 5.0, 7.0, 11.0]
+    np.testing.assert_allclose(module.rhs(0.0, x, p), [-(2 * 3 + 5 * 11)])
+    np.testing.assert_allclose(module.observables(0.0, x, p), [7 * 3])
+
+
+def test_unsupported():
+    doc = _create_model()
+    model = doc.getModel()
+    model.getRule("z").setMath(libsbml.parseL3Formula("delay(A, 1)"))
+    with pytest.raises(NotImplementedError, match="delay"):
+        generate_module_source(model)
@@ -1,6 +1,11 @@
+import copy
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
 import sympy as sp
 from sympy.core.function import UndefinedFunction
 
+from sbmlmath import SpeciesSymbol
 from sbmlmath.cfunction import *
 from sbmlmath.cfunction import DEF_URL_DELAY, DEF_URL_RATE_OF
 from sbmlmath.csymbol import *
@@ -67,3 +72,48 @@ def test_avogadro():
     from sbmlmath import avogadro
 
     assert avogadro.evalf() == float(avogadro)
+
+
+def _pickle_roundtrip(obj):
+    # unpickles only data pickled right here, not untrusted input
+    return pickle.loads(pickle.dumps(obj))  # noqa: S301
+
+
+def _check_in_subprocess(expr):
+    """Check unpickled expressions in a different process."""
+    # the unpickled symbols are the cached ones
+    assert expr.has(TimeSymbol("t"))
+    assert expr.has(rate_of)
+    assert expr.has(SpeciesSymbol("S", representation_type="sum"))
+    return expr
+
+
+def test_pickle():
+    a = sp.Symbol("a", real=True)
+    my_time = CSymbol(
+        "my_time", definition_url=TimeSymbol.DEFINITION_URL, real=True
+    )
+    species_symbol = SpeciesSymbol("S", representation_type="sum")
+    for obj in (
+        TimeSymbol("t"),
+        my_time,
+        avogadro,
+        species_symbol,
+        rate_of,
+        Delay("my_delay"),
+    ):
+        for copied in (_pickle_roundtrip(obj), copy.deepcopy(obj)):
+            # same process -> cached instance
+            assert copied is obj
+    assert _pickle_roundtrip(my_time).is_real
+    assert isinstance(_pickle_roundtrip(my_time), TimeSymbol)
+
+    expr = delay(a, 1) + rate_of(my_time) + TimeSymbol("t") * species_symbol
+    assert _pickle_roundtrip(expr) == expr
+    assert copy.deepcopy(expr) == expr
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        result = executor.submit(_check_in_subprocess, expr).result()
+    assert result == expr
+    assert result.has(TimeSymbol("t"))
+    assert result.has(species_symbol)
+    assert {type(x.func) for x in result.atoms(sp.Function)} == {Delay, RateOf}
@@ -0,0 +1,101 @@
+import libsbml
+import pytest
+import sympy as sp
+
+from sbmlmath import SBMLMathMLParser, TimeSymbol, delay
+
+np = pytest.importorskip("numpy")
+
+from sbmlmath.delay_evaluation import DelayEvaluator, DelayHistory  # noqa: E402
+
+
+def test_delay_history():
+    history = DelayHistory(n_states=1, max_delay=1, min_step=0.5)
+    assert history.capacity == 4
+
+    for t in np.arange(0, 10.5, 0.5):
+        history.record(t, [[t]])
+        assert len(history) <= history.capacity
+        # linear in time -> exact interpolation
+        queries = np.array([max(t - 1, 0)])
+        assert history.interpolate(queries) == pytest.approx(queries[:, None])
+        assert history.interpolate(t - 0.25) == pytest.approx(max(t - 0.25, 0))
+
+    # replace the last record
+    history.record(10, [[20]])
+    assert history.interpolate(9.75) == pytest.approx(14.75)
+
+    # current state beyond the last record
+    assert history.interpolate(
+        10.5, t_current=11, values_current=[[22]]
+    ) == pytest.approx(21)
+
+    with pytest.raises(ValueError, match="in order"):
+        history.record(9, [[0]])
+    with pytest.raises(ValueError, match="capacity"):
+        for t in np.arange(10.1, 11, 0.1):
+            history.record(t, [[t]])
+
+
+def test_delay_history_before_start():
+    history = DelayHistory(n_states=2, max_delay=2, min_step=1)
+    history.record(0, [[1, 2]])
+    history.record(1, [[3, 4]])
+    assert history.interpolate(-1).tolist() == [[1, 2]]
+    assert history.interpolate(0.5).tolist() == [[2, 3]]
+
+
+def test_delay_evaluator_batch():
+    """dx/dt = -k * x(t - tau), with parameters per trajectory."""
+    x, k = sp.symbols("x k")
+    t_sym = TimeSymbol("time")
+    evaluator = DelayEvaluator(
+        [-k * delay(x, 1), delay(t_sym * x, 0.5)],
+        states=[x],
+        parameters=[k],
+        max_delay=1,
+        min_step=0.01,
+        batch_size=3,
+    )
+    k_values = np.array([[0.0], [1.0], [2.0]])
+
+    t, dt = 0.0, 0.01
+    state = np.ones((3, 1))
+    for _ in range(100):
+        evaluator.record(t, state)
+        rhs = evaluator.evaluate(t, state, k_values)
+        assert rhs.shape == (3, 2)
+        state = state + dt * rhs[:, :1]
+        t += dt
+
+    # x(t - 1) == x(0) == 1 for t <= 1
+    assert state[:, 0] == pytest.approx([1, 0, -1])
+    # time is shifted with the delay
+    assert evaluator.evaluate(t, state, k_values)[:, 1] == pytest.approx(
+        0.5 * (1 - k_values[:, 0] * 0.5)
+    )
+    # the history is bounded
+    assert len(evaluator.history) <= evaluator.history.capacity
+
+
+def test_delay_evaluator_parsed():
+    ast_node = libsbml.parseL3Formula("delay(a, tau) + b")
+    mathml = libsbml.writeMathMLToString(ast_node)
+    expr = SBMLMathMLParser().parse_str(mathml)
+    a, b, tau = sp.symbols("a b tau")
+
+    evaluator = DelayEvaluator(
+        [expr], states=[a, b], parameters=[tau], max_delay=2, min_step=1
+    )
+    evaluator.record(0, [[0, 0]])
+    evaluator.record(1, [[1, 0]])
+    evaluator.record(2, [[2, 0]])
+    assert evaluator.evaluate(3, [[3, 10]], [1.5]) == pytest.approx(
+        np.array([[11.5]])
+    )
+
+    with pytest.raises(ValueError, match="Delay must be"):
+        evaluator.evaluate(3, [[3, 10]], [2.5])
+
+    with pytest.raises(ValueError, match="unknown symbols"):
+        DelayEvaluator([expr], states=[a], parameters=[tau], max_delay=2)
@@ -0,0 +1,68 @@
+import libsbml
+import pytest
+import sympy as sp
+
+from sbmlmath import *
+
+
+def test_dependency_graph():
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    fd = model.createFunctionDefinition()
+    fd.setId("f")
+    fd.setMath(libsbml.parseL3Formula("lambda(x, 2 * x)"))
+    for variable, formula in (
+        ("d", "f(c) + time"),
+        ("c", "b + a"),
+        ("b", "2 * a"),
+    ):
+        rule = model.createAssignmentRule()
+        rule.setVariable(variable)
+        rule.setMath(libsbml.parseL3Formula(formula))
+    initial_assignment = model.createInitialAssignment()
+    initial_assignment.setSymbol("a")
+    initial_assignment.setMath(libsbml.parseL3Formula("k"))
+    rate_rule = model.createRateRule()
+    rate_rule.setVariable("x")
+    rate_rule.setMath(libsbml.parseL3Formula("d"))
+
+    graph = DependencyGraph(model_math_to_sympy(model))
+    fd_key = ("functionDefinition", "f")
+    a_key = ("initialAssignment", "a")
+    b_key, c_key, d_key = (("assignmentRule", x) for x in "bcd")
+    x_key = ("rateRule", "x")
+
+    assert graph.dependencies[d_key] == {"f", "c"}
+    assert graph.dependents["a"] == {b_key, c_key}
+    assert graph.direct_dependencies(c_key) == {a_key, b_key}
+    assert graph.direct_dependents(b_key) == {c_key}
+
+    order = graph.topological_order()
+    assert set(order) == {fd_key, a_key, b_key, c_key, d_key, x_key}
+    for key in order:
+        for dependency in graph.direct_dependencies(key):
+            assert order.index(dependency) < order.index(key)
+
+    # incremental update introducing a cycle
+    graph.update(b_key, sp.Symbol("d"))
+    assert graph.dependents["a"] == {c_key}
+    assert graph.dependents["d"] == {b_key, x_key}
+    with pytest.raises(ValueError, match="Cyclic"):
+        graph.topological_order()
+    cycles = [
+        c for c in graph.strongly_connected_components() if graph.is_cyclic(c)
+    ]
+    assert [set(c) for c in cycles] == [{b_key, c_key, d_key}]
+
+    # removing an element breaks the cycle
+    graph.remove(c_key)
+    assert c_key not in graph
+    assert "c" not in graph.definitions
+    assert graph.topological_order().index(
+        b_key
+    ) > graph.topological_order().index(d_key)
+
+    # self-dependency
+    graph.update(("assignmentRule", "y"), sp.sympify("y + 1"))
+    with pytest.raises(ValueError, match="Cyclic"):
+        graph.topological_order()
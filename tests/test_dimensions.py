@@ -0,0 +1,214 @@
+import libsbml
+import pytest
+
+from sbmlmath import *
+from sbmlmath.dimensions import DIMENSIONLESS, _dimension
+
+
+def _create_model(level=3, version=2):
+    doc = libsbml.SBMLDocument(level, version)
+    model = doc.createModel()
+    if level > 2:
+        model.setTimeUnits("second")
+        model.setExtentUnits("mole")
+        model.setSubstanceUnits("mole")
+        model.setVolumeUnits("litre")
+    compartment = model.createCompartment()
+    compartment.setId("C")
+    compartment.setSpatialDimensions(3)
+    species = model.createSpecies()
+    species.setId("A")
+    species.setCompartment("C")
+    species.setHasOnlySubstanceUnits(False)
+    unit_definition = model.createUnitDefinition()
+    unit_definition.setId("per_second")
+    unit = unit_definition.createUnit()
+    unit.setKind(libsbml.UNIT_KIND_SECOND)
+    unit.setExponent(-1)
+    unit.setScale(0)
+    unit.setMultiplier(1)
+    for parameter_id, units in (
+        ("k", "per_second"),
+        ("x", "metre"),
+        ("y", ""),
+        ("tau", "second"),
+    ):
+        parameter = model.createParameter()
+        parameter.setId(parameter_id)
+        parameter.setConstant(False)
+        if units:
+            parameter.setUnits(units)
+    function_definition = model.createFunctionDefinition()
+    function_definition.setId("mass_action")
+    function_definition.setMath(
+        libsbml.parseL3Formula("lambda(rate, conc, rate * conc)")
+    )
+    return doc, model
+
+
+def _check(model, element_formulas):
+    for element, formula in element_formulas:
+        ast_node = libsbml.parseL3FormulaWithModel(formula, model)
+        assert ast_node is not None, formula
+        assert element.setMath(ast_node) == libsbml.LIBSBML_OPERATION_SUCCESS
+    return check_model_dimensions(model)
+
+
+def test_entity_dimensions():
+    _doc, model = _create_model()
+    checker = DimensionChecker(model)
+    assert checker.dimensions["C"] == _dimension({"metre": 3})
+    assert checker.dimensions["A"] == _dimension({"mole": 1, "metre": -3})
+    assert checker.dimensions["k"] == _dimension({"second": -1})
+    assert checker.dimensions["y"] is None
+    assert checker.units_dimension("dimensionless") == DIMENSIONLESS
+    assert checker.units_dimension("unknown") is None
+
+    _doc, model = _create_model(2, 4)
+    checker = DimensionChecker(model)
+    # builtin units
+    assert checker.dimensions["A"] == _dimension({"mole": 1, "metre": -3})
+
+
+@pytest.mark.parametrize(
+    "formula, expected",
+    [
+        ("k * A * C", None),
+        ("mass_action(k, A) * C", None),
+        ("k * A * C + y", None),
+        ("piecewise(k * A * C, time > tau, 0)", None),
+        ("delay(k, tau) * A * C", None),
+        ("(x^3 / C) * A * C * k", None),
+        ("sqrt(x^2 * x^4) * A * k", None),
+        ("exp(k * tau) * A * C / tau", None),
+        ("1 mole / tau", None),
+        (
+            "k * A",
+            "Expected second^-1 * mole, got metre^-3 * second^-1 * mole",
+        ),
+        ("k * A * C + A", "Inconsistent units"),
+        ("mass_action(k, A) + A", "Inconsistent units"),
+        ("exp(tau) * A * C * k", "Expected dimensionless, got second"),
+        ("delay(A * C * k, x)", "Expected delay in second, got metre"),
+        ("piecewise(1 mole, time > tau, A)", "Inconsistent units"),
+        ("piecewise(A * C * k, time > x, 0)", "Inconsistent units"),
+        ("x^y * A * C * k", "Non-constant exponent"),
+        ("2 metre / tau", "Expected second^-1 * mole, got"),
+    ],
+)
+def test_check_model_dimensions(formula, expected):
+    _doc, model = _create_model()
+    reaction = model.createReaction()
+    reaction.setId("R1")
+    mismatches = _check(model, [(reaction.createKineticLaw(), formula)])
+    if expected is None:
+        assert mismatches == []
+    else:
+        assert len(mismatches) == 1
+        assert mismatches[0].key == ("kineticLaw", "R1")
+        assert mismatches[0].message.startswith(expected)
+
+
+def test_check_rules():
+    _doc, model = _create_model()
+    rate_rule = model.createRateRule()
+    rate_rule.setVariable("x")
+    assignment_rule = model.createAssignmentRule()
+    assignment_rule.setVariable("tau")
+    initial_assignment = model.createInitialAssignment()
+    initial_assignment.setSymbol("A")
+    event = model.createEvent()
+    event.setId("E1")
+    trigger = event.createTrigger()
+    event_assignment = event.createEventAssignment()
+    event_assignment.setVariable("k")
+
+    assert (
+        _check(
+            model,
+            [
+                (rate_rule, "x * k"),
+                (assignment_rule, "1 / k"),
+                (initial_assignment, "1 mole / C"),
+                (trigger, "time >= tau"),
+                (event_assignment, "rateOf(k) * tau"),
+            ],
+        )
+        == []
+    )
+
+    mismatches = _check(
+        model,
+        [
+            (rate_rule, "x"),
+            (assignment_rule, "k"),
+            (trigger, "time >= x"),
+            (event_assignment, "rateOf(x)"),
+        ],
+    )
+    assert [mismatch.key for mismatch in mismatches] == [
+        ("rateRule", "x"),
+        ("assignmentRule", "tau"),
+        ("trigger", "E1"),
+        ("eventAssignment", "E1.k"),
+    ]
+
+
+@pytest.mark.parametrize("level, version", [(2, 4), (3, 2)])
+def test_local_parameters(level, version):
+    _doc, model = _create_model(level, version)
+    reaction = model.createReaction()
+    reaction.setId("R1")
+    kinetic_law = reaction.createKineticLaw()
+    # local `x` (per_second) shadows global `x` (metre)
+    local_parameter = (
+        kinetic_law.createLocalParameter()
+        if level > 2
+        else kinetic_law.createParameter()
+    )
+    local_parameter.setId("x")
+    local_parameter.setUnits("per_second")
+    assert _check(model, [(kinetic_law, "x * A * C")]) == []
+
+    # ... but only within the kinetic law
+    rate_rule = model.createRateRule()
+    rate_rule.setVariable("x")
+    assert [
+        mismatch.key for mismatch in _check(model, [(rate_rule, "x")])
+    ] == [("rateRule", "x")]
+
+
+def test_nested_function_calls():
+    _doc, model = _create_model()
+    for i in range(1, 40):
+        function_definition = model.createFunctionDefinition()
+        function_definition.setId(f"f{i}")
+        function_definition.setMath(
+            libsbml.parseL3Formula(
+                f"lambda(a, f{i - 1}(a) + f{i - 1}(a))"
+                if i > 1
+                else "lambda(a, a + 1 second)"
+            )
+        )
+    reaction = model.createReaction()
+    reaction.setId("R1")
+    rate_rule = model.createRateRule()
+    rate_rule.setVariable("x")
+    assignment_rule = model.createAssignmentRule()
+    assignment_rule.setVariable("y")
+
+    # exponential in the nesting depth without memoization
+    mismatches = _check(
+        model,
+        [
+            (reaction.createKineticLaw(), "f39(tau) / tau * k * A * C"),
+            (rate_rule, "f39(x) * k"),
+            (assignment_rule, "f39(x) + f38(x)"),
+        ],
+    )
+    # the mismatch in the body of f1 is reported once for each element
+    assert [str(mismatch) for mismatch in mismatches] == [
+        "rateRule 'x': Inconsistent units: metre and second in `a + 1 second`",
+        "assignmentRule 'y': Inconsistent units: metre and second in "
+        "`a + 1 second`",
+    ]
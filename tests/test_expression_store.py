@@ -0,0 +1,124 @@
+import json
+import os
+import sqlite3
+from array import array
+
+import libsbml
+import pytest
+import sympy as sp
+
+from sbmlmath import *
+from sbmlmath.cfunction import DEF_URL_RATE_OF
+from sbmlmath.serialization import _FORMAT_VERSION, _HEADER, _MAGIC
+
+
+def _model_math(**formulas):
+    return {
+        tuple(key.split("__")): sbml_math_to_sympy(
+            libsbml.parseL3Formula(formula)
+        )
+        for key, formula in formulas.items()
+    }
+
+
+MODELS = {
+    "m1": _model_math(
+        kineticLaw__R1="Vmax * S^n / (K^n + S^n)",
+        kineticLaw__R2="k1 * A * B",
+        assignmentRule__x="2 mole * rateOf(A)",
+    ),
+    "m2": _model_math(
+        kineticLaw__R1="V * P^h / (KP^h + P^h)",
+        kineticLaw__R2="kf * C * D",
+        kineticLaw__R3="kcat * E * S / (Km + S)",
+    ),
+    "m3": _model_math(
+        kineticLaw__R1="k * A * B",
+        assignmentRule__y="piecewise(1, time > 10, 0)",
+    ),
+}
+
+
+def test_expression_store(tmp_path):
+    db = tmp_path / "store.sqlite"
+    with ExpressionStore(db) as store:
+        store.add_models(MODELS.items())
+        assert store.n_elements == 8
+        # two Hill laws, two mass action laws
+        assert len(store) == 5
+        assert store.model_ids == ["m1", "m2", "m3"]
+
+    # reopen
+    with ExpressionStore(db) as store:
+        for model_id, exprs in MODELS.items():
+            assert store.get_model(model_id) == exprs
+            for key, expr in exprs.items():
+                assert store.get(model_id, key) == expr
+
+        assert store.models_with("pattern:hill") == ["m1", "m2"]
+        assert store.elements_with("pattern:michaelis_menten") == [
+            ("m2", "kineticLaw", "R3")
+        ]
+        assert store.models_with(f"csymbol:{DEF_URL_RATE_OF}") == ["m1"]
+        assert store.models_with("op:Piecewise") == ["m3"]
+        assert store.models_with("units:mole") == ["m1"]
+        assert store.feature_counts()["pattern:hill"] == 2
+
+        assert store.find(sp.sympify("x * y * z")) == [
+            ("m1", "kineticLaw", "R2"),
+            ("m2", "kineticLaw", "R2"),
+            ("m3", "kineticLaw", "R1"),
+        ]
+        ((canonical, count),) = store.most_common(1)
+        assert count == 3
+        _0, _1, _2 = sp.symbols("_0:3")
+        assert canonical == sp.Mul(
+            sp.Mul(_0, _1, evaluate=False), _2, evaluate=False
+        )
+
+        # replacing a model
+        store.add_model("m3", {("kineticLaw", "R1"): sp.Symbol("k")})
+        assert store.get_model("m3") == {("kineticLaw", "R1"): sp.Symbol("k")}
+        assert store.most_common(1)[0][1] == 2
+
+
+def test_expression_store_add_files(tmp_path):
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    reaction = model.createReaction()
+    reaction.setId("R1")
+    reaction.createKineticLaw().setMath(libsbml.parseL3Formula("k * A"))
+    file = tmp_path / "model.xml"
+    libsbml.writeSBMLToFile(doc, str(file))
+
+    with ExpressionStore() as store:
+        store.add_files([file])
+        assert store.get_model(str(file)) == {
+            ("kineticLaw", "R1"): sbml_math_to_sympy(reaction.getKineticLaw())
+        }
+
+
+def test_expression_store_tampered(tmp_path, monkeypatch):
+    db = tmp_path / "store.sqlite"
+    with ExpressionStore(db) as store:
+        store.add_model("m1", {("kineticLaw", "R1"): sp.exp(sp.Symbol("a"))})
+
+    # replace the stored expression by a payload calling `os.system`
+    tables = json.dumps([[["n", "echo PWNED"]], [["t", "os", "system"]]])
+    data = (
+        _HEADER.pack(_MAGIC, _FORMAT_VERSION, b"H", 1, len(tables))
+        + tables.encode()
+        + array("H", [0, 1, 1]).tobytes()
+    )
+    with sqlite3.connect(db) as connection:
+        connection.execute("UPDATE expressions SET data = ?", (data,))
+    connection.close()
+
+    monkeypatch.setattr(
+        os, "system", lambda *args: pytest.fail("os.system was called")
+    )
+    with (
+        ExpressionStore(db) as store,
+        pytest.raises(ValueError, match="Invalid|Disallowed"),
+    ):
+        store.get("m1", ("kineticLaw", "R1"))
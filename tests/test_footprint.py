@@ -0,0 +1,63 @@
+import libsbml
+import sympy as sp
+
+from sbmlmath import *
+
+
+def _create_model():
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    for variable, formula in (
+        ("x", "0.5 * exp(k * time) + avogadro"),
+        ("y", "2 * exp(k * time)"),
+    ):
+        rule = model.createAssignmentRule()
+        rule.setVariable(variable)
+        rule.setMath(libsbml.parseL3Formula(formula))
+    return doc, model
+
+
+def test_math_footprint():
+    a, b = sp.symbols("a b")
+    shared = sp.exp(a * b)
+    footprint = math_footprint({"x": shared + 1, "y": shared * 2})
+    assert footprint.n_expressions == 2
+    assert footprint.n_nodes == 12
+    # the shared subtree is only stored once
+    assert footprint.n_unique_nodes == 8
+    assert footprint.n_distinct_subtrees == 8
+    assert 0 < footprint.shared_fraction < 1
+    assert footprint.nbytes > 0
+    assert set(footprint.caches) == {
+        "CSymbol._cache",
+        "CFunction._cache",
+        "SpeciesSymbol._cache",
+        "pint.units",
+        "pint.cache",
+        "sympy.cache",
+        "SBMLMathMLParser._literal_cache",
+    }
+
+    # equal, but distinct objects
+    footprint = math_footprint([sp.exp(a * b), sp.exp(a * b)])
+    assert footprint.n_distinct_subtrees <= footprint.n_unique_nodes
+
+
+def test_compare_parser_options():
+    _doc, model = _create_model()
+    footprints = compare_parser_options(model)
+    assert set(footprints) == {
+        "default",
+        "floats_as_rationals=False",
+        "ignore_units=True",
+        "evaluate=True",
+    }
+    assert all(f.n_expressions == 2 for f in footprints.values())
+    assert footprints["default"].caches["CSymbol._cache"] >= 2
+    # 0.5, 2
+    assert footprints["default"].caches["SBMLMathMLParser._literal_cache"] == 2
+
+    footprints = compare_parser_options(
+        model, {"rationals": {}, "floats": {"floats_as_rationals": False}}
+    )
+    assert set(footprints) == {"rationals", "floats"}
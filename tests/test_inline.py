@@ -0,0 +1,80 @@
+import libsbml
+import pytest
+import sympy as sp
+
+from sbmlmath import *
+
+
+def test_inline_function_definitions():
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    # `g` uses `f`, which is defined later
+    for function_id, formula in (
+        ("g", "lambda(x, y, f(x) * y)"),
+        ("f", "lambda(x, x^2)"),
+    ):
+        fd = model.createFunctionDefinition()
+        fd.setId(function_id)
+        fd.setMath(libsbml.parseL3Formula(formula))
+    for variable, formula in (
+        ("r1", "g(a, b) + g(a, b)"),
+        ("r2", "f(g(a, b))"),
+        ("r3", "delay(a, 1)"),
+    ):
+        rule = model.createAssignmentRule()
+        rule.setVariable(variable)
+        rule.setMath(libsbml.parseL3Formula(formula))
+
+    inlined = inline_function_definitions(
+        model_math_to_sympy(model), evaluate=True
+    )
+    a, b = sp.symbols("a b")
+    assert inlined == {
+        ("assignmentRule", "r1"): 2 * a**2 * b,
+        ("assignmentRule", "r2"): a**4 * b**2,
+        ("assignmentRule", "r3"): delay(a, 1),
+    }
+
+
+def test_inliner_memoizes():
+    x, a, b = sp.symbols("x a b")
+    f = sp.Function("f")
+    inliner = FunctionDefinitionInliner({"f": sp.Lambda((x,), 2 * x)})
+    first = inliner.inline(f(a + b))
+    assert inliner.inline(f(b + a)) is first
+    assert inliner.inline(3 * f(a + b)).args[1] is first
+
+
+def test_inliner_cycle():
+    x = sp.Symbol("x")
+    f, g = sp.Function("f"), sp.Function("g")
+    with pytest.raises(ValueError, match="Cyclic"):
+        FunctionDefinitionInliner(
+            {"f": sp.Lambda((x,), g(x)), "g": sp.Lambda((x,), f(x))}
+        )
+
+
+def test_inline_quantities():
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    fd = model.createFunctionDefinition()
+    fd.setId("f")
+    fd.setMath(libsbml.parseL3Formula("lambda(x, 2 * x)"))
+    for variable, formula in (
+        ("y", "f(a) * 1 mole"),
+        ("z", "exp(f(a) * 1 s)"),
+    ):
+        rule = model.createAssignmentRule()
+        rule.setVariable(variable)
+        rule.setMath(libsbml.parseL3Formula(formula))
+
+    inlined = inline_function_definitions(
+        model_math_to_sympy(model), evaluate=True
+    )
+    a = sp.Symbol("a")
+    y = inlined["assignmentRule", "y"]
+    assert str(y.units) == "mole"
+    assert y.magnitude == 2 * a
+    (z,) = inlined["assignmentRule", "z"].args
+    assert str(z.units) == "second"
+    assert z.magnitude == 2 * a
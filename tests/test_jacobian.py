@@ -0,0 +1,65 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import libsbml
+import sympy as sp
+
+from sbmlmath import *
+
+
+def _expressions():
+    x, y, z, k1, k2 = sp.symbols("x y z k1 k2")
+    t = TimeSymbol("t")
+    shared = sp.exp(k1 * x) / (1 + y**k2)
+    expressions = [
+        shared * z,
+        -shared + sp.sin(x * y) * t,
+        sp.Piecewise((k1 * x, x > y), (k2, True)),
+        sp.Max(x, z) + sp.log(z) ** 2,
+        sp.Integer(2),
+    ]
+    return expressions, [x, y, z, k1, k2]
+
+
+def test_sparse_jacobian():
+    expressions, variables = _expressions()
+    expected = sp.Matrix(expressions).jacobian(variables)
+
+    jacobian = sparse_jacobian(expressions, variables)
+    assert all(derivative != 0 for derivative in jacobian.values())
+    actual = sp.SparseMatrix(len(expressions), len(variables), jacobian)
+    assert sp.simplify(actual - expected) == sp.zeros(*expected.shape)
+
+
+def test_jacobian_builder_memoizes():
+    expressions, variables = _expressions()
+    x = variables[0]
+    shared = sp.exp(variables[3] * x)
+    builder = JacobianBuilder()
+    builder.jacobian(expressions, variables)
+    assert (shared, x) in builder._derivatives
+    assert builder.derivative(shared, x) is builder.derivative(shared, x)
+
+
+def test_jacobian_boolean_arguments():
+    x, y = sp.symbols("x y")
+    builder = JacobianBuilder()
+    assert builder.derivative(BoolToNum(x > 1) * x, x) == BoolToNum(x > 1)
+
+    expr = sbml_math_to_sympy(
+        libsbml.parseL3Formula("x * (x > 1) + y * and(x - 1, y > 1)"),
+        compact_booleans=True,
+    )
+    jacobian = sparse_jacobian([expr], [x, y])
+    assert {key: value.doit() for key, value in jacobian.items()} == {
+        (0, 0): BoolToNum(x > 1),
+        (0, 1): BoolToNum(sp.And(NumToBool(x - 1), y > 1)),
+    }
+
+
+def test_sparse_jacobian_process_pool():
+    expressions, variables = _expressions()
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        jacobian = sparse_jacobian(
+            expressions, variables, executor=executor, chunk_size=2
+        )
+    assert jacobian == sparse_jacobian(expressions, variables)
@@ -1,5 +1,7 @@
 import libsbml
+import pytest
 import sympy as sp
+from lxml import etree
 from sympy import Piecewise
 
 from sbmlmath import *
@@ -236,3 +238,101 @@ def test_num2_bool():
     # no "conversion" if piecewise expressions are already boolean!
     expr = sp.Piecewise((sp.true, a < 10), (sp.false, sp.true))
     assert _num2bool(expr) == expr
+
+
+def test_set_math_batch():
+    doc = libsbml.SBMLDocument(3, 1)
+    model = doc.createModel()
+    elements = []
+    for symbol in ("a", "b", "c"):
+        ia = model.createInitialAssignment()
+        ia.setSymbol(symbol)
+        elements.append(ia)
+
+    x = sp.Symbol("x")
+    set_math_batch([(elements[0], 2 * x), (elements[1], x**2)])
+    assert sbml_math_to_sympy(elements[0], ignore_units=True) == 2 * x
+    assert sbml_math_to_sympy(elements[1], ignore_units=True) == x**2
+
+    # all errors are collected, all other elements are set
+    with pytest.raises(SetMathError) as exc_info:
+        set_math_batch(
+            [
+                (elements[0], x + sp.I),
+                (elements[1], 3 * x),
+                (elements[2], sp.I * x),
+            ]
+        )
+    assert [element for element, _, _ in exc_info.value.errors] == [
+        elements[0],
+        elements[2],
+    ]
+    assert sbml_math_to_sympy(elements[1], ignore_units=True) == 3 * x
+    assert sbml_math_to_sympy(elements[0], ignore_units=True) == 2 * x
+
+
+def test_parser_pool():
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sbmlmath import _get_parser, _get_sbml_namespaces
+
+    parser = _get_parser(3, 2, symbol_kwargs={"real": True})
+    assert _get_parser(3, 2, symbol_kwargs={"real": True}) is parser
+    assert _get_parser(3, 1, symbol_kwargs={"real": True}) is not parser
+    assert _get_parser(3, 2) is not parser
+    assert _get_sbml_namespaces(3, 2) is _get_sbml_namespaces(3, 2)
+    # unhashable options
+    assert _get_parser(3, 2, symbol_kwargs={"x": []}) is not _get_parser(
+        3, 2, symbol_kwargs={"x": []}
+    )
+    # per thread
+    with ThreadPoolExecutor(1) as executor:
+        assert executor.submit(_get_parser, 3, 2).result() is not (
+            _get_parser(3, 2)
+        )
+
+    # instance caches carry over between calls
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    for formula in ("0.25 * a", "0.25 * b"):
+        model.createAssignmentRule().setMath(libsbml.parseL3Formula(formula))
+    first, second = (
+        sbml_math_to_sympy(rule, floats_as_rationals=False)
+        for rule in model.getListOfRules()
+    )
+    assert first.args[0] is second.args[0]
+    assert _get_parser(3, 2, floats_as_rationals=False)._literal_cache
+
+
+def test_parser_pool_model_helpers():
+    from sbmlmath import (
+        _MAX_POOLED_PARSERS,
+        _get_parser,
+        _get_sbml_namespaces,
+        _pool,
+    )
+
+    doc = libsbml.SBMLDocument(3, 1)
+    model = doc.createModel()
+    model.createAssignmentRule().setMath(libsbml.parseL3Formula("a"))
+    parser = _get_parser(3, 1, evaluate=True)
+    (proxy,) = lazy_model_math(model, evaluate=True).values()
+    assert proxy._parser is parser
+    assert proxy._sbml_ns is _get_sbml_namespaces(3, 1)
+    (proxy,) = lazy_xml_document_math(
+        etree.fromstring(libsbml.writeSBMLToString(doc).encode()),
+        evaluate=True,
+    ).values()
+    assert proxy._parser is parser
+    assert ModelMathSession(model, evaluate=True).parser is parser
+
+    # least recently used parsers are dropped
+    parsers = [
+        _get_parser(3, 1, symbol_kwargs={"i": i})
+        for i in range(_MAX_POOLED_PARSERS)
+    ]
+    assert len(_pool.parsers) == _MAX_POOLED_PARSERS
+    assert _get_parser(3, 1, evaluate=True) is not parser
+    assert _get_parser(3, 1, symbol_kwargs={"i": 1}) is parsers[1]
+    assert _get_parser(3, 1, symbol_kwargs={"i": 0}) is not parsers[0]
+    assert len(_pool.parsers) == _MAX_POOLED_PARSERS
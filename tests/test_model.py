@@ -0,0 +1,145 @@
+import libsbml
+import pytest
+from lxml import etree
+
+from sbmlmath import *
+
+
+def _create_test_model() -> libsbml.SBMLDocument:
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    for formula, element in (
+        ("2 * p", model.createInitialAssignment()),
+        ("k * A", model.createAssignmentRule()),
+    ):
+        element.setMath(libsbml.parseL3Formula(formula))
+    model.getInitialAssignment(0).setSymbol("S")
+    model.getRule(0).setVariable("x")
+
+    reaction = model.createReaction()
+    reaction.setId("R1")
+    reaction.createKineticLaw().setMath(libsbml.parseL3Formula("k * A * B"))
+
+    event = model.createEvent()
+    event.setId("E1")
+    event.createTrigger().setMath(libsbml.parseL3Formula("time > 10"))
+    event_assignment = event.createEventAssignment()
+    event_assignment.setVariable("S")
+    event_assignment.setMath(libsbml.parseL3Formula("S / 2"))
+
+    function_definition = model.createFunctionDefinition()
+    function_definition.setId("f")
+    function_definition.setMath(libsbml.parseL3Formula("lambda(a, b, a * b)"))
+
+    model.createAlgebraicRule().setMath(libsbml.parseL3Formula("x - S"))
+    return doc
+
+
+def test_xml_document_math_to_sympy():
+    doc = _create_test_model()
+    xml_doc = etree.fromstring(libsbml.writeSBMLToString(doc).encode())
+
+    exprs = xml_document_math_to_sympy(xml_doc)
+
+    model = doc.getModel()
+    assert exprs == {
+        ("initialAssignment", "S"): sbml_math_to_sympy(
+            model.getInitialAssignment(0)
+        ),
+        ("assignmentRule", "x"): sbml_math_to_sympy(model.getRule(0)),
+        ("kineticLaw", "R1"): sbml_math_to_sympy(
+            model.getReaction(0).getKineticLaw()
+        ),
+        ("trigger", "E1"): sbml_math_to_sympy(model.getEvent(0).getTrigger()),
+        ("eventAssignment", "E1.S"): sbml_math_to_sympy(
+            model.getEvent(0).getEventAssignment(0)
+        ),
+        ("functionDefinition", "f"): sbml_math_to_sympy(
+            model.getFunctionDefinition(0)
+        ),
+        ("algebraicRule", "#1"): sbml_math_to_sympy(model.getRule(1)),
+    }
+    assert exprs == xml_document_math_to_sympy(etree.ElementTree(xml_doc))
+
+
+def test_model_math_to_sympy():
+    doc = _create_test_model()
+    xml_doc = etree.fromstring(libsbml.writeSBMLToString(doc).encode())
+
+    assert model_math_to_sympy(doc.getModel()) == xml_document_math_to_sympy(
+        xml_doc
+    )
+
+
+def test_iter_math_elements_unnamed():
+    """Positions of unnamed elements and of their unnamed ancestors."""
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    for i in range(3):
+        model.createAlgebraicRule().setMath(libsbml.parseL3Formula(f"x - {i}"))
+        event = model.createEvent()
+        event.createTrigger().setMath(libsbml.parseL3Formula(f"time > {i}"))
+        for variable in ("x", "y"):
+            assignment = event.createEventAssignment()
+            assignment.setVariable(variable)
+            assignment.setMath(libsbml.parseL3Formula(str(i)))
+
+    keys = [key for key, _ in iter_math_elements(model)]
+    assert keys == [
+        *(("algebraicRule", f"#{i}") for i in range(3)),
+        *(
+            key
+            for i in range(3)
+            for key in (
+                ("trigger", f"#{i}"),
+                ("eventAssignment", f"#{i}.x"),
+                ("eventAssignment", f"#{i}.y"),
+            )
+        ),
+    ]
+    xml_doc = etree.fromstring(libsbml.writeSBMLToString(doc).encode())
+    assert keys == list(xml_document_math_to_sympy(xml_doc))
+
+
+def test_lazy_math():
+    doc = _create_test_model()
+    model = doc.getModel()
+    expected = model_math_to_sympy(model)
+    xml_doc = etree.fromstring(libsbml.writeSBMLToString(doc).encode())
+
+    for proxies in (lazy_model_math(model), lazy_xml_document_math(xml_doc)):
+        assert proxies.keys() == expected.keys()
+        assert not any(proxy.is_parsed for proxy in proxies.values())
+
+        proxy = proxies["kineticLaw", "R1"]
+        assert proxy.element_name == "kineticLaw"
+        assert proxy.element_id == "R1"
+        assert proxy.nbytes > 0
+        assert not proxy.is_parsed
+
+        assert proxy.expr == expected["kineticLaw", "R1"]
+        assert proxy.is_parsed
+        assert proxy.expr is proxy.expr
+        assert sum(proxy.is_parsed for proxy in proxies.values()) == 1
+
+        assert {key: proxy.expr for key, proxy in proxies.items()} == expected
+
+
+def test_skip_exceeded():
+    doc = _create_test_model()
+    xml_doc = etree.fromstring(libsbml.writeSBMLToString(doc).encode())
+
+    with pytest.raises(ComplexityBudgetExceeded):
+        model_math_to_sympy(doc.getModel(), max_nodes=8)
+
+    # `lambda(a, b, a * b)` has 9 nodes, all others at most 8
+    expected = model_math_to_sympy(doc.getModel())
+    del expected[("functionDefinition", "f")]
+    assert (
+        model_math_to_sympy(doc.getModel(), skip_exceeded=True, max_nodes=8)
+        == expected
+    )
+    assert (
+        xml_document_math_to_sympy(xml_doc, skip_exceeded=True, max_nodes=8)
+        == expected
+    )
@@ -55,3 +55,227 @@ def test_parser_with_custom_assumptions():
     sym_expr = parser.parse_str(mathml)
     for symbol in sym_expr.free_symbols:
         assert symbol.is_real is True
+
+
+def test_compact_booleans():
+    ast_node = libsbml.parseL3Formula(
+        "2 * (a > 1) + piecewise(b, c - 1, 0) + and(d - 1, a < 3)"
+    )
+    mathml = libsbml.writeMathMLToString(ast_node)
+    a, b, c, d = sp.symbols("a b c d")
+
+    expr = SBMLMathMLParser().parse_str(mathml)
+    assert not expr.atoms(BoolToNum, NumToBool)
+
+    compact_expr = SBMLMathMLParser(compact_booleans=True).parse_str(mathml)
+    assert compact_expr.doit() == (
+        2 * BoolToNum(a > 1)
+        + sp.Piecewise((b, NumToBool(c - 1)), (0, True))
+        + BoolToNum(sp.And(NumToBool(d - 1), a < 3))
+    )
+    values = {a: 2, b: 3, c: 2, d: 2}
+    assert compact_expr.subs(values) == 6
+    assert compact_expr.rewrite(sp.Piecewise).subs(values) == 6
+
+    # printing
+    printer = SBMLMathMLPrinter(literals_dimensionless=False)
+    assert (
+        SBMLMathMLParser(compact_booleans=True)
+        .parse_str(printer.doprint(compact_expr))
+        .subs(values)
+        == 6
+    )
+
+    # code generation
+    f = sp.lambdify((a, b, c, d), compact_expr, modules="math")
+    assert f(*values.values()) == 6
+    assert f(0, 3, 1, 1) == 0
+
+
+def test_compact_booleans_simplify():
+    x, y = sp.symbols("x y")
+    # NumToBool is a proposition, not an operator on Boolean variables
+    for op in (sp.And, sp.Or):
+        expr = op(x > 0, NumToBool(y))
+        assert sp.simplify(expr) == expr
+        assert sp.simplify_logic(expr) == expr
+    assert sp.simplify_logic(sp.Or(NumToBool(y), ~NumToBool(y))) == sp.true
+    assert NumToBool(x).as_set() == sp.Ne(x, 0).as_set()
+
+    mathml = libsbml.writeMathMLToString(
+        libsbml.parseL3Formula("and(2 * x, y > 1) + 1")
+    )
+    expr = SBMLMathMLParser(compact_booleans=True).parse_str(mathml)
+    assert sp.simplify(expr) == (
+        BoolToNum(sp.And(NumToBool(2 * x), y > 1)) + 1
+    )
+    for values in ({x: 0, y: 2}, {x: 1, y: 2}, {x: 1, y: 0}):
+        assert sp.simplify(expr).subs(values) == expr.subs(values)
+
+
+@pytest.mark.parametrize(
+    "formula",
+    [
+        "a * b + 1",
+        "lambda(x, y, x * y + a)",
+        "f(a, 2 mole) + time * avogadro",
+        "delay(a, 1 second) + rateOf(b)",
+        "piecewise(a, b > c, 0 dimensionless)",
+    ],
+)
+def test_scan(formula):
+    ast_node = libsbml.parseL3FormulaWithSettings(
+        formula, libsbml.L3ParserSettings()
+    )
+    assert ast_node is not None, libsbml.getLastParseL3Error()
+    mathml = libsbml.writeMathMLWithNamespaceToString(
+        ast_node, libsbml.SBMLNamespaces(3, 2)
+    )
+    parser = SBMLMathMLParser()
+    expr = parser.parse_str(mathml)
+
+    identifiers = parser.scan_str(mathml)
+    assert identifiers == parser.scan_ast_node(ast_node)
+
+    # consistent with the parsed expression
+    expr = expr.m if hasattr(expr, "m") else expr
+    atoms = expr.atoms(sp.Symbol, sp.core.function.AppliedUndef)
+    assert identifiers.names == {
+        atom.func.__name__ if atom.args else atom.name
+        for atom in atoms
+        if not hasattr(atom, "definition_url")
+        and not hasattr(atom.func, "definition_url")
+        and atom not in getattr(expr, "variables", ())
+    }
+    assert identifiers.definition_urls == {
+        atom.definition_url
+        if hasattr(atom, "definition_url")
+        else atom.func.definition_url
+        for atom in atoms
+        if hasattr(atom, "definition_url")
+        or hasattr(atom.func, "definition_url")
+    }
+
+
+def test_scan_with_name_preprocessor():
+    mathml = libsbml.writeMathMLToString(libsbml.parseL3Formula("a * f(b)"))
+    parser = SBMLMathMLParser()
+    parser.preprocess_symbol_name = lambda name, element=None: f"_{name}"
+    assert parser.scan_str(mathml).names == {"_a", "_f", "_b"}
+    assert parser.scan_str(mathml).names == set(
+        map(str, parser.parse_str(mathml).free_symbols)
+    ) | {"_f"}
+
+
+@pytest.mark.parametrize(
+    "cn, floats_as_rationals, expected",
+    [
+        ("<cn> 12 </cn>", True, sp.Integer(12)),
+        ("<cn>-3</cn>", False, sp.Float(-3)),
+        ("<cn>0.125</cn>", True, sp.Rational(1, 8)),
+        ("<cn>-.5</cn>", True, sp.Rational(-1, 2)),
+        ("<cn>5.</cn>", True, sp.Integer(5)),
+        ("<cn>1.5e-3</cn>", True, sp.Rational(3, 2000)),
+        ("<cn>0.1</cn>", False, sp.Float("0.1")),
+        ('<cn type="integer">+7</cn>', True, sp.Integer(7)),
+        ('<cn type="rational">1<sep/>3</cn>', True, sp.Rational(1, 3)),
+        ('<cn type="e-notation">2<sep/>-2</cn>', True, sp.Float(0.02)),
+    ],
+)
+def test_literals(cn, floats_as_rationals, expected):
+    parser = SBMLMathMLParser(floats_as_rationals=floats_as_rationals)
+    mathml = f'<math xmlns="http://www.w3.org/1998/Math/MathML">{cn}</math>'
+    result = parser.parse_str(mathml)
+    assert result == expected
+    assert type(result) is type(expected)
+    # cached
+    assert parser.parse_str(mathml) is result
+    assert len(parser._literal_cache) == 1
+
+
+def test_literal_cache():
+    parser = SBMLMathMLParser()
+    ast_node = libsbml.parseL3Formula(
+        "0.5 * a + 0.5 * b + exp(0.5 dimensionless) + 2"
+    )
+    mathml = libsbml.writeMathMLWithNamespaceToString(
+        ast_node, libsbml.SBMLNamespaces(3, 2)
+    )
+    expr = parser.parse_str(mathml)
+    # the number is shared by the literals with and without units
+    assert len(parser._literal_cache) == 2
+    halves = [
+        arg
+        for arg in sp.preorder_traversal(expr)
+        if isinstance(arg, sp.Basic) and arg == sp.Rational(1, 2)
+    ]
+    assert len(halves) == 2
+    assert halves[0] is halves[1]
+
+    (exp,) = expr.atoms(sp.exp)
+    assert str(exp.args[0].units) == "dimensionless"
+    parser.ignore_units = True
+    parser.parse_str(mathml)
+    assert len(parser._literal_cache) == 2
+
+    # quantities are mutable and not shared
+    parser = SBMLMathMLParser()
+    mathml = libsbml.writeMathMLWithNamespaceToString(
+        libsbml.parseL3Formula("2 mole"), libsbml.SBMLNamespaces(3, 2)
+    )
+    quantity = parser.parse_str(mathml)
+    quantity.ito("millimole")
+    assert parser.parse_str(mathml) is not quantity
+    assert str(parser.parse_str(mathml)) == "2 mole"
+    sbml_math_to_sympy(libsbml.parseL3Formula("2 mole")).ito("millimole")
+    assert str(sbml_math_to_sympy(libsbml.parseL3Formula("2 mole"))) == (
+        "2 mole"
+    )
+
+    # unhandled attributes are still detected
+    with pytest.raises(NotImplementedError, match="Unhandled <cn> attr"):
+        parser.parse_str(
+            '<math xmlns="http://www.w3.org/1998/Math/MathML">'
+            '<cn definitionURL="foo">2</cn></math>'
+        )
+
+
+def test_complexity_budgets():
+    import pickle
+
+    mathml = libsbml.writeMathMLWithNamespaceToString(
+        libsbml.parseL3Formula("a * (b + c * exp(d))"),
+        libsbml.SBMLNamespaces(3, 2),
+    )
+    # <apply><times/><ci/><apply><plus/><ci/><apply><times/><ci/>
+    #  <apply><exp/><ci/></apply></apply></apply></apply>: 12 nodes, depth 5
+    expected = sp.Symbol("a") * (
+        sp.Symbol("b") + sp.Symbol("c") * sp.exp(sp.Symbol("d"))
+    )
+    assert (
+        SBMLMathMLParser(max_nodes=12, max_depth=5, timeout=60).parse_str(
+            mathml
+        )
+        == expected
+    )
+
+    for kwargs, budget, limit in (
+        ({"max_nodes": 11}, "max_nodes", 11),
+        ({"max_depth": 4}, "max_depth", 4),
+        ({"timeout": 0}, "timeout", 0),
+    ):
+        parser = SBMLMathMLParser(**kwargs)
+        with pytest.raises(ComplexityBudgetExceeded) as exc_info:
+            parser.parse_str(mathml)
+        assert exc_info.value.budget == budget
+        assert exc_info.value.limit == limit
+        # the parser remains usable
+        assert parser._deadline is None
+        assert parser.parse_str(
+            '<math xmlns="http://www.w3.org/1998/Math/MathML">'
+            "<ci> x </ci></math>"
+        ) == sp.Symbol("x")
+
+    # unpickles only data pickled right here, not untrusted input
+    unpickled = pickle.loads(pickle.dumps(exc_info.value))  # noqa: S301
+    assert (unpickled.budget, unpickled.limit) == ("timeout", 0)
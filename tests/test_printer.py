@@ -1,9 +1,18 @@
+import io
 from math import fabs
 
 import libsbml
+import pytest
+import sympy as sp
 from sympy import Rational
 
-from sbmlmath import SBMLMathMLPrinter, SpeciesSymbol
+from sbmlmath import (
+    SBMLMathMLPrinter,
+    SpeciesSymbol,
+    TimeSymbol,
+    avogadro,
+    delay,
+)
 
 
 def test_species_symbol_repr_type():
@@ -43,3 +52,39 @@ def test_print_large_rational():
         )
         < 1e-15
     )
+
+
+@pytest.mark.parametrize(
+    "expr",
+    [
+        sp.Integer(3),
+        sp.sympify("3 * a + b**2 / c - exp(d)"),
+        sp.Piecewise((1, sp.Symbol("a") > 2), (0, True)),
+        delay(sp.Symbol("Q"), 1) * TimeSymbol("t") + avogadro,
+        SpeciesSymbol("A", representation_type="sum") + sp.Symbol("α"),
+        sp.Add(*sp.symbols("x:1000")),
+    ],
+)
+def test_iterprint(expr):
+    printer = SBMLMathMLPrinter()
+    for with_prolog, with_math in ((True, True), (False, True), (0, 0)):
+        expected = printer.doprint(
+            expr, with_prolog=with_prolog, with_math=with_math
+        )
+        chunks = list(
+            printer.iterprint(
+                expr,
+                with_prolog=with_prolog,
+                with_math=with_math,
+                chunk_size=100,
+            )
+        )
+        assert "".join(chunks) == expected
+
+    text_file = io.StringIO()
+    printer.doprint_to(expr, text_file)
+    assert text_file.getvalue() == printer.doprint(expr)
+
+    binary_file = io.BytesIO()
+    printer.doprint_to(expr, binary_file)
+    assert binary_file.getvalue().decode() == printer.doprint(expr)
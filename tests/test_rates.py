@@ -0,0 +1,104 @@
+import libsbml
+import pytest
+import sympy as sp
+
+from sbmlmath import *
+
+
+def _create_model():
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    compartment = model.createCompartment()
+    compartment.setId("C")
+    compartment.setConstant(True)
+    compartment.setSpatialDimensions(3)
+    for species_id, only_substance in (("A", False), ("B", True)):
+        species = model.createSpecies()
+        species.setId(species_id)
+        species.setCompartment("C")
+        species.setHasOnlySubstanceUnits(only_substance)
+        species.setBoundaryCondition(False)
+        species.setConstant(False)
+    for parameter_id in ("k", "p", "q", "y"):
+        parameter = model.createParameter()
+        parameter.setId(parameter_id)
+        parameter.setConstant(parameter_id == "k")
+
+    reaction = model.createReaction()
+    reaction.setId("R1")
+    reaction.createReactant().setSpecies("A")
+    product = reaction.createProduct()
+    product.setSpecies("B")
+    product.setStoichiometry(2)
+    product.setConstant(True)
+    reaction.createKineticLaw().setMath(libsbml.parseL3Formula("k * A * C"))
+
+    for rule, variable, formula in (
+        (model.createRateRule(), "p", "rateOf(A) + rateOf(k)"),
+        (model.createAssignmentRule(), "y", "B^2 + time"),
+        (model.createRateRule(), "q", "rateOf(y) + rateOf(p)"),
+    ):
+        rule.setVariable(variable)
+        rule.setMath(libsbml.parseL3Formula(formula))
+    return doc, model
+
+
+def test_resolve_rate_of():
+    _doc, model = _create_model()
+    resolved = resolve_rate_of(model, evaluate=True)
+    A, B, C, k = sp.symbols("A B C k")
+    t = TimeSymbol("time")
+    assert not any(expr.atoms(RateOf) for expr in resolved.values())
+
+    assert resolved[("rateRule", "p")] == -k * A
+    assert resolved[("assignmentRule", "y")] == B**2 + t
+    assert (
+        sp.simplify(
+            resolved[("rateRule", "q")] - (2 * B * 2 * k * A * C + 1 - k * A)
+        )
+        == 0
+    )
+
+
+def test_resolve_rate_of_quantities():
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    for parameter_id in ("k", "p", "y", "z"):
+        parameter = model.createParameter()
+        parameter.setId(parameter_id)
+        parameter.setConstant(parameter_id == "k")
+    for rule, variable, formula in (
+        (model.createRateRule(), "p", "k"),
+        (model.createAssignmentRule(), "y", "rateOf(p) * 2 second"),
+        (model.createAssignmentRule(), "z", "exp(rateOf(p) * 1 s)"),
+    ):
+        rule.setVariable(variable)
+        rule.setMath(libsbml.parseL3Formula(formula))
+
+    resolved = resolve_rate_of(model, evaluate=True)
+    k = sp.Symbol("k")
+    y = resolved["assignmentRule", "y"]
+    assert str(y.units) == "second"
+    assert y.magnitude == 2 * k
+    (z,) = resolved["assignmentRule", "z"].args
+    assert str(z.units) == "second"
+    assert z.magnitude == k
+
+
+def test_rate_of_resolver_memoizes():
+    _doc, model = _create_model()
+    resolver = RateOfResolver(model)
+    A = sp.Symbol("A")
+    first = resolver.resolve(rate_of(A))
+    assert resolver.resolve(2 * rate_of(A)).args[1] is first
+    assert resolver.rates["A"] is first
+    assert resolver.rate("k") == 0
+
+
+def test_rate_of_cycle():
+    _doc, model = _create_model()
+    for variable, formula in (("p", "rateOf(q)"), ("q", "rateOf(p)")):
+        model.getRule(variable).setMath(libsbml.parseL3Formula(formula))
+
+    with pytest.raises(ValueError, match="Cyclic"):
+        resolve_rate_of(model)
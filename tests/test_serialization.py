@@ -0,0 +1,127 @@
+import json
+import os
+from array import array
+
+import pytest
+import sympy as sp
+
+from sbmlmath import *
+from sbmlmath.mathml_parser import _ureg
+from sbmlmath.serialization import *
+from sbmlmath.serialization import _FORMAT_VERSION, _HEADER, _MAGIC
+
+
+@pytest.mark.parametrize(
+    "expr",
+    [
+        sp.Integer(3),
+        sp.Symbol("a", real=True) * TimeSymbol("t") + avogadro,
+        rate_of(sp.Symbol("a")) + delay(sp.Symbol("b"), sp.Float("1.5")),
+        sp.Piecewise(
+            (sp.Rational(1, 3), sp.Symbol("a") > 1),
+            (sp.nan, sp.true),
+        ),
+        sp.Function("f", real=True)(sp.pi, sp.E, sp.oo),
+        SpeciesSymbol("S", representation_type="sum")
+        + SpeciesSymbol("S", species_reference="ref_S"),
+        sp.Lambda((sp.Symbol("x"),), sp.Symbol("x") ** 2),
+        sp.Add(sp.Integer(1), sp.Integer(2), evaluate=False),
+        sp.exp(_ureg.Quantity(sp.Integer(2), "mole")),
+    ],
+)
+def test_roundtrip(expr):
+    loaded = loads(dumps(expr))
+    assert loaded == expr
+    assert sp.srepr(loaded) == sp.srepr(expr)
+
+
+def test_roundtrip_preserves_attributes():
+    t = TimeSymbol("time")
+    loaded = loads(dumps(t))
+    assert isinstance(loaded, TimeSymbol)
+    assert loaded.name == "time"
+    assert loaded.definition_url == t.definition_url
+    assert loaded.encoding == t.encoding
+
+    s = SpeciesSymbol("S", species_reference="ref_S")
+    assert loads(dumps(s)) is s
+
+    f = delay(sp.Symbol("a"), 1)
+    assert isinstance(loads(dumps(f)).func, Delay)
+
+    quantity = _ureg.Quantity(2 * sp.Symbol("a"), "mole")
+    loaded = loads(dumps(quantity))
+    assert loaded.units == quantity.units
+    assert loaded.m == quantity.m
+
+
+def test_dumps_many_shared():
+    a, b = sp.symbols("a b")
+    shared = sp.sin(a + b)
+    exprs = [shared * 2, shared + 1, sp.Integer(5)]
+    data = dumps_many(exprs)
+    loaded = loads_many(data)
+    assert loaded == exprs
+    # shared subexpressions are stored once
+    assert len(data) < len(dumps(exprs[0])) + len(dumps(exprs[1]))
+    assert loaded[0].args[1] is loaded[1].args[1]
+
+
+def test_invalid_data():
+    with pytest.raises(ValueError, match="Not a serialized"):
+        loads(b"x" * 20)
+
+
+def _payload(atoms, heads, ops):
+    """Create serialized data from the given tables and opcodes."""
+    tables = json.dumps([atoms, heads]).encode()
+    return (
+        _HEADER.pack(_MAGIC, _FORMAT_VERSION, b"H", 1, len(tables))
+        + tables
+        + array("H", ops).tobytes()
+    )
+
+
+@pytest.mark.parametrize(
+    "atoms, heads",
+    [
+        # arbitrary callables
+        ([["n", "echo PWNED"]], [["t", "os", "system"]]),
+        ([["n", 1]], [["t", "builtins", "eval"]]),
+        ([["n", 1]], [["t", "sympy", "sympify"]]),
+        ([["n", 1]], [["t", "sympy.core.sympify", "sympify"]]),
+        ([["n", 1]], [["t", "sympy", "Symbol.__init_subclass__"]]),
+        # invalid atoms
+        (
+            [["n", [1, 2]]],
+            [["t", "sympy.functions.elementary.exponential", "exp"]],
+        ),
+        (
+            [["i", "1+1"]],
+            [["t", "sympy.functions.elementary.exponential", "exp"]],
+        ),
+        (
+            [["S", "__class__"]],
+            [["t", "sympy.functions.elementary.exponential", "exp"]],
+        ),
+        (
+            [["s", "a", [["real", "yes"]]]],
+            [["t", "sympy.functions.elementary.exponential", "exp"]],
+        ),
+    ],
+)
+def test_untrusted_data_rejected(atoms, heads, monkeypatch):
+    monkeypatch.setattr(
+        os, "system", lambda *args: pytest.fail("os.system was called")
+    )
+    with pytest.raises(ValueError, match="Invalid|Disallowed"):
+        loads(_payload(atoms, heads, [0, 1, 1]))
+
+    # the same structure with valid entries is accepted
+    assert loads(
+        _payload(
+            [["s", "a", []]],
+            [["t", "sympy.functions.elementary.exponential", "exp"]],
+            [0, 1, 1],
+        )
+    ) == sp.exp(sp.Symbol("a"))
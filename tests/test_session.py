@@ -0,0 +1,50 @@
+import libsbml
+import sympy as sp
+
+from sbmlmath import MathChanges, ModelMathSession
+
+
+def test_model_math_session():
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    for variable, formula in (("x", "a + b"), ("y", "2 * x")):
+        rule = model.createAssignmentRule()
+        rule.setVariable(variable)
+        rule.setMath(libsbml.parseL3Formula(formula))
+
+    session = ModelMathSession(model)
+    a, b, x = sp.symbols("a b x")
+    assert session.expressions == {
+        ("assignmentRule", "x"): a + b,
+        ("assignmentRule", "y"): 2 * x,
+    }
+    expr_y = session.expressions[("assignmentRule", "y")]
+
+    # nothing changed
+    assert not session.refresh()
+
+    model.getRule("x").setMath(libsbml.parseL3Formula("a - b"))
+    model.removeRule("y")
+    rule = model.createAssignmentRule()
+    rule.setVariable("z")
+    rule.setMath(libsbml.parseL3Formula("x"))
+    assert session.refresh() == MathChanges(
+        added=frozenset({("assignmentRule", "z")}),
+        changed=frozenset({("assignmentRule", "x")}),
+        removed=frozenset({("assignmentRule", "y")}),
+    )
+    assert session.expressions == {
+        ("assignmentRule", "x"): a - b,
+        ("assignmentRule", "z"): x,
+    }
+
+    # unchanged expressions are not re-parsed
+    rule = model.createAssignmentRule()
+    rule.setVariable("y")
+    rule.setMath(libsbml.parseL3Formula("2 * x"))
+    session.refresh()
+    new_expr_y = session.expressions[("assignmentRule", "y")]
+    assert new_expr_y == expr_y
+    expr_x = session.expressions[("assignmentRule", "x")]
+    assert session.refresh() == MathChanges()
+    assert session.expressions[("assignmentRule", "x")] is expr_x
@@ -0,0 +1,99 @@
+import libsbml
+import sympy as sp
+
+from sbmlmath import *
+from sbmlmath.mathml_parser import _ureg
+
+
+def test_structural_hash():
+    a, b, c = sp.symbols("a b c")
+
+    def add(*args):
+        return sp.Add(*args, evaluate=False)
+
+    assert structural_hash(add(add(a, b), c)) == structural_hash(
+        add(c, add(b, a))
+    )
+    assert structural_hash(a - b) != structural_hash(b - a)
+    assert structural_hash(a / b) != structural_hash(b / a)
+    assert structural_hash(sp.Integer(2) * a) == structural_hash(
+        sp.Float(2) * a
+    )
+    assert structural_hash(a) != structural_hash(sp.Symbol("x"))
+
+    # csymbols are identified by their definition URL
+    assert structural_hash(TimeSymbol("t")) == structural_hash(
+        TimeSymbol("time")
+    )
+    assert structural_hash(TimeSymbol("t")) != structural_hash(avogadro)
+    assert structural_hash(delay(a, 1)) == structural_hash(
+        Delay("my_delay")(a, 1)
+    )
+    assert structural_hash(delay(a, 1)) != structural_hash(rate_of(a))
+
+    # multi attributes are considered
+    assert structural_hash(SpeciesSymbol("S")) != structural_hash(
+        SpeciesSymbol("S", representation_type="sum")
+    )
+    assert structural_hash(SpeciesSymbol("S")) != structural_hash(
+        sp.Symbol("S")
+    )
+
+    # units are considered
+    assert structural_hash(
+        sp.exp(_ureg.Quantity(sp.Integer(2), "mole"))
+    ) != structural_hash(sp.exp(_ureg.Quantity(sp.Integer(2), "second")))
+
+
+def test_canonicalize():
+    a, b, k1, k2 = sp.symbols("a b k1 k2")
+    s = SpeciesSymbol("S", representation_type="sum")
+
+    canonical, symbols = canonicalize(k1 * a + s)
+    assert set(symbols) == {s, a, k1}
+    placeholders = {sym.name: sym for sym in canonical.free_symbols}
+    assert set(placeholders) == {"_0", "_1", "_2"}
+    assert canonical.xreplace(
+        {placeholders[f"_{i}"]: sym for i, sym in enumerate(symbols)}
+    ) == (k1 * a + s)
+    (renamed_s,) = (
+        sym for sym in canonical.free_symbols if isinstance(sym, SpeciesSymbol)
+    )
+    assert renamed_s.representation_type == "sum"
+
+    # operand order and names don't matter
+    expr1 = sp.Add(sp.Mul(k1, a, evaluate=False), b, evaluate=False)
+    expr2 = sp.Add(b, sp.Mul(a, k2, evaluate=False), evaluate=False)
+    assert structural_hash(canonicalize(expr1)[0]) == structural_hash(
+        canonicalize(expr2)[0]
+    )
+    # csymbols are not renamed
+    assert canonicalize(TimeSymbol("t") * a)[1] == (a,)
+    assert structural_hash(
+        canonicalize(TimeSymbol("t") * a)[0]
+    ) != structural_hash(canonicalize(b * a)[0])
+
+
+def test_check_round_trip(tmp_path):
+    doc = libsbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    for variable, formula in (
+        ("x", "a * b + 2.5 - c"),
+        ("y", "piecewise(1, time > 2, 0)"),
+        ("z", "rateOf(x)"),
+    ):
+        rule = model.createAssignmentRule()
+        rule.setVariable(variable)
+        rule.setMath(libsbml.parseL3Formula(formula))
+    sbml_file = tmp_path / "model.xml"
+    libsbml.writeSBMLToFile(doc, str(sbml_file))
+
+    assert list(check_files_round_trip([sbml_file])) == []
+
+    exprs = model_math_to_sympy(model)
+    assert check_round_trip(exprs) == []
+
+    # not representable in SBML
+    exprs[("assignmentRule", "w")] = sp.Symbol("a") + sp.I
+    (mismatch,) = check_round_trip(exprs)
+    assert mismatch.key == ("assignmentRule", "w")
@@ -0,0 +1,71 @@
+import pytest
+import sympy as sp
+from pint import DimensionalityError
+
+from sbmlmath import SBMLMathMLParser, avogadro
+from sbmlmath.mathml_parser import _ureg as ureg
+
+np = pytest.importorskip("numpy")
+
+from sbmlmath.unit_evaluation import QuantityFunction  # noqa: E402
+
+
+def _parse(body: str):
+    return SBMLMathMLParser(ignore_units=False).parse_str(
+        '<math xmlns="http://www.w3.org/1998/Math/MathML" '
+        'xmlns:sbml="http://www.sbml.org/sbml/level3/version2/core">'
+        f"{body}</math>"
+    )
+
+
+def test_quantity_function():
+    x, t = sp.symbols("x t")
+    # x / (2 second)
+    expr = _parse(
+        '<apply><divide/><ci>x</ci><cn sbml:units="second">2</cn></apply>'
+    )
+    f = QuantityFunction([x], expr)
+    values = ureg.Quantity(np.array([1.0, 2.0, 3.0]), "mmol")
+    result = f(values)
+    assert result.u == ureg.Unit("mol / s")
+    assert result.m == pytest.approx([5e-4, 1e-3, 1.5e-3])
+    # plain arrays are dimensionless
+    assert f(np.array([2.0])).to("Hz").m == pytest.approx([1.0])
+
+    # result units are cached per argument units
+    assert len(f._result_units) == 2
+    f(ureg.Quantity(np.array([4.0]), "mol"))
+    assert len(f._result_units) == 2
+
+    # output units
+    f = QuantityFunction([x], expr, output_units="mmol/min")
+    assert f(values).m == pytest.approx([30, 60, 90])
+
+    # piecewise with literals in different, compatible units
+    expr = _parse(
+        '<piecewise><piece><cn sbml:units="millimole">1</cn>'
+        '<apply><gt/><ci>x</ci><cn sbml:units="mole">1</cn></apply></piece>'
+        '<otherwise><cn sbml:units="mole">2</cn></otherwise></piecewise>'
+    )
+    f = QuantityFunction([x], expr)
+    result = f(ureg.Quantity(np.array([500.0, 1500.0]), "mmol"))
+    assert result.u == ureg.Unit("mol")
+    assert result.m == pytest.approx([2, 1e-3])
+
+    # numbers without units are compatible with any units
+    f = QuantityFunction([x, t], x * t + 1)
+    assert f(ureg.Quantity(2, "1/s"), ureg.Quantity(3, "s")).m == 7
+
+    # avogadro is dimensionless
+    f = QuantityFunction([x], x * avogadro)
+    assert f(ureg.Quantity(1, "mol")).u == ureg.mole
+
+
+def test_quantity_function_inconsistent():
+    x, y = sp.symbols("x y")
+    f = QuantityFunction([x, y], sp.exp(x) + y)
+    assert f(0, 1).m == 2
+    with pytest.raises(DimensionalityError):
+        f(ureg.Quantity(0, "mol"), 1)
+    with pytest.raises(DimensionalityError):
+        f(0, ureg.Quantity(1, "mol"))